@@ -6,8 +6,13 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Dict, List, Tuple, Any
 import re
+import os
+import sys
 from collections import Counter
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from keyword_matcher import KeywordMatcher
+
 class ADKSessionAnalyzer:
     def __init__(self):
         self.sessions_data = []
@@ -15,29 +20,47 @@ class ADKSessionAnalyzer:
         
         # ACTUALIZADO: Palabras clave consistentes con SentimentAnalyzer real
         self.urgency_keywords = [
-            "urgente", "inmediato", "rápido", "ya", "ahora", "crisis",
-            "crítico", "critico", "emergencia", "prioritario", "cuanto antes",
+            "urgente", "urgentes", "inmediato", "inmediata", "rápido", "rápida", "ya", "ahora", "crisis",
+            "crítico", "crítica", "critico", "critica", "emergencia", "emergencias",
+            "prioritario", "prioritaria", "cuanto antes",
             "no puede esperar", "necesito ya", "¡urgente!", "urgencia",
             "emergente", "inmediatamente", "ahora mismo"
         ]
         
+        # Palabras completas (KeywordMatcher): se incluyen plurales y femeninos
         self.negative_keywords = [
-            "molesto", "enojado", "frustrado", "terrible", "horrible", 
-            "malo", "lento", "problema", "error", "falla", "deficiente",
-            "pésimo", "inaceptable", "indignado", "furioso", "decepcionado"
+            "molesto", "molesta", "molestos", "molestas",
+            "enojado", "enojada", "enojados", "enojadas",
+            "frustrado", "frustrada", "frustrados", "frustradas",
+            "terrible", "terribles", "horrible", "horribles",
+            "malo", "mala", "malos", "malas", "lento", "lenta", "lentos", "lentas",
+            "problema", "problemas", "error", "errores", "falla", "fallas",
+            "deficiente", "deficientes", "pésimo", "pésima", "pésimos", "pésimas",
+            "inaceptable", "inaceptables", "indignado", "indignada", "indignados", "indignadas",
+            "furioso", "furiosa", "furiosos", "furiosas",
+            "decepcionado", "decepcionada", "decepcionados", "decepcionadas"
         ]
         
         self.escalation_keywords = [
-            "supervisor", "gerente", "queja", "demanda", "legal",
-            "cancelar", "cerrar cuenta", "competencia", "abogado",
-            "formal complaint", "escalate", "manager"
+            "supervisor", "supervisora", "supervisores", "gerente", "gerentes",
+            "queja", "quejas", "demanda", "demandas", "legal",
+            "cancelar", "cerrar cuenta", "competencia", "abogado", "abogada", "abogados",
+            "formal complaint", "escalate", "manager", "managers"
         ]
         
         # NUEVO: Patrones de estado del sistema (servidor caído, etc.)
         self.system_status_keywords = [
-            "caído", "caido", "no responde", "no funciona", "fuera de servicio",
-            "down", "corrupta", "fallo", "timeout", "error crítico"
+            "caído", "caída", "caido", "caida", "no responde", "no funciona", "fuera de servicio",
+            "down", "corrupta", "corrupto", "fallo", "fallos", "timeout", "error crítico"
         ]
+        
+        # Una pasada por consulta para las cuatro categorías, con límites de palabra
+        self.keyword_matcher = KeywordMatcher({
+            "urgency": self.urgency_keywords,
+            "system_critical": self.system_status_keywords,
+            "negative": self.negative_keywords,
+            "escalation": self.escalation_keywords,
+        })
     
     def load_session(self, filepath: str, session_name: str = None) -> Dict:
         """Carga un archivo JSON de sesión ADK"""
@@ -227,33 +250,15 @@ class ADKSessionAnalyzer:
             urgency_score = 0
             detected_patterns = []
             
-            # 1. DETECCIÓN DE PALABRAS CLAVE DE URGENCIA (consistente con SentimentAnalyzer)
-            urgency_keyword_count = 0
-            for keyword in self.urgency_keywords:
-                if keyword.lower() in text:
-                    detected_patterns.append({'category': 'urgency', 'keyword': keyword})
-                    urgency_keyword_count += 1
-            
-            # 2. DETECCIÓN DE PALABRAS DE ESTADO CRÍTICO DEL SISTEMA
-            system_critical_count = 0
-            for keyword in self.system_status_keywords:
-                if keyword.lower() in text:
-                    detected_patterns.append({'category': 'system_critical', 'keyword': keyword})
-                    system_critical_count += 1
-            
-            # 3. DETECCIÓN DE PALABRAS NEGATIVAS (indicador de frustración)
-            negative_keyword_count = 0
-            for keyword in self.negative_keywords:
-                if keyword.lower() in text:
-                    detected_patterns.append({'category': 'negative', 'keyword': keyword})
-                    negative_keyword_count += 1
-            
-            # 4. DETECCIÓN DE ESCALACIÓN
-            escalation_keyword_count = 0
-            for keyword in self.escalation_keywords:
-                if keyword.lower() in text:
-                    detected_patterns.append({'category': 'escalation', 'keyword': keyword})
-                    escalation_keyword_count += 1
+            # 1-4. DETECCIÓN DE PALABRAS CLAVE (urgencia, estado crítico del sistema,
+            # negativas y escalación) en una sola pasada, consistente con SentimentAnalyzer
+            matches = self.keyword_matcher.match(text)
+            for category, keywords in matches.items():
+                detected_patterns.extend({'category': category, 'keyword': keyword} for keyword in keywords)
+            urgency_keyword_count = len(matches['urgency'])
+            system_critical_count = len(matches['system_critical'])
+            negative_keyword_count = len(matches['negative'])
+            escalation_keyword_count = len(matches['escalation'])
             
             # CÁLCULO DEL SCORE SEGÚN LA LÓGICA DEL SENTIMENTANALYZER REAL
             # Basado en los pesos observados en los JSONs del project knowledge
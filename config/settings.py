@@ -11,6 +11,47 @@ class Settings(BaseSettings):
     DB_CONNECTION_NAME: str
     DB_HOST: str
 
+    # Pool de conexiones compartido por los repositorios
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_ACQUIRE_TIMEOUT: float = 10.0
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = 300.0
+    DB_COMMAND_TIMEOUT: float = 30.0
+
+    # Índice ANN de knowledge_base.embedding (ver scripts/manage_vector_index.py)
+    KB_INDEX_METHOD: str = "hnsw"          # "hnsw" o "ivfflat"
+    KB_HNSW_M: int = 16
+    KB_HNSW_EF_CONSTRUCTION: int = 64
+    KB_IVFFLAT_LISTS: int = 100
+    # Parámetros de búsqueda por defecto (se pueden sobrescribir por consulta)
+    KB_HNSW_EF_SEARCH: int = 40
+    KB_IVFFLAT_PROBES: int = 1
+
+    # Caché en memoria del contexto de cliente (0 la desactiva)
+    CUSTOMER_CACHE_SIZE: int = 1024
+    CUSTOMER_CACHE_TTL_SECONDS: float = 60.0
+    # Clientes por consulta en las lecturas masivas (get_customer_contexts)
+    CUSTOMER_BULK_CHUNK_SIZE: int = 1000
+
+    # Estadísticas precalculadas (vista materializada customer_statistics_mv)
+    CUSTOMER_STATS_TREND_DAYS: int = 30
+    CUSTOMER_STATS_REFRESH_SECONDS: int = 300
+
+    # LRU en memoria delante de la tabla sentiment_cache (0 la desactiva)
+    SENTIMENT_CACHE_SIZE: int = 4096
+    SENTIMENT_CACHE_TTL_SECONDS: float = 3600.0
+    # Caducidad de las filas de sentiment_cache en PostgreSQL
+    SENTIMENT_DB_TTL_DAYS: int = 30
+    SENTIMENT_PRUNE_INTERVAL_SECONDS: int = 3600
+
+    # Endpoint Prometheus/OpenMetrics del agente (0 lo desactiva)
+    PROMETHEUS_PORT: int = 9464
+
+    # Trazas por mensaje (ver observability/tracing.py): "none", "file" u "otlp"
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318"
+
     # Credenciales de GCP 
     GCP_PROJECT_ID: str = "customer-service-agents-tfm"
     GOOGLE_API_KEY: str  
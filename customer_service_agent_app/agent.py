@@ -1,4 +1,5 @@
 # customer_service_agent_app/agent.py
+import logging
 
 from google.adk.agents import LlmAgent, ParallelAgent, SequentialAgent
 
@@ -9,6 +10,26 @@ from .subagents.sentiment_agent.agent import sentiment_agent
 from .subagents.knowledge_agent.agent import knowledge_agent
 from .subagents.priority_agent.agent import priority_agent
 from .subagents.response_synthesizer.agent import response_synthesizer
+from .repository.database import init_pool
+from .observability.prometheus_metrics import start_metrics_server
+from .observability.callbacks import before_agent_callback, after_agent_callback
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up_db_pool(callback_context):
+    """Precalienta el pool compartido antes de lanzar los sub-agentes en paralelo."""
+    # Abre el span raíz: una traza por mensaje de usuario
+    before_agent_callback(callback_context)
+    start_metrics_server(settings.PROMETHEUS_PORT)
+    try:
+        await init_pool()
+    except Exception as e:
+        # Solo es una optimización: cada tool reintenta al pedir conexión (get_pool)
+        # y degrada con su propio manejo de errores si la BD sigue sin responder
+        logger.warning(f"⚠️ No se pudo precalentar el pool de conexiones: {type(e).__name__}: {e}")
+    return None
 
 # Agente paralelo para análisis simultáneo
 parallel_analyzer = ParallelAgent(
@@ -19,7 +40,9 @@ parallel_analyzer = ParallelAgent(
         sentiment_agent,
         knowledge_agent,
         priority_agent
-    ]
+    ],
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback
 )
 
 # Agente raíz que combina análisis paralelo + síntesis secuencial
@@ -29,7 +52,9 @@ root_agent = SequentialAgent(
     sub_agents=[
         parallel_analyzer,
         response_synthesizer
-    ]
+    ],
+    before_agent_callback=warm_up_db_pool,
+    after_agent_callback=after_agent_callback
 )
 
 print("Customer Service Agent System Loaded Successfully!")
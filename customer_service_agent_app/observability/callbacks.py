@@ -0,0 +1,74 @@
+# customer_service_agent_app/observability/callbacks.py
+"""
+Callbacks de ADK que combinan métricas Prometheus y trazas.
+
+ADK admite un único callable por tipo de callback, así que los agentes registran
+estos en lugar de los de cada subsistema por separado.
+"""
+from typing import Any, Dict, Optional
+
+from .prometheus_metrics import before_tool_timer, after_tool_timer
+from .tracing import tracer
+
+
+def _agent_key(callback_context) -> tuple:
+    return ("agent", callback_context.invocation_id, callback_context.agent_name)
+
+
+def before_agent_callback(callback_context) -> None:
+    if tracer.enabled:
+        tracer.start_span(f"agent.{callback_context.agent_name}", key=_agent_key(callback_context),
+                          invocation_id=callback_context.invocation_id,
+                          **{"adk.agent": callback_context.agent_name,
+                             "adk.invocation_id": callback_context.invocation_id})
+    return None
+
+
+def after_agent_callback(callback_context) -> None:
+    if tracer.enabled:
+        tracer.end_span(key=_agent_key(callback_context))
+    return None
+
+
+def before_model_callback(callback_context, llm_request) -> None:
+    if tracer.enabled:
+        tracer.start_span(f"llm.{callback_context.agent_name}",
+                          key=("llm",) + _agent_key(callback_context)[1:],
+                          invocation_id=callback_context.invocation_id, kind="client",
+                          **{"llm.model": getattr(llm_request, "model", None) or "unknown"})
+    return None
+
+
+def after_model_callback(callback_context, llm_response) -> None:
+    if tracer.enabled:
+        attributes = {}
+        usage = getattr(llm_response, "usage_metadata", None)
+        if usage is not None:
+            attributes["llm.prompt_tokens"] = getattr(usage, "prompt_token_count", None) or 0
+            attributes["llm.completion_tokens"] = getattr(usage, "candidates_token_count", None) or 0
+        tracer.end_span(key=("llm",) + _agent_key(callback_context)[1:],
+                        error=getattr(llm_response, "error_message", None), **attributes)
+    return None
+
+
+def _tool_key(tool, tool_context) -> tuple:
+    return ("tool", getattr(tool_context, "function_call_id", None) or id(tool_context), tool.name)
+
+
+def before_tool_callback(tool, args: Dict[str, Any], tool_context) -> Optional[Dict]:
+    before_tool_timer(tool, args, tool_context)
+    if tracer.enabled:
+        tracer.start_span(f"tool.{tool.name}", key=_tool_key(tool, tool_context),
+                          invocation_id=tool_context.invocation_id,
+                          # Las tools MCP son una ida y vuelta stdio al servidor de conocimiento
+                          kind="client" if type(tool).__name__ == "MCPTool" else "internal",
+                          **{"tool.name": tool.name})
+    return None
+
+
+def after_tool_callback(tool, args: Dict[str, Any], tool_context, tool_response) -> Optional[Dict]:
+    after_tool_timer(tool, args, tool_context, tool_response)
+    if tracer.enabled:
+        error = tool_response.get("error") if isinstance(tool_response, dict) else None
+        tracer.end_span(key=_tool_key(tool, tool_context), error=str(error) if error else None)
+    return None
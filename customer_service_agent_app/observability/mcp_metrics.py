@@ -7,7 +7,7 @@ from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from collections import defaultdict, deque
-import statistics
+import math
 
 @dataclass
 class MCPMetrics:
@@ -27,13 +27,149 @@ class MCPMetrics:
         data['timestamp'] = self.timestamp.isoformat()
         return data
 
+class LatencyHistogram:
+    """
+    Histograma logarítmico de memoria constante (estilo HDR / DDSketch).
+
+    Cada valor cae en el cubo ceil(log_gamma(v)), con gamma = (1 + e) / (1 - e):
+    los cuantiles tienen un error relativo máximo `e` (1% por defecto) y el número
+    de cubos solo depende del rango de valores, no del número de consultas.
+    """
+
+    def __init__(self, relative_error: float = 0.01, min_value: float = 0.01):
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        index = math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Punto medio del cubo: garantiza el error relativo
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_latency_ms": round(self.mean, 2),
+            "p50_latency_ms": round(self.quantile(0.50), 2),
+            "p95_latency_ms": round(self.quantile(0.95), 2),
+            "p99_latency_ms": round(self.quantile(0.99), 2),
+            "p999_latency_ms": round(self.quantile(0.999), 2),
+            "min_latency_ms": round(self.min, 2) if self.count else 0.0,
+            "max_latency_ms": round(self.max, 2)
+        }
+
+
+class RollingWindow:
+    """
+    Ventanas deslizantes de latencia, consultas y errores.
+
+    El tiempo se divide en franjas de `slot_seconds`; cada franja guarda su propio
+    histograma y contadores. Una ventana se obtiene fusionando las últimas franjas,
+    así que el coste no depende del tráfico.
+    """
+
+    def __init__(self, slot_seconds: int = 10, slots: int = 90):
+        self.slot_seconds = slot_seconds
+        self.slots: deque = deque(maxlen=slots)  # (inicio_franja, histograma, consultas, errores)
+
+    def _current_slot(self, now: float) -> list:
+        start = int(now // self.slot_seconds) * self.slot_seconds
+        if not self.slots or self.slots[-1][0] != start:
+            self.slots.append([start, LatencyHistogram(), 0, 0])
+        return self.slots[-1]
+
+    def record(self, latency_ms: float, error: bool, now: Optional[float] = None):
+        slot = self._current_slot(now or time.time())
+        slot[2] += 1
+        if error:
+            slot[3] += 1
+        else:
+            slot[1].record(latency_ms)
+
+    def window(self, seconds: int, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        merged = LatencyHistogram()
+        queries = errors = 0
+        for start, histogram, slot_queries, slot_errors in self.slots:
+            if start > now - seconds:
+                merged.merge(histogram)
+                queries += slot_queries
+                errors += slot_errors
+        summary = merged.summary()
+        summary.update({
+            "queries": queries,
+            "qps": round(queries / seconds, 3),
+            "error_rate": round(errors / queries * 100, 2) if queries else 0.0
+        })
+        return summary
+
+
+# Ventanas reportadas en el resumen (etiqueta -> segundos)
+SUMMARY_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class _FallbackStats:
+    """Agregados acumulados de un tipo de fallback."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.window = RollingWindow()
+        self.count = 0
+        self.errors = 0
+        self.similarity_sum = 0.0
+        self.similarity_count = 0
+        self.best_similarity_sum = 0.0
+        self.best_similarity_count = 0
+
+
 class MCPObserver:
     """Observador no invasivo para métricas del servidor MCP"""
     
     def __init__(self, max_history: int = 1000):
         self.max_history = max_history
+        # Solo para export_metrics y la actividad reciente: los resúmenes usan los agregados
         self.metrics_history = deque(maxlen=max_history)
-        self.session_stats = defaultdict(list)
+        self.latency = LatencyHistogram()
+        self.window = RollingWindow()
+        self.fallback_stats: Dict[str, _FallbackStats] = defaultdict(_FallbackStats)
+        self.similarity_sum = 0.0
+        self.similarity_count = 0
+        self.query_length_sum = 0
+        self.response_length_sum = 0
         self.error_count = 0
         self.total_queries = 0
         self.start_time = datetime.now()
@@ -42,12 +178,29 @@ class MCPObserver:
         """Registra métricas de búsqueda sin interferir con el flujo"""
         self.metrics_history.append(metrics)
         self.total_queries += 1
+        self.query_length_sum += len(metrics.query)
+        is_error = metrics.error is not None
         
-        if metrics.error:
+        # Agregados acumulados (todo el uptime) y por tipo de fallback
+        stats = self.fallback_stats[metrics.fallback_used]
+        stats.count += 1
+        self.window.record(metrics.latency_ms, is_error)
+        stats.window.record(metrics.latency_ms, is_error)
+        if is_error:
             self.error_count += 1
-        
-        # Agregar a estadísticas de sesión por tipo de fallback
-        self.session_stats[metrics.fallback_used].append(metrics.latency_ms)
+            stats.errors += 1
+        else:
+            self.latency.record(metrics.latency_ms)
+            stats.latency.record(metrics.latency_ms)
+            self.response_length_sum += metrics.response_length
+            if metrics.similarity_scores:
+                self.similarity_sum += sum(metrics.similarity_scores)
+                self.similarity_count += len(metrics.similarity_scores)
+                stats.similarity_sum += sum(metrics.similarity_scores)
+                stats.similarity_count += len(metrics.similarity_scores)
+        if metrics.similarity_scores and max(metrics.similarity_scores) > 0:
+            stats.best_similarity_sum += max(metrics.similarity_scores)
+            stats.best_similarity_count += 1
         
         # Log para debugging (opcional)
         print(f"[METRICS] Query: '{metrics.query[:50]}...' | "
@@ -56,62 +209,43 @@ class MCPObserver:
               f"Results: {metrics.results_count}")
     
     def get_performance_summary(self) -> Dict[str, Any]:
-        """Genera resumen de rendimiento para dashboard"""
-        if not self.metrics_history:
+        """Genera resumen de rendimiento para dashboard (O(1) respecto al número de consultas)"""
+        if not self.total_queries:
             return {
                 "status": "no_data",
                 "message": "No hay datos de métricas disponibles aún"
             }
         
-        # Convertir a lista para facilitar cálculos
-        recent_metrics = list(self.metrics_history)
-        
-        # Métricas de latencia
-        latencies = [m.latency_ms for m in recent_metrics if m.error is None]
-        
-        if not latencies:
+        if not self.latency.count:
             return {"status": "no_valid_data", "error_rate": 100.0}
         
-        # Estadísticas de latencia
-        avg_latency = statistics.mean(latencies)
-        median_latency = statistics.median(latencies)
-        p95_latency = self._percentile(latencies, 95)
-        
-        # Análisis de fallback
-        fallback_counts = defaultdict(int)
-        for m in recent_metrics:
-            fallback_counts[m.fallback_used] += 1
-        
-        total_valid = len([m for m in recent_metrics if m.error is None])
+        total_valid = self.latency.count
         fallback_rates = {
-            fb_type: (count / total_valid * 100) if total_valid > 0 else 0
-            for fb_type, count in fallback_counts.items()
+            fb_type: (stats.count / total_valid * 100)
+            for fb_type, stats in self.fallback_stats.items()
         }
         
-        # Análisis de calidad de resultados
-        similarity_scores = []
-        for m in recent_metrics:
-            if m.similarity_scores and m.error is None:
-                similarity_scores.extend(m.similarity_scores)
-        
-        avg_similarity = statistics.mean(similarity_scores) if similarity_scores else 0.0
-        
         # Métricas de throughput
         uptime_minutes = (datetime.now() - self.start_time).total_seconds() / 60
         queries_per_minute = self.total_queries / uptime_minutes if uptime_minutes > 0 else 0
+        last_metric = self.metrics_history[-1] if self.metrics_history else None
         
+        latency = self.latency.summary()
         return {
             "status": "active",
             "timestamp": datetime.now().isoformat(),
             "performance": {
-                "avg_latency_ms": round(avg_latency, 2),
-                "median_latency_ms": round(median_latency, 2),
-                "p95_latency_ms": round(p95_latency, 2),
-                "min_latency_ms": round(min(latencies), 2),
-                "max_latency_ms": round(max(latencies), 2)
+                "avg_latency_ms": latency["avg_latency_ms"],
+                "median_latency_ms": latency["p50_latency_ms"],
+                "p95_latency_ms": latency["p95_latency_ms"],
+                "p99_latency_ms": latency["p99_latency_ms"],
+                "p999_latency_ms": latency["p999_latency_ms"],
+                "min_latency_ms": latency["min_latency_ms"],
+                "max_latency_ms": latency["max_latency_ms"],
+                "relative_error": self.latency.relative_error
             },
             "quality": {
-                "avg_similarity_score": round(avg_similarity, 3),
+                "avg_similarity_score": round(self.similarity_sum / self.similarity_count, 3) if self.similarity_count else 0.0,
                 "semantic_success_rate": fallback_rates.get("semantic", 0),
                 "fallback_rates": fallback_rates
             },
@@ -121,62 +255,49 @@ class MCPObserver:
                 "error_rate": round((self.error_count / self.total_queries * 100) if self.total_queries > 0 else 0, 2),
                 "uptime_minutes": round(uptime_minutes, 2)
             },
+            "windows": {
+                label: self.window.window(seconds)
+                for label, seconds in SUMMARY_WINDOWS.items()
+            },
+            "by_fallback": {
+                fb_type: {
+                    **stats.latency.summary(),
+                    "queries": stats.count,
+                    "errors": stats.errors,
+                    "last_5m": stats.window.window(SUMMARY_WINDOWS["5m"])
+                }
+                for fb_type, stats in self.fallback_stats.items()
+            },
             "recent_activity": {
-                "last_query_time": recent_metrics[-1].timestamp.isoformat() if recent_metrics else None,
-                "recent_queries_count": len(recent_metrics),
+                "last_query_time": last_metric.timestamp.isoformat() if last_metric else None,
+                "recent_queries_count": len(self.metrics_history),
                 "window_size": self.max_history
             }
         }
     
     def get_search_analytics(self) -> Dict[str, Any]:
         """Análisis detallado de patrones de búsqueda"""
-        if not self.metrics_history:
+        if not self.total_queries:
             return {"status": "no_data"}
         
-        recent_metrics = list(self.metrics_history)
-        
-        # Análisis de patrones de consulta
-        query_lengths = [len(m.query) for m in recent_metrics]
-        response_lengths = [m.response_length for m in recent_metrics if m.error is None]
-        
-        # Top consultas por tipo de fallback
-        fallback_patterns = defaultdict(list)
-        for m in recent_metrics:
-            fallback_patterns[m.fallback_used].append({
-                "query": m.query[:100],  # Truncar para privacidad
-                "latency": m.latency_ms,
-                "similarity": max(m.similarity_scores) if m.similarity_scores else 0
-            })
-        
         return {
             "query_patterns": {
-                "avg_query_length": round(statistics.mean(query_lengths), 1) if query_lengths else 0,
-                "avg_response_length": round(statistics.mean(response_lengths), 1) if response_lengths else 0,
-                "most_common_fallback": max(fallback_patterns.keys(), 
-                                          key=lambda k: len(fallback_patterns[k])) if fallback_patterns else None
+                "avg_query_length": round(self.query_length_sum / self.total_queries, 1),
+                "avg_response_length": round(self.response_length_sum / self.latency.count, 1) if self.latency.count else 0,
+                "most_common_fallback": max(self.fallback_stats.keys(),
+                                          key=lambda k: self.fallback_stats[k].count) if self.fallback_stats else None
             },
             "fallback_analysis": {
                 fb_type: {
-                    "count": len(queries),
-                    "avg_latency": round(statistics.mean([q["latency"] for q in queries]), 2) if queries else 0,
-                    "avg_similarity": round(statistics.mean([q["similarity"] for q in queries if q["similarity"] > 0]), 3) if queries else 0
+                    "count": stats.count,
+                    "avg_latency": round(stats.latency.mean, 2),
+                    "p95_latency": round(stats.latency.quantile(0.95), 2),
+                    "avg_similarity": round(stats.best_similarity_sum / stats.best_similarity_count, 3) if stats.best_similarity_count else 0
                 }
-                for fb_type, queries in fallback_patterns.items()
+                for fb_type, stats in self.fallback_stats.items()
             }
         }
     
-    def _percentile(self, data: List[float], percentile: int) -> float:
-        """Calcula percentil de una lista de datos"""
-        if not data:
-            return 0.0
-        sorted_data = sorted(data)
-        k = (len(sorted_data) - 1) * (percentile / 100)
-        f = int(k)
-        c = k - f
-        if f + 1 < len(sorted_data):
-            return sorted_data[f] * (1 - c) + sorted_data[f + 1] * c
-        return sorted_data[f]
-    
     def export_metrics(self, format: str = "json") -> str:
         """Exporta métricas para análisis externo"""
         if format == "json":
@@ -192,7 +313,13 @@ class MCPObserver:
     def reset_metrics(self):
         """Reinicia las métricas (útil para testing)"""
         self.metrics_history.clear()
-        self.session_stats.clear()
+        self.latency = LatencyHistogram()
+        self.window = RollingWindow()
+        self.fallback_stats.clear()
+        self.similarity_sum = 0.0
+        self.similarity_count = 0
+        self.query_length_sum = 0
+        self.response_length_sum = 0
         self.error_count = 0
         self.total_queries = 0
         self.start_time = datetime.now()
@@ -0,0 +1,125 @@
+# customer_service_agent_app/observability/prometheus_metrics.py
+"""
+Métricas Prometheus / OpenMetrics del pipeline de agentes.
+
+- Latencia de cada tool (contexto de cliente, sentimiento, prioridad, búsqueda MCP)
+- Tiempo de uso de conexión por repositorio y espera del pool
+- Aciertos / fallos de cachés
+
+Se exponen en http://<host>:PROMETHEUS_PORT/metrics (el formato OpenMetrics se
+negocia con la cabecera Accept). `prometheus_client` es opcional: si no está
+instalado, las métricas son no-op y el agente funciona igual.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cubos en segundos: de 1 ms a 30 s (tools con LLM/BD/MCP)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NoopMetric:
+    """Sustituto cuando prometheus_client no está instalado."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    registry = CollectorRegistry()
+
+    TOOL_LATENCY = Histogram(
+        "agent_tool_latency_seconds", "Latencia de las tools de los agentes",
+        ["agent", "tool", "status"], buckets=LATENCY_BUCKETS, registry=registry)
+    DB_QUERY_TIME = Histogram(
+        "db_query_seconds", "Tiempo con la conexión en uso por repositorio",
+        ["repository"], buckets=LATENCY_BUCKETS, registry=registry)
+    DB_POOL_WAIT = Histogram(
+        "db_pool_wait_seconds", "Espera para obtener una conexión del pool",
+        buckets=LATENCY_BUCKETS, registry=registry)
+    CACHE_REQUESTS = Counter(
+        "cache_requests", "Consultas a cachés por resultado (hit/miss)",
+        ["cache", "result"], registry=registry)
+else:
+    registry = None
+    TOOL_LATENCY = DB_QUERY_TIME = DB_POOL_WAIT = CACHE_REQUESTS = _NoopMetric()
+
+_server_started = False
+# Un solo intento por proceso: se llama en cada turno y un puerto ocupado no se reintenta
+_server_attempted = False
+
+
+def start_metrics_server(port: int) -> bool:
+    """Arranca el endpoint HTTP una sola vez por proceso (port=0 lo desactiva)."""
+    global _server_started, _server_attempted
+    if _server_attempted or not port:
+        return _server_started
+    _server_attempted = True
+    if not PROMETHEUS_AVAILABLE:
+        logger.warning("prometheus_client no instalado; endpoint de métricas desactivado")
+        return False
+    try:
+        start_http_server(port, registry=registry)
+        _server_started = True
+        logger.info(f"📈 Métricas Prometheus en http://0.0.0.0:{port}/metrics")
+    except OSError as e:
+        logger.error(f"❌ No se pudo abrir el puerto de métricas {port}: {e}")
+    return _server_started
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def track_db(repository: str):
+    """Mide el tiempo que un repositorio mantiene una conexión del pool."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_QUERY_TIME.labels(repository=repository).observe(time.perf_counter() - start)
+
+
+# --- Latencia de tools vía callbacks de LlmAgent ---
+# Funciona igual para tools locales y para las del MCPToolset (ida y vuelta stdio).
+_MAX_IN_FLIGHT = 1024
+_tool_starts: Dict[Any, float] = {}
+
+
+def _call_key(tool, tool_context) -> Any:
+    return getattr(tool_context, "function_call_id", None) or (id(tool_context), tool.name)
+
+
+def before_tool_timer(tool, args: Dict[str, Any], tool_context) -> Optional[Dict]:
+    if len(_tool_starts) >= _MAX_IN_FLIGHT:
+        _tool_starts.clear()  # Llamadas que terminaron en excepción no pasan por el after
+    _tool_starts[_call_key(tool, tool_context)] = time.perf_counter()
+    return None
+
+
+def after_tool_timer(tool, args: Dict[str, Any], tool_context, tool_response) -> Optional[Dict]:
+    start = _tool_starts.pop(_call_key(tool, tool_context), None)
+    if start is not None:
+        is_error = isinstance(tool_response, dict) and "error" in tool_response
+        TOOL_LATENCY.labels(
+            agent=getattr(tool_context, "agent_name", "unknown"),
+            tool=tool.name,
+            status="error" if is_error else "ok"
+        ).observe(time.perf_counter() - start)
+    return None
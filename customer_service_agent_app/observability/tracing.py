@@ -0,0 +1,270 @@
+# customer_service_agent_app/observability/tracing.py
+"""
+Trazas de extremo a extremo con spans al estilo OpenTelemetry.
+
+Cada mensaje de usuario (una invocación de root_agent) es una traza. Dentro de ella:
+    agent.CustomerServiceAgent
+      agent.ParallelCustomerAnalyzer
+        agent.ContextAnalyzer -> llm.ContextAnalyzer, tool.get_customer_context -> db.customer
+        agent.KnowledgeSearcher -> tool.search_knowledge (ida y vuelta stdio al servidor MCP)
+        ...
+      agent.ResponseSynthesizer -> llm.ResponseSynthesizer
+
+Los spans se exportan en segundo plano (sin bloquear el event loop):
+    TRACING_EXPORTER=file   JSONL en TRACING_FILE (por defecto traces.jsonl)
+    TRACING_EXPORTER=otlp   OTLP/HTTP JSON a TRACING_OTLP_ENDPOINT (p.ej. un OpenTelemetry Collector)
+    TRACING_EXPORTER=none   desactivado
+
+El desglose del camino crítico se obtiene con scripts/trace_report.py.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "customer-service-agent"
+_MAX_OPEN_SPANS = 1024
+
+
+@dataclass
+class Span:
+    """Span con los mismos campos que el modelo de datos de OpenTelemetry."""
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    name: str
+    kind: str = "internal"
+    start_time_unix_nano: int = field(default_factory=time.time_ns)
+    end_time_unix_nano: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    invocation_id: Optional[str] = None
+    parent: Optional["Span"] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class SpanExporter:
+    """Exporta spans terminados desde un hilo propio, por lotes."""
+
+    def __init__(self, exporter: str, file_path: str, otlp_endpoint: str, flush_seconds: float = 1.0):
+        self.exporter = exporter
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") + "/v1/traces"
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.SimpleQueue[Span]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter in ("file", "otlp")
+
+    def export(self, span: Span):
+        if not self.enabled:
+            return
+        self._queue.put(span)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    # El hilo es daemon: el último lote se vuelca al salir del proceso
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        batch: List[Span] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            if self.exporter == "file":
+                self._write_file(batch)
+            else:
+                self._post_otlp(batch)
+        except Exception as e:
+            logger.error(f"Error exportando {len(batch)} spans: {e}")
+
+    def _write_file(self, batch: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in batch)
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _post_otlp(self, batch: List[Span]):
+        body = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "customer_service_agent_app"},
+                "spans": [_otlp_span(span) for span in batch],
+            }],
+        }]}).encode("utf-8")
+        request = urllib.request.Request(self.otlp_endpoint, data=body,
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _OTLP_KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_time_unix_nano),
+        "endTimeUnixNano": str(span.end_time_unix_nano),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2 if span.status == "error" else 1},
+    }
+    if span.parent_span_id:
+        data["parentSpanId"] = span.parent_span_id
+    return data
+
+
+class Tracer:
+    """
+    Mantiene el span activo en un ContextVar (se propaga a las tareas de ParallelAgent)
+    y los spans abiertos por clave, para cerrarlos desde los callbacks `after_*` de ADK.
+    """
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+        self._current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+        self._open: Dict[Any, Span] = {}
+        self._roots: Dict[str, Span] = {}  # invocation_id -> span raíz
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter.enabled
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def start_span(self, name: str, key: Any = None, invocation_id: Optional[str] = None,
+                   kind: str = "internal", **attributes) -> Span:
+        parent = self._current.get()
+        if invocation_id is not None and (parent is None or parent.invocation_id != invocation_id):
+            # El contexto no llegó (otra tarea / runner): se cuelga de la raíz de la invocación
+            parent = self._roots.get(invocation_id)
+
+        span = Span(
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_span_id=parent.span_id if parent else None,
+            name=name,
+            kind=kind,
+            attributes=attributes,
+            invocation_id=invocation_id or (parent.invocation_id if parent else None),
+            parent=parent,
+        )
+        if parent is None and invocation_id is not None:
+            if len(self._roots) >= _MAX_OPEN_SPANS:
+                self._roots.clear()  # Raíces cuyo after_agent no llegó (excepción en la invocación)
+            self._roots[invocation_id] = span
+        if key is not None:
+            if len(self._open) >= _MAX_OPEN_SPANS:
+                self._open.clear()  # Spans cuyo after_* no llegó (excepción en el modelo o la tool)
+            self._open[key] = span
+        self._current.set(span)
+        return span
+
+    def end_span(self, span: Optional[Span] = None, key: Any = None, error: Optional[str] = None,
+                 **attributes) -> Optional[Span]:
+        if key is not None:
+            span = self._open.pop(key, None)
+        if span is None or span.end_time_unix_nano is not None:
+            return None
+        span.end_time_unix_nano = time.time_ns()
+        span.attributes.update(attributes)
+        if error:
+            span.status = "error"
+            span.attributes["error.message"] = error
+        if span.parent_span_id is None and span.invocation_id is not None:
+            self._roots.pop(span.invocation_id, None)
+            self._end_orphans(span)
+        if self._current.get() is span:
+            self._current.set(span.parent)
+        span.parent = None  # No retener el árbol una vez exportado
+        self.exporter.export(span)
+        return span
+
+    def _end_orphans(self, root: Span):
+        """Cierra con error los spans de la invocación que siguen abiertos al cerrar la raíz."""
+        orphans = [key for key, span in self._open.items() if span.invocation_id == root.invocation_id]
+        for key in orphans:
+            span = self._open.pop(key)
+            span.end_time_unix_nano = root.end_time_unix_nano
+            span.status = "error"
+            span.attributes["error.message"] = "span sin cerrar al terminar la invocación"
+            span.parent = None
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Span para bloques de código (repositorios, llamadas puntuales)."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            self.end_span(span, error=f"{type(e).__name__}: {e}")
+            raise
+        else:
+            self.end_span(span)
+
+
+tracer = Tracer(SpanExporter(
+    exporter=settings.TRACING_EXPORTER.lower(),
+    file_path=settings.TRACING_FILE,
+    otlp_endpoint=settings.TRACING_OTLP_ENDPOINT,
+))
+
+
+def get_tracer() -> Tracer:
+    return tracer
@@ -0,0 +1,93 @@
+# customer_service_agent_app/repository/cache.py
+"""
+Caché en memoria LRU con caducidad (TTL) para los repositorios.
+
+Las entradas se guardan por proceso y se comparten entre todas las instancias
+de un repositorio. Los métodos de escritura del repositorio deben actualizar o
+invalidar la entrada correspondiente (write-through); el TTL limita lo que puede
+quedar desactualizado por escrituras de otros procesos.
+"""
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from customer_service_agent_app.observability.prometheus_metrics import record_cache
+
+
+class TTLCache:
+    """LRU con TTL por entrada y estadísticas de aciertos."""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave -> (expira, valor)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Se incrementa con cada escritura: evita guardar una lectura que empezó antes
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Devuelve una copia del valor (los llamadores pueden modificarla) o None."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            record_cache(self.name, hit=False)
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        record_cache(self.name, hit=True)
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        Guarda una copia del valor. Con `generation` (leída antes de consultar la BD)
+        no se guarda si hubo escrituras entretanto, para no cachear datos ya viejos.
+        """
+        if not self.enabled or value is None:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def update(self, key: Hashable, updater: Callable[[Any], None]):
+        """Aplica una escritura a la entrada en caché, si existe (sin renovar el TTL)."""
+        self.generation += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            updater(entry[1])
+
+    def invalidate(self, key: Hashable):
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+        }
@@ -3,85 +3,110 @@
 Repositorio para gestión de clientes con PostgreSQL
 Reemplaza los datos en memoria del CustomerContextTool
 """
-import asyncpg
-from typing import Optional, Dict, Any, List
+import json
+import logging
+import time
+from typing import Optional, Dict, Any, List, AsyncIterator, Iterable
 from datetime import datetime, timedelta
+
+import asyncpg
+
 from config.settings import settings
+from .cache import TTLCache
+from .database import acquire, close_pool
+
+logger = logging.getLogger(__name__)
+
+# Perfil + interacciones recientes por customer_id, compartido por todas las instancias.
+# Las escrituras de este repositorio lo mantienen al día; el TTL cubre otros procesos.
+customer_cache = TTLCache(
+    "customer",
+    max_size=settings.CUSTOMER_CACHE_SIZE,
+    ttl_seconds=settings.CUSTOMER_CACHE_TTL_SECONDS
+)
 
 class CustomerRepository:
     """Repositorio para gestión de datos de clientes en PostgreSQL"""
     
-    def __init__(self):
-        
-        self.connection_params = {
-            "host": "127.0.0.1",  # Siempre localhost para el proxy
-            "port": settings.PROXY_PORT,
-            "database": settings.DB_NAME,
-            "user": settings.DB_USER,
-            "password": settings.DB_PASSWORD
-        }
-       
-    async def get_connection(self):
-        """Obtener conexión a la base de datos"""
-        return await asyncpg.connect(**self.connection_params)
+    def get_connection(self):
+        """Obtener conexión del pool compartido (usar con `async with`)"""
+        return acquire("customer")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de clientes del proceso"""
+        return customer_cache.stats()
     
     async def get_customer_by_id(self, customer_id: str) -> Optional[Dict[str, Any]]:
-        """Obtener cliente por ID desde PostgreSQL"""
-        conn = await self.get_connection()
+        """Obtener cliente por ID (caché en memoria, si no PostgreSQL)"""
+        cached = customer_cache.get(customer_id)
+        if cached is not None:
+            return cached
         
-        try:
-            # Consultar datos básicos del cliente
+        generation = customer_cache.generation
+        customer = await self._fetch_customer(customer_id)
+        customer_cache.put(customer_id, customer, generation)
+        return customer
+    
+    async def _fetch_customer(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Perfil y últimas 5 interacciones en una sola consulta (LATERAL + array_agg).
+        asyncpg la prepara una vez por conexión del pool y reutiliza el plan.
+        """
+        async with self.get_connection() as conn:
             customer_row = await conn.fetchrow("""
-                SELECT customer_id, name, tier, join_date, satisfaction_score, 
-                       total_interactions, preferred_channel, language,
-                       created_at, updated_at
-                FROM customer_profiles 
-                WHERE customer_id = $1
+                SELECT p.customer_id, p.name, p.tier, p.join_date, p.satisfaction_score,
+                       p.total_interactions, p.preferred_channel, p.language,
+                       p.created_at, p.updated_at,
+                       recent.issue_types AS recent_issues,
+                       recent.last_interaction_at
+                FROM customer_profiles p
+                LEFT JOIN LATERAL (
+                    SELECT array_agg(i.issue_type ORDER BY i.created_at DESC)
+                               FILTER (WHERE i.issue_type IS NOT NULL) AS issue_types,
+                           max(i.created_at) AS last_interaction_at
+                    FROM (
+                        SELECT issue_type, created_at
+                        FROM customer_interactions
+                        WHERE customer_id = p.customer_id
+                        ORDER BY created_at DESC
+                        LIMIT 5
+                    ) i
+                ) recent ON TRUE
+                WHERE p.customer_id = $1
             """, customer_id)
             
             if not customer_row:
                 return None
             
-            # Convertir a diccionario
-            customer_data = dict(customer_row)
-            
-            # Obtener interacciones recientes
-            recent_interactions = await conn.fetch("""
-                SELECT issue_type, sentiment, priority_level, created_at
-                FROM customer_interactions 
-                WHERE customer_id = $1 
-                ORDER BY created_at DESC 
-                LIMIT 5
-            """, customer_id)
-            
-            # Extraer tipos de issues recientes
-            recent_issues = [interaction['issue_type'] for interaction in recent_interactions if interaction['issue_type']]
-            
-            # Formatear datos para compatibilidad con herramienta original
-            formatted_customer = {
-                "customer_id": customer_data["customer_id"],
-                "name": customer_data["name"],
-                "tier": customer_data["tier"],
-                "join_date": customer_data["join_date"].strftime("%Y-%m-%d") if customer_data["join_date"] else None,
-                "total_interactions": customer_data["total_interactions"],
-                "recent_issues": recent_issues,
-                "satisfaction_score": customer_data["satisfaction_score"],
-                "last_interaction": recent_interactions[0]['created_at'].strftime("%Y-%m-%d") if recent_interactions else None,
-                "preferred_channel": customer_data["preferred_channel"],
-                "language": customer_data["language"]
-            }
-            
-            return formatted_customer
-            
-        finally:
-            await conn.close()
+            return self._format_customer(customer_row)
+    
+    @staticmethod
+    def _format_customer(customer_row) -> Dict[str, Any]:
+        """Formatear datos para compatibilidad con herramienta original"""
+        last_interaction = customer_row["last_interaction_at"]
+        return {
+            "customer_id": customer_row["customer_id"],
+            "name": customer_row["name"],
+            "tier": customer_row["tier"],
+            "join_date": customer_row["join_date"].strftime("%Y-%m-%d") if customer_row["join_date"] else None,
+            "total_interactions": customer_row["total_interactions"],
+            "recent_issues": list(customer_row["recent_issues"] or []),
+            "satisfaction_score": customer_row["satisfaction_score"],
+            "last_interaction": last_interaction.strftime("%Y-%m-%d") if last_interaction else None,
+            "preferred_channel": customer_row["preferred_channel"],
+            "language": customer_row["language"]
+        }
     
     async def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
         """
         Obtener contexto completo del cliente (compatible con tool original)
         """
         customer_data = await self.get_customer_by_id(customer_id)
-        
+        return self._build_context(customer_id, customer_data)
+    
+    @staticmethod
+    def _build_context(customer_id: str, customer_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Contexto con métricas calculadas (o el error de cliente no encontrado)"""
         if not customer_data:
             return {
                 "error": f"Customer {customer_id} not found",
@@ -115,11 +140,88 @@ class CustomerRepository:
             }
         }
     
+    # --- Lecturas masivas (re-scoring nocturno, campañas) ---
+    # Una consulta por bloque de ids en lugar de dos por cliente. No pasan por la
+    # caché en memoria para no desalojar a los clientes con conversaciones activas.
+    
+    async def _fetch_customers_chunk(self, customer_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Perfiles y top-5 de interacciones de un bloque de clientes en una consulta"""
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT p.customer_id, p.name, p.tier, p.join_date, p.satisfaction_score,
+                       p.total_interactions, p.preferred_channel, p.language,
+                       p.created_at, p.updated_at,
+                       recent.issue_types AS recent_issues,
+                       recent.last_interaction_at
+                FROM customer_profiles p
+                LEFT JOIN (
+                    SELECT ranked.customer_id,
+                           array_agg(ranked.issue_type ORDER BY ranked.created_at DESC)
+                               FILTER (WHERE ranked.issue_type IS NOT NULL) AS issue_types,
+                           max(ranked.created_at) AS last_interaction_at
+                    FROM (
+                        SELECT customer_id, issue_type, created_at,
+                               row_number() OVER (PARTITION BY customer_id ORDER BY created_at DESC) AS rn
+                        FROM customer_interactions
+                        WHERE customer_id = ANY($1::varchar[])
+                    ) ranked
+                    WHERE ranked.rn <= 5
+                    GROUP BY ranked.customer_id
+                ) recent ON recent.customer_id = p.customer_id
+                WHERE p.customer_id = ANY($1::varchar[])
+            """, customer_ids)
+        
+        return {row["customer_id"]: self._format_customer(row) for row in rows}
+    
+    @staticmethod
+    def _chunks(customer_ids: Iterable[str], chunk_size: int) -> Iterable[List[str]]:
+        """Bloques de ids sin duplicados, conservando el orden de entrada"""
+        chunk: List[str] = []
+        seen = set()
+        for customer_id in customer_ids:
+            if customer_id in seen:
+                continue
+            seen.add(customer_id)
+            chunk.append(customer_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    async def iter_customer_contexts(self, customer_ids: Iterable[str],
+                                     chunk_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Contextos de clientes en streaming, una consulta por bloque de `chunk_size` ids.
+        Cada elemento tiene la misma forma que get_customer_context (incluido el
+        error de cliente no encontrado). La conexión se libera entre bloques.
+        """
+        chunk_size = chunk_size or settings.CUSTOMER_BULK_CHUNK_SIZE
+        for chunk in self._chunks(customer_ids, chunk_size):
+            customers = await self._fetch_customers_chunk(chunk)
+            for customer_id in chunk:
+                yield self._build_context(customer_id, customers.get(customer_id))
+    
+    async def get_customers_by_ids(self, customer_ids: Iterable[str],
+                                   chunk_size: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Datos de varios clientes (misma forma que get_customer_by_id); omite los inexistentes"""
+        chunk_size = chunk_size or settings.CUSTOMER_BULK_CHUNK_SIZE
+        customers: Dict[str, Dict[str, Any]] = {}
+        for chunk in self._chunks(customer_ids, chunk_size):
+            customers.update(await self._fetch_customers_chunk(chunk))
+        return customers
+    
+    async def get_customer_contexts(self, customer_ids: Iterable[str],
+                                    chunk_size: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Contextos completos por customer_id. Para listas muy grandes, usar iter_customer_contexts"""
+        return {
+            context["customer_id"]: context
+            async for context in self.iter_customer_contexts(customer_ids, chunk_size)
+        }
+    
     async def update_customer(self, customer_id: str, updates: Dict[str, Any]) -> bool:
         """Actualizar datos de cliente"""
-        conn = await self.get_connection()
-        
-        try:
+        async with self.get_connection() as conn:
             # Construir query dinámico basado en campos a actualizar
             set_clauses = []
             values = []
@@ -146,86 +248,133 @@ class CustomerRepository:
             """
             
             result = await conn.execute(query, *values)
-            return result == "UPDATE 1"
-            
-        finally:
-            await conn.close()
-    
-    async def add_interaction(self, customer_id: str, interaction_data: Dict[str, Any]) -> bool:
-        """Registrar nueva interacción"""
-        conn = await self.get_connection()
+            updated = result == "UPDATE 1"
         
+        if updated:
+            applied = {field: value for field, value in updates.items()
+                       if field in ['satisfaction_score', 'total_interactions', 'preferred_channel', 'tier']}
+            customer_cache.update(customer_id, lambda cached: cached.update(applied))
+        return updated
+    
+    async def add_interaction(self, customer_id: str, interaction_data: Dict[str, Any],
+                              satisfaction_delta: float = 0.0) -> bool:
+        """
+        Registrar nueva interacción en una sola sentencia (CTE): inserta la interacción,
+        incrementa total_interactions y, si `satisfaction_delta` != 0, ajusta
+        satisfaction_score (acotado a 0-5) en SQL. Es atómica y el bloqueo de la fila
+        del perfil serializa las sesiones concurrentes del mismo cliente.
+        """
         try:
-            # Insertar interacción
-            await conn.execute("""
-                INSERT INTO customer_interactions 
-                (customer_id, interaction_type, issue_type, message, sentiment, priority_level, agent_id)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-            """, 
-                customer_id,
-                interaction_data.get("interaction_type", "chat"),
-                interaction_data.get("issue_type"),
-                interaction_data.get("message"),
-                interaction_data.get("sentiment"),
-                interaction_data.get("priority_level"),
-                interaction_data.get("agent_id", "context_analyzer")
-            )
+            async with self.get_connection() as conn:
+                row = await conn.fetchrow("""
+                    WITH profile AS (
+                        UPDATE customer_profiles
+                        SET total_interactions = total_interactions + 1,
+                            satisfaction_score = CASE
+                                WHEN $8::float8 = 0 THEN satisfaction_score
+                                ELSE LEAST(5.0, GREATEST(0.0, satisfaction_score + $8::float8))
+                            END,
+                            updated_at = NOW()
+                        WHERE customer_id = $1
+                        RETURNING customer_id, total_interactions, satisfaction_score
+                    ), interaction AS (
+                        INSERT INTO customer_interactions
+                        (customer_id, interaction_type, issue_type, message, sentiment, priority_level, agent_id)
+                        SELECT customer_id, $2, $3, $4, $5, $6, $7 FROM profile
+                        RETURNING id
+                    )
+                    SELECT profile.total_interactions, profile.satisfaction_score, interaction.id
+                    FROM profile, interaction
+                """,
+                    customer_id,
+                    interaction_data.get("interaction_type", "chat"),
+                    interaction_data.get("issue_type"),
+                    interaction_data.get("message"),
+                    interaction_data.get("sentiment"),
+                    interaction_data.get("priority_level"),
+                    interaction_data.get("agent_id", "context_analyzer"),
+                    float(satisfaction_delta)
+                )
             
-            # Actualizar contador de interacciones del cliente
-            await conn.execute("""
-                UPDATE customer_profiles 
-                SET total_interactions = total_interactions + 1,
-                    updated_at = NOW()
-                WHERE customer_id = $1
-            """, customer_id)
+            if row is None:
+                logger.warning(f"⚠️ No se registró la interacción: cliente {customer_id} no encontrado")
+                return False
             
+            # Cambian el contador, la satisfacción, los issues recientes y la última interacción
+            customer_cache.invalidate(customer_id)
             return True
             
         except Exception as e:
             print(f"Error adding interaction: {e}")
             return False
-        finally:
-            await conn.close()
     
     async def get_customer_statistics(self) -> Dict[str, Any]:
-        """Obtener estadísticas generales de clientes"""
-        conn = await self.get_connection()
-        
-        try:
-            stats = {}
-            
-            # Conteo por tier
-            tier_stats = await conn.fetch("""
-                SELECT tier, COUNT(*) as count 
-                FROM customer_profiles 
-                GROUP BY tier
-            """)
-            stats["by_tier"] = {row["tier"]: row["count"] for row in tier_stats}
-            
-            # Total de clientes
-            total_customers = await conn.fetchval("SELECT COUNT(*) FROM customer_profiles")
-            stats["total_customers"] = total_customers
-            
-            # Promedio de satisfacción
-            avg_satisfaction = await conn.fetchval("SELECT AVG(satisfaction_score) FROM customer_profiles")
-            stats["average_satisfaction"] = round(float(avg_satisfaction), 2) if avg_satisfaction else 0.0
-            
-            # Clientes de alto riesgo
-            high_risk = await conn.fetchval("""
-                SELECT COUNT(*) FROM customer_profiles 
-                WHERE satisfaction_score < 3.5
-            """)
-            stats["high_risk_customers"] = high_risk
-            
-            return stats
+        """
+        Obtener estadísticas generales de clientes desde la vista materializada
+        customer_statistics_mv (una fila, lectura por índice). Incluye los datos
+        por tier y la tendencia diaria de interacciones; `refreshed_at` indica
+        la antigüedad de los datos.
+        """
+        async with self.get_connection() as conn:
+            try:
+                row = await conn.fetchrow("""
+                    SELECT total_customers, average_satisfaction, high_risk_customers,
+                           tiers, daily_trends, refreshed_at
+                    FROM customer_statistics_mv
+                    WHERE id
+                """)
+            except asyncpg.UndefinedTableError:
+                # Base de datos sin migrar (scripts/init_database.py): cálculo en vivo
+                logger.warning("⚠️ customer_statistics_mv no existe; calculando estadísticas en vivo")
+                row = None
             
-        finally:
-            await conn.close()
+            if row is None:
+                row = await conn.fetchrow("""
+                    SELECT COUNT(*) AS total_customers,
+                           AVG(satisfaction_score) AS average_satisfaction,
+                           COUNT(*) FILTER (WHERE satisfaction_score < 3.5) AS high_risk_customers,
+                           (
+                               -- Mismo objeto por tier que customer_statistics_mv
+                               SELECT COALESCE(jsonb_object_agg(tier, jsonb_build_object(
+                                   'count', customers,
+                                   'average_satisfaction', average_satisfaction,
+                                   'high_risk', high_risk
+                               )), '{}'::jsonb)
+                               FROM (
+                                   SELECT COALESCE(tier, 'Unknown') AS tier, COUNT(*) AS customers,
+                                          ROUND(AVG(satisfaction_score)::numeric, 2) AS average_satisfaction,
+                                          COUNT(*) FILTER (WHERE satisfaction_score < 3.5) AS high_risk
+                                   FROM customer_profiles
+                                   GROUP BY 1
+                               ) tiers
+                           ) AS tiers,
+                           '[]'::jsonb AS daily_trends,
+                           NOW() AS refreshed_at
+                    FROM customer_profiles
+                """)
+        
+        tiers = json.loads(row["tiers"])
+        avg_satisfaction = row["average_satisfaction"]
+        return {
+            "by_tier": {tier: data["count"] for tier, data in tiers.items()},
+            "total_customers": row["total_customers"],
+            "average_satisfaction": round(float(avg_satisfaction), 2) if avg_satisfaction else 0.0,
+            "high_risk_customers": row["high_risk_customers"],
+            "tiers": tiers,
+            "daily_trends": json.loads(row["daily_trends"]),
+            "refreshed_at": row["refreshed_at"].isoformat()
+        }
+    
+    async def refresh_customer_statistics(self) -> float:
+        """Refresca customer_statistics_mv sin bloquear lecturas; devuelve los segundos empleados"""
+        start = time.perf_counter()
+        async with self.get_connection() as conn:
+            await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY customer_statistics_mv")
+        return time.perf_counter() - start
     
     async def update_customer_metric(self, customer_id: str, field: str, value: Any) -> bool:
         """Actualiza una métrica específica de un cliente."""
-        conn = await self.get_connection()
-        try:
+        async with self.get_connection() as conn:
             # Esta validación evita la inyección de SQL en los nombres de columna
             if field not in ['satisfaction_score', 'total_interactions', 'preferred_channel', 'tier']:
                 raise ValueError(f"Campo no válido para actualizar: {field}")
@@ -236,10 +385,12 @@ class CustomerRepository:
                 WHERE customer_id = $2
             """
             result = await conn.execute(query, value, customer_id)
-            # asyncpg devuelve un string como 'UPDATE 1', lo comprobamos
-            return "UPDATE 1" in str(result)
-        finally:
-            await conn.close()
+        
+        # asyncpg devuelve un string como 'UPDATE 1', lo comprobamos
+        updated = "UPDATE 1" in str(result)
+        if updated:
+            customer_cache.update(customer_id, lambda cached: cached.update({field: value}))
+        return updated
 
 # Función para testing
 async def test_customer_repository():
@@ -268,8 +419,14 @@ async def test_customer_repository():
     print(f"   Estadísticas: {stats['total_customers']} clientes totales")
     print(f"   Por tier: {stats['by_tier']}")
     print(f"   Satisfacción promedio: {stats['average_satisfaction']}")
-    
+
+    # Test 4: Lectura masiva
+    contexts = await repo.get_customer_contexts(["CUST_001", "CUST_002", "CUST_999"])
+    found = [cid for cid, ctx in contexts.items() if "error" not in ctx]
+    print(f"   Lectura masiva: {len(found)}/{len(contexts)} clientes encontrados")
+
     print(" Customer Repository funcionando correctamente!")
+    await close_pool()
 
 if __name__ == "__main__":
     import asyncio
@@ -277,8 +434,7 @@ if __name__ == "__main__":
 
     async def update_customer_metric(self, customer_id: str, field: str, value: Any) -> bool:
         """Actualiza una métrica específica de un cliente."""
-        conn = await self.get_connection()
-        try:
+        async with self.get_connection() as conn:
             # Esta es una forma segura de construir la consulta para evitar inyección SQL
             # ya que el nombre del campo está validado.
             if field not in ['satisfaction_score', 'total_interactions', 'preferred_channel', 'tier']:
@@ -291,6 +447,4 @@ if __name__ == "__main__":
             """
             result = await conn.execute(query, value, customer_id)
             return "UPDATE 1" in result
-        finally:
-            await conn.close()
 
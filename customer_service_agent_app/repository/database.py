@@ -0,0 +1,139 @@
+# customer_service_agent_app/repository/database.py
+"""
+Pool de conexiones asyncpg compartido por todos los repositorios.
+
+Cada repositorio abría y cerraba su propia conexión en cada llamada, pagando
+el handshake TCP + autenticación + Cloud SQL Proxy en cada tool. Este módulo
+mantiene un único pool por proceso construido desde `config.settings`.
+"""
+import asyncio
+import atexit
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from config.settings import settings
+from customer_service_agent_app.observability.prometheus_metrics import DB_POOL_WAIT, track_db
+from customer_service_agent_app.observability.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Prepara cada conexión nueva del pool (codecs de pgvector)."""
+    try:
+        await register_vector(conn)
+    except ValueError:
+        # La extensión vector aún no está habilitada (ver scripts/enable_pgvector.py)
+        logger.warning("Extensión pgvector no disponible; conexión sin codec vector")
+
+
+async def init_pool() -> asyncpg.Pool:
+    """
+    Crea el pool (si no existe) y lo precalienta.
+    asyncpg abre DB_POOL_MIN_SIZE conexiones al crearlo, así que la primera
+    consulta ya no paga el coste de conexión.
+    """
+    global _pool, _pool_loop, _pool_lock
+
+    loop = asyncio.get_running_loop()
+
+    # Un pool asyncpg pertenece al event loop donde se creó
+    if _pool is not None and _pool_loop is not loop:
+        logger.info("Event loop distinto detectado; recreando pool de conexiones")
+        _pool.terminate()
+        _pool = None
+
+    if _pool is not None:
+        return _pool
+
+    if _pool_lock is None or _pool_loop is not loop:
+        _pool_lock = asyncio.Lock()
+        _pool_loop = loop
+
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                host="127.0.0.1",  # Siempre localhost para el proxy
+                port=settings.PROXY_PORT,
+                database=settings.DB_NAME,
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+                command_timeout=settings.DB_COMMAND_TIMEOUT,
+                init=_init_connection,
+                # Valores por defecto de sesión; RESET ALL del pool vuelve a ellos
+                server_settings={
+                    "hnsw.ef_search": str(settings.KB_HNSW_EF_SEARCH),
+                    "ivfflat.probes": str(settings.KB_IVFFLAT_PROBES),
+                },
+            )
+            logger.info(
+                f"Pool de conexiones listo (min={settings.DB_POOL_MIN_SIZE}, "
+                f"max={settings.DB_POOL_MAX_SIZE})"
+            )
+    return _pool
+
+
+async def get_pool() -> asyncpg.Pool:
+    """Obtiene el pool del proceso, creándolo en el primer uso."""
+    if _pool is not None and _pool_loop is asyncio.get_running_loop():
+        return _pool
+    return await init_pool()
+
+
+@asynccontextmanager
+async def acquire(repository: str = "unknown"):
+    """
+    Toma una conexión del pool y la devuelve al terminar.
+    Registra la espera del pool y el tiempo de uso de la conexión (`repository`)
+    como métricas y como span `db.<repository>` de la traza en curso.
+
+    Uso:
+        async with acquire("customer") as conn:
+            await conn.fetch(...)
+    """
+    with tracer.span(f"db.{repository}", **{"db.system": "postgresql"}) as span:
+        pool = await get_pool()
+        start = time.perf_counter()
+        async with pool.acquire(timeout=settings.DB_POOL_ACQUIRE_TIMEOUT) as conn:
+            wait = time.perf_counter() - start
+            DB_POOL_WAIT.observe(wait)
+            if span is not None:
+                span.attributes["db.pool_wait_ms"] = round(wait * 1000, 3)
+            with track_db(repository):
+                yield conn
+
+
+async def close_pool():
+    """Cierra el pool de forma ordenada (esperando a las conexiones en uso)."""
+    global _pool, _pool_loop
+    if _pool is None:
+        return
+    pool, _pool, _pool_loop = _pool, None, None
+    await pool.close()
+    logger.info("Pool de conexiones cerrado")
+
+
+@atexit.register
+def _terminate_pool_at_exit():
+    """
+    Al terminar el proceso (adk web no expone un hook de apagado) se cierran las
+    conexiones del pool para no dejarlas abiertas en el proxy hasta su timeout.
+    El event loop ya no está activo, así que se usa terminate() en lugar de close().
+    """
+    global _pool, _pool_loop
+    if _pool is None:
+        return
+    pool, _pool, _pool_loop = _pool, None, None
+    pool.terminate()
@@ -1,40 +1,41 @@
 # customer_service_agent_app/repository/knowledge_repository.py
-import asyncpg
-from typing import List, Dict, Any
-from config.settings import settings
-from pgvector.asyncpg import register_vector
+from typing import List, Dict, Any, Optional
+from .database import acquire
 
 class KnowledgeRepository:
-    def __init__(self):
-        self.connection_params = {
-            "host": "127.0.0.1",
-            "port": settings.PROXY_PORT,
-            "database": settings.DB_NAME,
-            "user": settings.DB_USER,
-            "password": settings.DB_PASSWORD
-        }
-
-    async def get_connection(self):
-        """Obtiene una conexión a la BD y la prepara para pgvector."""
-        conn = await asyncpg.connect(**self.connection_params)
-        
-        await register_vector(conn)
-        
-        return conn
+    def get_connection(self):
+        """Obtiene una conexión del pool compartido (ya preparada para pgvector)."""
+        return acquire("knowledge")
     
-    async def semantic_search(self, query_embedding: List[float], top_k: int = 3) -> List[Dict[str, Any]]:
-        """Realiza una búsqueda por similitud de coseno en la knowledge_base."""
-        conn = await self.get_connection()
-        try:
+    async def semantic_search(self, query_embedding: List[float], top_k: int = 3,
+                              ef_search: Optional[int] = None,
+                              probes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Realiza una búsqueda por similitud de coseno en la knowledge_base.
+
+        `ef_search` (HNSW) y `probes` (IVFFlat) ajustan recall/latencia solo para
+        esta consulta; si se omiten se usan los valores por defecto del pool.
+        """
+        async with self.get_connection() as conn:
 
+            # ORDER BY por la distancia (no por la similitud calculada) para que
+            # PostgreSQL pueda usar el índice HNSW/IVFFlat
             query = """
                 SELECT title, content, 1 - (embedding <=> $1) AS similarity
                 FROM knowledge_base
-                ORDER BY similarity DESC
+                WHERE embedding IS NOT NULL
+                ORDER BY embedding <=> $1
                 LIMIT $2
             """
 
-            results = await conn.fetch(query, query_embedding, top_k)
+            if ef_search is None and probes is None:
+                results = await conn.fetch(query, query_embedding, top_k)
+            else:
+                # set_config(..., true) equivale a SET LOCAL: solo dura la transacción
+                async with conn.transaction():
+                    if ef_search is not None:
+                        await conn.execute("SELECT set_config('hnsw.ef_search', $1, true)", str(int(ef_search)))
+                    if probes is not None:
+                        await conn.execute("SELECT set_config('ivfflat.probes', $1, true)", str(int(probes)))
+                    results = await conn.fetch(query, query_embedding, top_k)
             return [dict(row) for row in results]
-        finally:
-            await conn.close()
\ No newline at end of file
@@ -1,39 +1,197 @@
 # customer_service_agent_app/repository/sentiment_repository.py
-import asyncpg
-import hashlib
-from typing import Optional, Dict, Any
+"""
+Caché de análisis de sentimiento en dos niveles:
+    1. LRU en memoria del proceso (por hash del mensaje)
+    2. Tabla sentiment_cache en PostgreSQL, compartida entre procesos
+
+Las escrituras a PostgreSQL se lanzan en segundo plano (fire-and-forget): el
+análisis por palabras clave tarda microsegundos y no debe esperar a la BD.
+
+Las entradas se versionan con el hash del conjunto de palabras clave: si cambian
+las listas del analizador, los resultados anteriores dejan de ser válidos. En
+PostgreSQL caducan a los SENTIMENT_DB_TTL_DAYS (scripts/prune_sentiment_cache.py).
+"""
+import asyncio
+import json
+import logging
+from typing import Optional, Dict, Any, List, Set
+
 from config.settings import settings
+from sentiment_classifier import analysis_to_record, hash_message
+from .cache import TTLCache
+from .database import acquire
+
+logger = logging.getLogger(__name__)
+
+# Nivel 1: compartido por todas las instancias del repositorio en el proceso
+sentiment_memory_cache = TTLCache(
+    "sentiment_memory",
+    max_size=settings.SENTIMENT_CACHE_SIZE,
+    ttl_seconds=settings.SENTIMENT_CACHE_TTL_SECONDS
+)
+
+# Escrituras en curso (se guarda la referencia para que no las recoja el GC)
+_pending_writes: Set[asyncio.Task] = set()
+_write_stats = {"completed": 0, "failed": 0}
+_db_stats = {"hits": 0, "misses": 0}
+
+# Columnas de sentiment_cache que forman el resultado de analyze_sentiment
+ANALYSIS_FIELDS = (
+    "primary_sentiment", "urgency_level", "escalation_risk", "emotional_intensity",
+    "confidence_score", "detected_keywords", "recommended_tone",
+)
+
+
+def row_to_analysis(row) -> Dict[str, Any]:
+    """Fila de sentiment_cache -> mismo esquema que un análisis recién calculado."""
+    analysis = {field: row[field] for field in ANALYSIS_FIELDS}
+    if isinstance(analysis["detected_keywords"], str):
+        analysis["detected_keywords"] = json.loads(analysis["detected_keywords"])
+    return analysis
+
+
+# Una fila por mensaje: un análisis con otras palabras clave sustituye al anterior
+UPSERT_SQL = """
+    INSERT INTO sentiment_cache
+    (message_hash, primary_sentiment, urgency_level, escalation_risk, emotional_intensity,
+     confidence_score, detected_keywords, recommended_tone, keyword_set_hash, expires_at)
+    VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, $8, $9, NOW() + make_interval(days => $10))
+    ON CONFLICT (message_hash) DO UPDATE SET
+        primary_sentiment = EXCLUDED.primary_sentiment,
+        urgency_level = EXCLUDED.urgency_level,
+        escalation_risk = EXCLUDED.escalation_risk,
+        emotional_intensity = EXCLUDED.emotional_intensity,
+        confidence_score = EXCLUDED.confidence_score,
+        detected_keywords = EXCLUDED.detected_keywords,
+        recommended_tone = EXCLUDED.recommended_tone,
+        keyword_set_hash = EXCLUDED.keyword_set_hash,
+        expires_at = EXCLUDED.expires_at,
+        created_at = NOW()
+"""
+
 
 class SentimentRepository:
-    def __init__(self):
-        self.connection_params = {
-            "host": "127.0.0.1", "port": settings.PROXY_PORT,
-            "database": settings.DB_NAME, "user": settings.DB_USER,
-            "password": settings.DB_PASSWORD
-        }
+    def __init__(self, keyword_set_hash: str = ""):
+        # Versión de las palabras clave del analizador que usa este repositorio
+        self.keyword_set_hash = keyword_set_hash
 
-    async def get_connection(self):
-        return await asyncpg.connect(**self.connection_params)
+    def get_connection(self):
+        return acquire("sentiment")
 
     def _hash_message(self, text: str) -> str:
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return hash_message(text)
 
     async def get_from_cache(self, text: str) -> Optional[Dict[str, Any]]:
         message_hash = self._hash_message(text)
-        conn = await self.get_connection()
-        try:
-            cached = await conn.fetchrow("SELECT * FROM sentiment_cache WHERE message_hash = $1", message_hash)
-            return dict(cached) if cached else None
-        finally:
-            await conn.close()
+        memory_key = (self.keyword_set_hash, message_hash)
+        cached = sentiment_memory_cache.get(memory_key)
+        if cached is not None:
+            return cached
+
+        async with self.get_connection() as conn:
+            row = await conn.fetchrow("""
+                SELECT primary_sentiment, urgency_level, escalation_risk, emotional_intensity,
+                       confidence_score, detected_keywords, recommended_tone
+                FROM sentiment_cache
+                WHERE message_hash = $1 AND keyword_set_hash = $2 AND expires_at > NOW()
+            """, message_hash, self.keyword_set_hash)
+
+        if row is None:
+            _db_stats["misses"] += 1
+            return None
+        _db_stats["hits"] += 1
+        cached = row_to_analysis(row)
+        sentiment_memory_cache.put(memory_key, cached)
+        return cached
+
+    async def get_many_from_cache(self, texts: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Versión por lotes de get_from_cache: una sola consulta para los fallos de memoria."""
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, str] = {}  # hash -> texto
+        for text in texts:
+            message_hash = self._hash_message(text)
+            cached = sentiment_memory_cache.get((self.keyword_set_hash, message_hash))
+            if cached is not None:
+                results[text] = cached
+            else:
+                missing[message_hash] = text
+
+        if not missing:
+            return results
+
+        async with self.get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT message_hash, primary_sentiment, urgency_level, escalation_risk, emotional_intensity,
+                       confidence_score, detected_keywords, recommended_tone
+                FROM sentiment_cache
+                WHERE message_hash = ANY($1::varchar[]) AND keyword_set_hash = $2 AND expires_at > NOW()
+            """, list(missing), self.keyword_set_hash)
+
+        _db_stats["hits"] += len(rows)
+        _db_stats["misses"] += len(missing) - len(rows)
+        for row in rows:
+            analysis = row_to_analysis(row)
+            sentiment_memory_cache.put((self.keyword_set_hash, row["message_hash"]), analysis)
+            results[missing[row["message_hash"]]] = analysis
+        return results
+
+    async def save_many_to_cache(self, analyses: Dict[str, Dict[str, Any]]):
+        """Guarda varios análisis (texto -> análisis) con un único executemany."""
+        records = []
+        for text, analysis in analyses.items():
+            message_hash = self._hash_message(text)
+            sentiment_memory_cache.put((self.keyword_set_hash, message_hash), analysis)
+            records.append((*analysis_to_record(message_hash, self.keyword_set_hash, analysis),
+                            settings.SENTIMENT_DB_TTL_DAYS))
+        async with self.get_connection() as conn:
+            await conn.executemany(UPSERT_SQL, records)
 
     async def save_to_cache(self, text: str, analysis: Dict[str, Any]):
         message_hash = self._hash_message(text)
-        conn = await self.get_connection()
-        try:
-            await conn.execute("""
-                INSERT INTO sentiment_cache (message_hash, primary_sentiment, urgency_level, escalation_risk, recommended_tone)
-                VALUES ($1, $2, $3, $4, $5) ON CONFLICT (message_hash) DO NOTHING
-            """, message_hash, analysis['primary_sentiment'], analysis['urgency_level'], analysis['escalation_risk'], analysis['recommended_tone'])
-        finally:
-            await conn.close()
\ No newline at end of file
+        sentiment_memory_cache.put((self.keyword_set_hash, message_hash), analysis)
+        await self._write_to_db(message_hash, analysis)
+
+    def save_to_cache_background(self, text: str, analysis: Dict[str, Any]):
+        """Guarda en memoria al momento y en PostgreSQL sin esperar (los errores solo se registran)."""
+        message_hash = self._hash_message(text)
+        sentiment_memory_cache.put((self.keyword_set_hash, message_hash), analysis)
+        task = asyncio.get_running_loop().create_task(self._write_to_db(message_hash, analysis))
+        _pending_writes.add(task)
+        task.add_done_callback(_on_write_done)
+
+    async def _write_to_db(self, message_hash: str, analysis: Dict[str, Any]):
+        async with self.get_connection() as conn:
+            await conn.execute(
+                UPSERT_SQL,
+                *analysis_to_record(message_hash, self.keyword_set_hash, analysis),
+                settings.SENTIMENT_DB_TTL_DAYS
+            )
+
+    async def flush_pending_writes(self):
+        """Espera a las escrituras en segundo plano (antes de cerrar el pool)."""
+        if _pending_writes:
+            await asyncio.gather(*list(_pending_writes), return_exceptions=True)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        db_lookups = _db_stats["hits"] + _db_stats["misses"]
+        return {
+            "memory": sentiment_memory_cache.stats(),
+            "database": {
+                **_db_stats,
+                "hit_rate": round(_db_stats["hits"] / db_lookups * 100, 2) if db_lookups else 0.0,
+            },
+            "writes": {**_write_stats, "pending": len(_pending_writes)},
+        }
+
+
+def _on_write_done(task: asyncio.Task):
+    _pending_writes.discard(task)
+    if task.cancelled():
+        _write_stats["failed"] += 1
+        return
+    error = task.exception()
+    if error is not None:
+        _write_stats["failed"] += 1
+        logger.warning(f"⚠️ No se pudo guardar el sentimiento en sentiment_cache: {error}")
+    else:
+        _write_stats["completed"] += 1
@@ -1,6 +1,11 @@
 # customer_service_agent_app/subagents/context_analyzer/agent.py
 from google.adk.agents import LlmAgent
 from .tools import CustomerContextToolV2
+from customer_service_agent_app.observability.callbacks import (
+    before_agent_callback, after_agent_callback,
+    before_model_callback, after_model_callback,
+    before_tool_callback, after_tool_callback
+)
 
 # Crear instancia de la tool actualizada
 context_tool_v2 = CustomerContextToolV2()
@@ -68,6 +73,12 @@ If there are database connectivity issues, provide helpful troubleshooting guida
         context_tool_v2.get_customer_context, 
         context_tool_v2.log_interaction_summary
     ],
-    output_key="context_analysis"
+    output_key="context_analysis",
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback,
+    before_model_callback=before_model_callback,
+    after_model_callback=after_model_callback,
+    before_tool_callback=before_tool_callback,
+    after_tool_callback=after_tool_callback
 
 )
@@ -77,19 +77,16 @@ class CustomerContextToolV2:
             "agent_id": "root_agent"
         }
         
-        success = await self.repository.add_interaction(customer_id, interaction_data)
+        # Opcional: Actualizar la puntuación de satisfacción basada en el sentimiento final
+        # Simulación: una interacción positiva aumenta ligeramente la satisfacción (0.1, máximo 5)
+        # En un caso real, esto vendría de una encuesta post-chat
+        satisfaction_delta = 0.1 if sentiment == 'positive' else 0.0
+        
+        # Interacción, contador y satisfacción en una única sentencia atómica
+        success = await self.repository.add_interaction(customer_id, interaction_data, satisfaction_delta)
         
         if not success:
             return {"status": "failed", "error": "No se pudo registrar la interacción."}
-
-        # Opcional: Actualizar la puntuación de satisfacción basada en el sentimiento final
-        if sentiment == 'positive':
-            # Simulación: una interacción positiva aumenta ligeramente la satisfacción
-            # En un caso real, esto vendría de una encuesta post-chat
-            current_context = await self.repository.get_customer_context(customer_id)
-            current_score = current_context['customer_data'].get('satisfaction_score', 3.0)
-            new_score = min(5.0, current_score + 0.1) # Aumenta 0.1, con un máximo de 5
-            await self.repository.update_customer_metric(customer_id, 'satisfaction_score', new_score)
         
         print(f"✅ Interacción para {customer_id} registrada exitosamente.")
         return {"status": "success", "message": f"Interacción para {customer_id} registrada."}
\ No newline at end of file
@@ -1,6 +1,11 @@
 # customer_service_agent_app/subagents/knowledge_agent/agent.py
 from google.adk.agents import LlmAgent
 from .tools import knowledge_search_toolset
+from customer_service_agent_app.observability.callbacks import (
+    before_agent_callback, after_agent_callback,
+    before_model_callback, after_model_callback,
+    before_tool_callback, after_tool_callback
+)
 
 knowledge_agent = LlmAgent(
     name="KnowledgeSearcher",
@@ -17,5 +22,11 @@ knowledge_agent = LlmAgent(
     Return the most relevant knowledge base content that can assist with their problem.""",
     
     tools=[knowledge_search_toolset],
-    output_key="knowledge_search"
+    output_key="knowledge_search",
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback,
+    before_model_callback=before_model_callback,
+    after_model_callback=after_model_callback,
+    before_tool_callback=before_tool_callback,
+    after_tool_callback=after_tool_callback
 )
\ No newline at end of file
@@ -2,6 +2,11 @@
 
 from google.adk.agents import LlmAgent
 from .tools import PriorityAssessmentTool
+from customer_service_agent_app.observability.callbacks import (
+    before_agent_callback, after_agent_callback,
+    before_model_callback, after_model_callback,
+    before_tool_callback, after_tool_callback
+)
 
 priority_tool = PriorityAssessmentTool()
 
@@ -41,5 +46,11 @@ Clearly explain the scoring factors that led to the priority level so agents und
 
 Ensure your assessment is accurate and helps route the case to the most appropriate agent level.""",
     tools=[priority_tool.calculate_priority],  # ← Función directa
-    output_key="priority_assessment"
+    output_key="priority_assessment",
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback,
+    before_model_callback=before_model_callback,
+    after_model_callback=after_model_callback,
+    before_tool_callback=before_tool_callback,
+    after_tool_callback=after_tool_callback
 )
\ No newline at end of file
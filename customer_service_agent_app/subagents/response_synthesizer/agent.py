@@ -1,5 +1,9 @@
 # customer_service_agent_app/subagents/response_synthesizer/agent.py
 from google.adk.agents import LlmAgent
+from customer_service_agent_app.observability.callbacks import (
+    before_agent_callback, after_agent_callback,
+    before_model_callback, after_model_callback
+)
 
 response_synthesizer = LlmAgent(
     name="ResponseSynthesizer",
@@ -59,5 +63,9 @@ TONE MATCHING GUIDELINES:
 - friendly_professional: "I'd be happy to help you with this. Here's what we can do."
 
 Make your response feel personal, informed, solution-focused, and appropriately empathetic.""",
-    output_key="synthesized_response"
+    output_key="synthesized_response",
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback,
+    before_model_callback=before_model_callback,
+    after_model_callback=after_model_callback
 )
\ No newline at end of file
@@ -2,6 +2,11 @@
 
 from google.adk.agents import LlmAgent
 from .tools import SentimentAnalysisTool
+from customer_service_agent_app.observability.callbacks import (
+    before_agent_callback, after_agent_callback,
+    before_model_callback, after_model_callback,
+    before_tool_callback, after_tool_callback
+)
 
 
 sentiment_tool = SentimentAnalysisTool()
@@ -36,5 +41,11 @@ Based on the sentiment analysis, recommend:
 Be specific and actionable in your recommendations to help other agents respond appropriately.""",
  
     tools=[sentiment_tool.analyze_sentiment],
-    output_key="sentiment_analysis"
+    output_key="sentiment_analysis",
+    before_agent_callback=before_agent_callback,
+    after_agent_callback=after_agent_callback,
+    before_model_callback=before_model_callback,
+    after_model_callback=after_model_callback,
+    before_tool_callback=before_tool_callback,
+    after_tool_callback=after_tool_callback
 )
\ No newline at end of file
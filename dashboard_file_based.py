@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 """
 Dashboard de métricas MCP basado en archivo - Lee métricas en tiempo real
+
+Modos:
+    python dashboard_file_based.py            # instantánea mcp_metrics_live.json cada 3 s
+    python dashboard_file_based.py --follow   # sigue el log mcp_metrics_live.jsonl de forma incremental
 """
+import argparse
 import json
+import sys
 import time
 import os
+from collections import Counter, deque
 from datetime import datetime
 from pathlib import Path
 
@@ -95,5 +102,235 @@ def show_live_dashboard():
     except KeyboardInterrupt:
         print("\n\nDashboard cerrado por usuario")
 
+# ---------------------------------------------------------------------------
+# Modo --follow: lectura incremental del log JSONL con agregados en memoria
+# ---------------------------------------------------------------------------
+
+# Límites superiores (ms) de los cubos del histograma de latencia
+LATENCY_EDGES = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf")]
+CACHE_TYPES = ("result", "embedding")
+
+
+class MetricsLogTail:
+    """
+    Lee solo las líneas nuevas del log (como `tail -F`): guarda el offset, conserva
+    las líneas incompletas y, si el servidor rota o trunca el archivo, termina de
+    leer el anterior y continúa con el nuevo desde el principio.
+    """
+
+    def __init__(self, path: Path, from_start: bool = False):
+        self.path = path
+        self.from_start = from_start
+        self._file = None
+        self._partial = b""
+
+    def _open(self, seek_end: bool):
+        try:
+            # Binario: tell() es un offset en bytes comparable con st_size
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            self._file = None
+            return
+        if seek_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def read_new(self):
+        if self._file is None:
+            self._open(seek_end=not self.from_start)
+            self.from_start = True  # Los archivos que aparezcan después se leen enteros
+            if self._file is None:
+                return []
+
+        lines = self._drain()
+        try:
+            current = os.stat(self.path)
+            if current.st_ino != os.fstat(self._file.fileno()).st_ino:
+                # Rotado: lo que quedaba en el archivo anterior ya se leyó arriba
+                self._file.close()
+                self._partial = b""
+                self._open(seek_end=False)
+                lines += self._drain() if self._file else []
+            elif current.st_size < self._file.tell():
+                # Truncado
+                self._file.seek(0)
+                self._partial = b""
+        except FileNotFoundError:
+            pass
+        return lines
+
+    def _drain(self):
+        chunk = self._file.read()
+        if not chunk:
+            return []
+        chunk = self._partial + chunk
+        *complete, self._partial = chunk.split(b"\n")
+        records = []
+        for line in complete:
+            if line.strip():
+                try:
+                    records.append(json.loads(line.decode("utf-8")))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    continue
+        return records
+
+
+class _Second:
+    """Agregados de un segundo de tráfico."""
+
+    __slots__ = ("second", "queries", "errors", "cache_hits", "latency_buckets", "fallbacks")
+
+    def __init__(self, second: int):
+        self.second = second
+        self.queries = 0
+        self.errors = 0
+        self.cache_hits = Counter()
+        self.latency_buckets = [0] * len(LATENCY_EDGES)
+        self.fallbacks = Counter()
+
+
+class RollingMetrics:
+    """
+    Agregados por segundo en una ventana deslizante: añadir un registro es O(1) y
+    renderizar depende del tamaño de la ventana, no del volumen del log.
+    """
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.seconds = deque(maxlen=window_seconds)
+        self.total_queries = 0
+        self.total_errors = 0
+        self.recent = deque(maxlen=5)
+
+    def add(self, metric):
+        try:
+            second = int(datetime.fromisoformat(metric["timestamp"]).timestamp())
+        except (KeyError, TypeError, ValueError):
+            second = int(time.time())
+        # Registros desordenados (varios procesos) se suman al último segundo
+        if not self.seconds or second > self.seconds[-1].second:
+            self.seconds.append(_Second(second))
+        bucket = self.seconds[-1]
+
+        bucket.queries += 1
+        self.total_queries += 1
+        if metric.get("error"):
+            bucket.errors += 1
+            self.total_errors += 1
+        else:
+            latency = float(metric.get("latency_ms", 0))
+            bucket.latency_buckets[next(i for i, edge in enumerate(LATENCY_EDGES) if latency <= edge)] += 1
+        if metric.get("cache"):
+            bucket.cache_hits[metric["cache"]] += 1
+        bucket.fallbacks[metric.get("fallback_used", "unknown")] += 1
+        self.recent.append(metric)
+
+    def window(self, seconds: int):
+        now = int(time.time())
+        return [b for b in self.seconds if b.second > now - seconds]
+
+
+def _bar(value: float, maximum: float, width: int = 30) -> str:
+    return "#" * int(round(value / maximum * width)) if maximum else ""
+
+
+def _histogram_percentile(buckets, q: float) -> str:
+    total = sum(buckets)
+    if not total:
+        return "-"
+    seen = 0
+    for count, edge in zip(buckets, LATENCY_EDGES):
+        seen += count
+        if seen >= q * total:
+            return f"<={edge:.0f}ms" if edge != float("inf") else f">{LATENCY_EDGES[-2]}ms"
+    return "-"
+
+
+def render_follow(stats: RollingMetrics, log_path: Path):
+    window = stats.window(stats.window_seconds)
+    last_10s = stats.window(10)
+    queries = sum(b.queries for b in window)
+    errors = sum(b.errors for b in window)
+    latency = [sum(col) for col in zip(*(b.latency_buckets for b in window))] or [0] * len(LATENCY_EDGES)
+    fallbacks = sum((b.fallbacks for b in window), Counter())
+    cache_hits = sum((b.cache_hits for b in window), Counter())
+
+    out = []
+    out.append("DASHBOARD DE MÉTRICAS MCP - SEGUIMIENTO DEL LOG")
+    out.append("=" * 70)
+    out.append(f"Log: {log_path} | {datetime.now().strftime('%H:%M:%S')} | ventana {stats.window_seconds}s")
+    out.append("-" * 70)
+    out.append(f"Total (desde inicio): {stats.total_queries} consultas, {stats.total_errors} errores")
+    out.append(f"QPS: {sum(b.queries for b in last_10s) / 10:.2f} (10s) | {queries / stats.window_seconds:.2f} ({stats.window_seconds}s)"
+               f" | errores en ventana: {errors / queries * 100 if queries else 0:.1f}%")
+
+    # QPS por segundo (sparkline de la ventana)
+    per_second = {b.second: b.queries for b in window}
+    now = int(time.time())
+    series = [per_second.get(sec, 0) for sec in range(now - stats.window_seconds + 1, now + 1)]
+    peak = max(series) or 1
+    levels = " .:-=+*#"
+    out.append("Actividad: [" + "".join(levels[min(len(levels) - 1, int(v / peak * (len(levels) - 1)))] for v in series) + "]")
+
+    out.append("\nLATENCIA (ventana):")
+    out.append(f"   p50 {_histogram_percentile(latency, 0.50)} | p95 {_histogram_percentile(latency, 0.95)}"
+               f" | p99 {_histogram_percentile(latency, 0.99)}")
+    peak = max(latency) or 1
+    for count, edge in zip(latency, LATENCY_EDGES):
+        label = f"<= {edge:.0f}ms" if edge != float("inf") else f"> {LATENCY_EDGES[-2]}ms"
+        out.append(f"   {label:>10} | {_bar(count, peak):<30} {count}")
+
+    out.append("\nCACHÉ (ventana):")
+    for cache in CACHE_TYPES:
+        hits = cache_hits.get(cache, 0)
+        out.append(f"   {cache:<10} {hits:>6} aciertos ({hits / queries * 100 if queries else 0:.1f}% de las consultas)")
+
+    out.append("\nTIPOS DE FALLBACK (ventana):")
+    for fb_type, count in fallbacks.most_common():
+        out.append(f"   {fb_type}: {count} ({count / queries * 100:.1f}%)")
+
+    out.append("\nÚLTIMAS CONSULTAS:")
+    for i, metric in enumerate(reversed(stats.recent), 1):
+        status = "ERROR" if metric.get('error') else "OK"
+        cache = f" | caché {metric['cache']}" if metric.get('cache') else ""
+        out.append(f"   {i}. [{status}] '{metric.get('query', 'N/A')[:40]}...' | {metric.get('latency_ms', 0)}ms"
+                   f" | {metric.get('fallback_used', 'unknown')}{cache} | {metric.get('timestamp', '')[11:19]}")
+
+    out.append("\n" + "=" * 70)
+    out.append("Siguiendo el log... (Ctrl+C para salir)")
+    # Volver al inicio y limpiar con ANSI: sin lanzar un proceso `clear` en cada refresco
+    sys.stdout.write("\033[H\033[J" + "\n".join(out) + "\n")
+    sys.stdout.flush()
+
+
+def follow_dashboard(log_path: Path, window_seconds: int, refresh: float, from_start: bool):
+    """Dashboard incremental: solo procesa las líneas nuevas del log en cada refresco."""
+    tail = MetricsLogTail(log_path, from_start=from_start)
+    stats = RollingMetrics(window_seconds=window_seconds)
+    try:
+        while True:
+            for metric in tail.read_new():
+                stats.add(metric)
+            render_follow(stats, log_path)
+            time.sleep(refresh)
+    except KeyboardInterrupt:
+        print("\n\nDashboard cerrado por usuario")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dashboard de métricas MCP")
+    parser.add_argument("--follow", action="store_true",
+                        help="Seguir el log JSONL de forma incremental")
+    parser.add_argument("--log", type=Path, default=Path(os.getenv("METRICS_LOG_FILE", "mcp_metrics_live.jsonl")))
+    parser.add_argument("--window", type=int, default=60, help="Segundos de la ventana deslizante")
+    parser.add_argument("--refresh", type=float, default=0.5, help="Segundos entre refrescos")
+    parser.add_argument("--from-start", action="store_true",
+                        help="Procesar también el contenido ya existente del log")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    show_live_dashboard()
+    args = parse_args()
+    if args.follow:
+        follow_dashboard(args.log, args.window, args.refresh, args.from_start)
+    else:
+        show_live_dashboard()
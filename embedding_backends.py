@@ -0,0 +1,255 @@
+# embedding_backends.py
+"""
+Backends de embeddings intercambiables para el servidor MCP de conocimiento.
+
+- torch:     SentenceTransformer en PyTorch fp32 (comportamiento original)
+- onnx:      el mismo modelo exportado a ONNX y ejecutado con ONNX Runtime
+- onnx-int8: la exportación ONNX con cuantización dinámica int8 de los pesos
+
+Se selecciona con la variable de entorno EMBEDDING_BACKEND. La exportación ONNX se
+hace una sola vez (requiere torch) y se guarda en EMBEDDING_ONNX_DIR; en ese momento
+se compara contra PyTorch y solo se acepta si la similitud coseno mínima está dentro
+de EMBEDDING_BACKEND_TOLERANCE. Las siguientes cargas no importan torch.
+"""
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_DIR = Path(__file__).parent / ".onnx_models"
+DEFAULT_TOLERANCE = 0.01  # 1 - similitud coseno mínima admitida frente a PyTorch
+
+# Frases de referencia para validar la exportación (mismo dominio que las consultas reales)
+VALIDATION_SENTENCES = [
+    "mi servicio no funciona",
+    "tengo un cargo duplicado en mi tarjeta de crédito",
+    "¡URGENTE! El servidor está caído y no puedo procesar pedidos",
+    "problema de conexión base de datos postgresql timeout",
+    "Soy CUST_003, ¿hay novedades sobre mi caso de ayer?",
+    "quiero consultar la información de mi cuenta",
+]
+
+
+class EmbeddingBackend(ABC):
+    """Interfaz común: misma firma básica que SentenceTransformer.encode."""
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        ...
+
+
+class TorchBackend(EmbeddingBackend):
+    """SentenceTransformer en PyTorch (por defecto)."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        return self._model.encode(sentences, batch_size=batch_size, convert_to_numpy=True,
+                                  show_progress_bar=False)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._model.get_sentence_embedding_dimension()
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    ONNX Runtime sobre la exportación del transformer, reproduciendo el pooling y la
+    normalización del pipeline de SentenceTransformer.
+    """
+
+    name = "onnx"
+    quantized = False
+
+    def __init__(self, model_name: str, onnx_dir: Path = None, tolerance: float = DEFAULT_TOLERANCE):
+        super().__init__(model_name)
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        base_dir = Path(onnx_dir or os.getenv("EMBEDDING_ONNX_DIR", DEFAULT_ONNX_DIR))
+        self.model_dir = base_dir / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        model_file = self.model_dir / ("model_int8.onnx" if self.quantized else "model.onnx")
+
+        if not model_file.exists():
+            export_onnx(model_name, self.model_dir, tolerance=tolerance)
+
+        with open(self.model_dir / "embedding_config.json", "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        check = self.config["validation"]["int8" if self.quantized else "fp32"]
+        if not check["passed"]:
+            raise ValueError(
+                f"La exportación {self.name} de {model_name} no cumple la tolerancia "
+                f"(similitud mínima {check['min_cosine']:.4f} < {1 - check['tolerance']:.4f})"
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = onnxruntime.InferenceSession(str(model_file), options,
+                                                     providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        chunks = [
+            _run_onnx(self._session, self._tokenizer, self._input_names, self.config, texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.concatenate(chunks) if chunks else np.zeros((0, self.config["dimension"]), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+
+class OnnxInt8Backend(OnnxBackend):
+    """ONNX con cuantización dinámica int8: menos memoria y más rápido en CPU."""
+
+    name = "onnx-int8"
+    quantized = True
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+
+def create_embedding_backend(backend: str, model_name: str) -> EmbeddingBackend:
+    """Instancia el backend pedido; si no se puede usar, vuelve a PyTorch."""
+    backend = (backend or TorchBackend.name).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+
+    if backend == TorchBackend.name:
+        return TorchBackend(model_name)
+    try:
+        tolerance = float(os.getenv("EMBEDDING_BACKEND_TOLERANCE", DEFAULT_TOLERANCE))
+        return BACKENDS[backend](model_name, tolerance=tolerance)
+    except Exception as e:
+        # Visible en los logs: un EMBEDDING_BACKEND mal configurado no debe pasar por PyTorch sin avisar
+        logger.warning(f"⚠️ EMBEDDING_BACKEND={backend} no disponible para {model_name}, "
+                       f"se usa PyTorch: {type(e).__name__}: {e}")
+        return TorchBackend(model_name)
+
+
+# ---------------------------------------------------------------------------
+# Inferencia y exportación ONNX
+# ---------------------------------------------------------------------------
+
+def _run_onnx(session, tokenizer, input_names, config, texts: List[str]) -> np.ndarray:
+    encoded = tokenizer(texts, padding=True, truncation=True, max_length=config["max_seq_length"],
+                        return_tensors="np")
+    feeds = {name: encoded[name].astype(np.int64) for name in input_names if name in encoded}
+    token_embeddings = session.run(None, feeds)[0]
+    mask = encoded["attention_mask"].astype(np.float32)
+
+    if config["pooling"] == "cls":
+        pooled = token_embeddings[:, 0]
+    else:
+        summed = (token_embeddings * mask[:, :, None]).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+
+    if config["normalize"]:
+        pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32)
+
+
+def _min_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float((a * b).sum(axis=1).min())
+
+
+def export_onnx(model_name: str, model_dir: Path, tolerance: float = DEFAULT_TOLERANCE):
+    """Exporta el transformer a ONNX (fp32 + int8) y valida ambos contra PyTorch."""
+    import torch
+    import onnxruntime
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Exportando {model_name} a ONNX en {model_dir}...")
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    tokenizer = st_model.tokenizer
+    transformer = st_model[0].auto_model.eval()
+    pooling = st_model[1] if len(st_model) > 1 else None
+    config = {
+        "model_name": model_name,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": "cls" if pooling is not None and getattr(pooling, "pooling_mode_cls_token", False) else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in st_model),
+    }
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["hola mundo"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = model_dir / "model.onnx"
+    int8_path = model_dir / "model_int8.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(str(model_dir))
+
+    # Validación numérica frente al pipeline original
+    reference = st_model.encode(VALIDATION_SENTENCES, convert_to_numpy=True, show_progress_bar=False)
+    config["validation"] = {}
+    for label, path in (("fp32", fp32_path), ("int8", int8_path)):
+        session = onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        names = {i.name for i in session.get_inputs()}
+        candidate = _run_onnx(session, tokenizer, names, config, VALIDATION_SENTENCES)
+        min_cosine = _min_cosine(reference, candidate)
+        config["validation"][label] = {
+            "min_cosine": round(min_cosine, 6),
+            "tolerance": tolerance,
+            "passed": min_cosine >= 1 - tolerance,
+        }
+        logger.info(f"Validación ONNX {label}: similitud coseno mínima {min_cosine:.5f}")
+
+    with open(model_dir / "embedding_config.json", "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
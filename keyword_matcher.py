@@ -0,0 +1,110 @@
+# keyword_matcher.py
+"""
+Búsqueda de palabras clave por categoría en una sola pasada (Aho–Corasick).
+
+El autómata se construye una vez por conjunto de palabras clave y recorre el
+texto carácter a carácter: el coste depende de la longitud del mensaje, no del
+número de palabras clave. Encuentra también coincidencias solapadas ("necesito ya"
+y "ya"), y solo acepta las que caen en límites de palabra, así "ya" no coincide
+dentro de "playa" ni "bien" dentro de "también".
+
+Lo usan SentimentAnalysisTool y Metricas/analyzer_adk.py:
+
+    matcher = KeywordMatcher({"urgency": ["urgente", "ya"], "negative": ["malo"]})
+    matcher.match("¡Lo necesito ya, es urgente!")
+    # {"urgency": ["ya", "urgente"], "negative": []}
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """Autómata Aho–Corasick sobre palabras clave agrupadas por categoría."""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = list(categories)
+        # término -> categorías en que aparece (una palabra puede estar en varias)
+        terms: Dict[str, List[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                term = keyword.lower().strip()
+                if term and category not in terms.setdefault(term, []):
+                    terms[term].append(category)
+
+        # (término, categorías, exige límite a la izquierda, exige límite a la derecha)
+        self._terms: List[Tuple[str, Tuple[str, ...], bool, bool]] = [
+            (term, tuple(cats), _is_word_char(term[0]), _is_word_char(term[-1]))
+            for term, cats in terms.items()
+        ]
+        self._build()
+
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, (term, _, _, _) in enumerate(self._terms):
+            state = 0
+            for ch in term:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        # Enlaces de fallo por niveles; cada estado hereda las salidas de su enlace
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                fail[next_state] = goto[link].get(ch, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """
+        Palabras clave distintas encontradas por categoría, en orden de aparición.
+        No distingue mayúsculas; respeta los límites de palabra.
+        """
+        found: Dict[str, List[str]] = {category: [] for category in self.categories}
+        if not text:
+            return found
+        text = text.lower()
+        goto, fail, outputs, terms = self._goto, self._fail, self._outputs, self._terms
+        seen = set()
+        length = len(text)
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in outputs[state]:
+                if index in seen:
+                    continue
+                term, cats, left_boundary, right_boundary = terms[index]
+                start = end - len(term) + 1
+                if left_boundary and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if right_boundary and end + 1 < length and _is_word_char(text[end + 1]):
+                    continue
+                seen.add(index)
+                for category in cats:
+                    found[category].append(term)
+        return found
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """Número de palabras clave distintas encontradas por categoría."""
+        return {category: len(terms) for category, terms in self.match(text).items()}
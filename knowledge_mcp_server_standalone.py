@@ -1,39 +1,26 @@
 # knowledge_mcp_server_standalone.py
 import asyncio
 import os
+import re
 import logging
 import time
 from typing import Any, Sequence
 from mcp.server import Server
 from mcp.types import Tool, TextContent
-from sentence_transformers import SentenceTransformer
 import asyncpg
+from pgvector.asyncpg import register_vector
 from dotenv import load_dotenv
 
-# Importar el sistema de métricas - VERSIÓN DIRECTA
 import sys
 from pathlib import Path
 
-# Asegurar que el directorio del proyecto esté en el path
+# Asegurar que el directorio del proyecto esté en el path (embedding_backends)
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-try:
-    from customer_service_agent_app.observability.mcp_metrics import get_observer, create_metrics
-    METRICS_ENABLED = True
-    logger = logging.getLogger(__name__)
-    logger.info("✅ Sistema de métricas MCP cargado correctamente")
-    print("🎉 MÉTRICAS HABILITADAS!")
-except ImportError as e:
-    METRICS_ENABLED = False
-    logger = logging.getLogger(__name__)
-    logger.error(f"❌ Sistema de métricas falló: {e}")
-    print(f"💥 MÉTRICAS FALLARON: {e}")
-except Exception as e:
-    METRICS_ENABLED = False
-    logger = logging.getLogger(__name__)
-    logger.error(f"❌ Error inesperado en métricas: {e}")
-    print(f"💥 ERROR INESPERADO: {e}")
+# Las métricas van inyectadas más abajo: importar customer_service_agent_app cargaría
+# el grafo de agentes ADK en el proceso MCP
+logger = logging.getLogger(__name__)
 
 # Cargar variables de entorno
 load_dotenv()
@@ -41,12 +28,186 @@ load_dotenv()
 # ===== MÉTRICAS MCP INYECTADAS DIRECTAMENTE =====
 import time
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
-import statistics
+import math
 import json
 
+# --- Métricas Prometheus / OpenMetrics del servidor MCP (prometheus_client opcional) ---
+MCP_PROMETHEUS_PORT = int(os.getenv('MCP_PROMETHEUS_PORT', '9465'))  # 0 lo desactiva
+PROM_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value: float):
+        pass
+
+    def inc(self, amount: float = 1):
+        pass
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, start_http_server
+    prom_registry = CollectorRegistry()
+    PROM_SEARCH_LATENCY = Histogram(
+        "mcp_search_latency_seconds", "Latencia de search_knowledge por tipo de fallback",
+        ["fallback"], buckets=PROM_LATENCY_BUCKETS, registry=prom_registry)
+    PROM_ENCODE_TIME = Histogram(
+        "mcp_embedding_encode_seconds", "Tiempo de cada lote de encode",
+        buckets=PROM_LATENCY_BUCKETS, registry=prom_registry)
+    PROM_ENCODE_BATCH = Histogram(
+        "mcp_embedding_encode_batch_size", "Consultas por lote de encode",
+        buckets=(1, 2, 4, 8, 16, 32, 64), registry=prom_registry)
+    PROM_DB_QUERY = Histogram(
+        "mcp_db_query_seconds", "Tiempo de las consultas de búsqueda en PostgreSQL",
+        buckets=PROM_LATENCY_BUCKETS, registry=prom_registry)
+    PROM_POOL_WAIT = Histogram(
+        "mcp_db_pool_wait_seconds", "Espera para obtener una conexión del pool",
+        buckets=PROM_LATENCY_BUCKETS, registry=prom_registry)
+    PROM_CACHE = Counter(
+        "mcp_cache_requests", "Consultas a cachés por resultado (hit/miss)",
+        ["cache", "result"], registry=prom_registry)
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    prom_registry = None
+    PROM_SEARCH_LATENCY = PROM_ENCODE_TIME = PROM_ENCODE_BATCH = _NoopMetric()
+    PROM_DB_QUERY = PROM_POOL_WAIT = PROM_CACHE = _NoopMetric()
+    PROMETHEUS_AVAILABLE = False
+
+def record_cache(cache: str, hit: bool):
+    PROM_CACHE.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+def start_prometheus_endpoint():
+    """Endpoint propio del servidor MCP; el agente expone el suyo en PROMETHEUS_PORT."""
+    if not MCP_PROMETHEUS_PORT:
+        return
+    if not PROMETHEUS_AVAILABLE:
+        logger.warning("prometheus_client no instalado; endpoint de métricas MCP desactivado")
+        return
+    try:
+        start_http_server(MCP_PROMETHEUS_PORT, registry=prom_registry)
+        logger.info(f"📈 Métricas Prometheus MCP en http://0.0.0.0:{MCP_PROMETHEUS_PORT}/metrics")
+    except OSError as e:
+        # Varios procesos MCP en la misma máquina: solo el primero expone el puerto
+        logger.warning(f"No se pudo abrir el puerto de métricas {MCP_PROMETHEUS_PORT}: {e}")
+
+# Destino de las métricas en disco (el dashboard lee METRICS_FILE)
+METRICS_FILE = Path(os.getenv('METRICS_FILE', 'mcp_metrics_live.json'))
+METRICS_LOG_FILE = Path(os.getenv('METRICS_LOG_FILE', 'mcp_metrics_live.jsonl'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '1'))
+METRICS_BUFFER_SIZE = int(os.getenv('METRICS_BUFFER_SIZE', '10000'))
+METRICS_LOG_MAX_BYTES = int(os.getenv('METRICS_LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+METRICS_LOG_BACKUPS = int(os.getenv('METRICS_LOG_BACKUPS', '5'))
+METRICS_SNAPSHOT_SIZE = 100
+
+class MetricsSink:
+    """
+    Escritura asíncrona y por lotes de las métricas de búsqueda.
+
+    `record` solo añade a un buffer circular en memoria. Una tarea en segundo plano
+    vacía el buffer cada METRICS_FLUSH_SECONDS en un hilo:
+      - añade los registros al log JSONL (append-only, con rotación por tamaño)
+      - reescribe de forma atómica (tmp + rename) la instantánea METRICS_FILE con
+        las últimas 100 métricas y el resumen, mismo formato que lee el dashboard
+    """
+
+    def __init__(self, buffer_size: int = METRICS_BUFFER_SIZE):
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._recent: deque = deque(maxlen=METRICS_SNAPSHOT_SIZE)
+        self._summary: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metrics")
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, metric_data: Dict[str, Any], total_queries: int, error_count: int):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1  # disco más lento que el tráfico: se pierde el más antiguo
+        self._buffer.append(metric_data)
+        self._recent.append(metric_data)
+        self._summary = {"total_queries": total_queries, "error_count": error_count}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=False)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        # Se copia en el loop; el hilo solo serializa y escribe
+        batch = list(self._buffer)
+        self._buffer.clear()
+        recent = list(self._recent)
+        snapshot = {
+            "metrics": recent,
+            "summary": {
+                **self._summary,
+                "last_updated": datetime.now().isoformat(),
+                "avg_latency": sum(m["latency_ms"] for m in recent) / len(recent) if recent else 0
+            }
+        }
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch, snapshot)
+            self.written += len(batch)
+        except Exception as e:
+            logger.error(f"Error escribiendo métricas a archivo: {e}")
+
+    def _write(self, batch: List[Dict[str, Any]], snapshot: Dict[str, Any]):
+        self._rotate_if_needed()
+        lines = "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in batch)
+        # Una sola escritura en modo append: las líneas de otros procesos no se intercalan
+        with open(METRICS_LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+        tmp_file = METRICS_FILE.with_name(f"{METRICS_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, METRICS_FILE)
+
+    def _rotate_if_needed(self):
+        try:
+            if METRICS_LOG_FILE.stat().st_size < METRICS_LOG_MAX_BYTES:
+                return
+        except FileNotFoundError:
+            return
+        for i in range(METRICS_LOG_BACKUPS - 1, 0, -1):
+            older = METRICS_LOG_FILE.with_name(f"{METRICS_LOG_FILE.name}.{i}")
+            if older.exists():
+                os.replace(older, METRICS_LOG_FILE.with_name(f"{METRICS_LOG_FILE.name}.{i + 1}"))
+        if METRICS_LOG_BACKUPS > 0:
+            os.replace(METRICS_LOG_FILE, METRICS_LOG_FILE.with_name(f"{METRICS_LOG_FILE.name}.1"))
+        else:
+            METRICS_LOG_FILE.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "log_file": str(METRICS_LOG_FILE)
+        }
+
+metrics_sink = MetricsSink()
+
 @dataclass
 class MCPMetrics:
     query: str
@@ -57,12 +218,117 @@ class MCPMetrics:
     results_count: int
     timestamp: datetime
     error: Optional[str] = None
+    cache: Optional[str] = None  # "result" | "embedding" | None (qué caché evitó trabajo)
+
+class LatencyHistogram:
+    """Histograma logarítmico de memoria constante (copia de observability/mcp_metrics.py)."""
+
+    def __init__(self, relative_error: float = 0.01, min_value: float = 0.01):
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.buckets[math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return min(max(2 * self.gamma ** index / (self.gamma + 1), self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_latency_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_latency_ms": round(self.quantile(0.50), 2),
+            "p95_latency_ms": round(self.quantile(0.95), 2),
+            "p99_latency_ms": round(self.quantile(0.99), 2),
+            "p999_latency_ms": round(self.quantile(0.999), 2),
+            "min_latency_ms": round(self.min, 2) if self.count else 0.0,
+            "max_latency_ms": round(self.max, 2)
+        }
+
+class RollingWindow:
+    """Franjas de 10 s con histograma y contadores propios (copia de observability/mcp_metrics.py)."""
+
+    def __init__(self, slot_seconds: int = 10, slots: int = 90):
+        self.slot_seconds = slot_seconds
+        self.slots: deque = deque(maxlen=slots)  # (inicio_franja, histograma, consultas, errores)
+
+    def _current_slot(self, now: float) -> list:
+        start = int(now // self.slot_seconds) * self.slot_seconds
+        if not self.slots or self.slots[-1][0] != start:
+            self.slots.append([start, LatencyHistogram(), 0, 0])
+        return self.slots[-1]
+
+    def record(self, latency_ms: float, error: bool, now: Optional[float] = None):
+        slot = self._current_slot(now or time.time())
+        slot[2] += 1
+        if error:
+            slot[3] += 1
+        else:
+            slot[1].record(latency_ms)
+
+    def window(self, seconds: int, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        merged = LatencyHistogram()
+        queries = errors = 0
+        for start, histogram, slot_queries, slot_errors in self.slots:
+            if start > now - seconds:
+                merged.merge(histogram)
+                queries += slot_queries
+                errors += slot_errors
+        summary = merged.summary()
+        summary.update({
+            "queries": queries,
+            "qps": round(queries / seconds, 3),
+            "error_rate": round(errors / queries * 100, 2) if queries else 0.0
+        })
+        return summary
+
+# Ventanas reportadas en get_metrics_summary (etiqueta -> segundos)
+SUMMARY_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+class _FallbackStats:
+    """Latencia acumulada, ventanas y contadores de un tipo de fallback."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.window = RollingWindow()
+        self.count = 0
+        self.errors = 0
 
 class MCPObserver:
     def __init__(self, max_history: int = 1000):
         self.max_history = max_history
         self.metrics_history = deque(maxlen=max_history)
-        self.session_stats = defaultdict(list)
+        self.latency = LatencyHistogram()
+        self.window = RollingWindow()
+        self.fallback_stats: Dict[str, _FallbackStats] = defaultdict(_FallbackStats)
         self.error_count = 0
         self.total_queries = 0
         self.start_time = datetime.now()
@@ -70,82 +336,74 @@ class MCPObserver:
     def record_search_metrics(self, metrics: MCPMetrics):
         self.metrics_history.append(metrics)
         self.total_queries += 1
+        is_error = metrics.error is not None
         
-        if metrics.error:
+        stats = self.fallback_stats[metrics.fallback_used]
+        stats.count += 1
+        self.window.record(metrics.latency_ms, is_error)
+        stats.window.record(metrics.latency_ms, is_error)
+        if is_error:
             self.error_count += 1
+            stats.errors += 1
+        else:
+            self.latency.record(metrics.latency_ms)
+            stats.latency.record(metrics.latency_ms)
         
-        self.session_stats[metrics.fallback_used].append(metrics.latency_ms)
+        PROM_SEARCH_LATENCY.labels(fallback=metrics.fallback_used).observe(metrics.latency_ms / 1000)
         
-        # Log para debugging
-        print(f"[METRICS] Query: '{metrics.query[:50]}...' | "
-              f"Latency: {metrics.latency_ms:.1f}ms | "
-              f"Fallback: {metrics.fallback_used} | "
-              f"Results: {metrics.results_count}")
-        logger.info(f"[METRICS] Query processed: {metrics.query[:30]}")
+        # stdout es el canal del protocolo MCP: el log va solo por logger (stderr)
+        logger.info(f"[METRICS] Query: '{metrics.query[:50]}...' | "
+                    f"Latency: {metrics.latency_ms:.1f}ms | "
+                    f"Fallback: {metrics.fallback_used} | "
+                    f"Results: {metrics.results_count}")
         
-        # Escribir métricas a archivo persistente
-        try:
-            metrics_file = Path("mcp_metrics_live.json")
-            
-            # Crear estructura de datos para el archivo
-            metric_data = {
-                "timestamp": metrics.timestamp.isoformat(),
-                "query": metrics.query,
-                "latency_ms": metrics.latency_ms,
-                "similarity_scores": metrics.similarity_scores,
-                "fallback_used": metrics.fallback_used,
-                "response_length": metrics.response_length,
-                "results_count": metrics.results_count,
-                "error": metrics.error
-            }
-            
-            # Leer métricas existentes o crear nueva estructura
-            if metrics_file.exists():
-                with open(metrics_file, 'r') as f:
-                    data = json.load(f)
-            else:
-                data = {"metrics": [], "summary": {}}
-            
-            # Agregar nueva métrica
-            data["metrics"].append(metric_data)
-            
-            # Mantener solo las últimas 100 métricas
-            if len(data["metrics"]) > 100:
-                data["metrics"] = data["metrics"][-100:]
-            
-            # Actualizar resumen
-            data["summary"] = {
-                "total_queries": self.total_queries,
-                "error_count": self.error_count,
-                "last_updated": datetime.now().isoformat(),
-                "avg_latency": sum(m["latency_ms"] for m in data["metrics"]) / len(data["metrics"]) if data["metrics"] else 0
-            }
-            
-            # Escribir archivo
-            with open(metrics_file, 'w') as f:
-                json.dump(data, f, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Error escribiendo métricas a archivo: {e}")
+        # Sin E/S en la ruta de la petición: el sink escribe a disco en segundo plano
+        metrics_sink.record({
+            "timestamp": metrics.timestamp.isoformat(),
+            "query": metrics.query,
+            "latency_ms": metrics.latency_ms,
+            "similarity_scores": metrics.similarity_scores,
+            "fallback_used": metrics.fallback_used,
+            "response_length": metrics.response_length,
+            "results_count": metrics.results_count,
+            "error": metrics.error,
+            "cache": metrics.cache
+        }, total_queries=self.total_queries, error_count=self.error_count)
 
     def get_performance_summary(self) -> Dict[str, Any]:
-        if not self.metrics_history:
+        if not self.total_queries:
             return {"status": "no_data", "message": "No hay datos de métricas disponibles aún"}
         
-        recent_metrics = list(self.metrics_history)
-        latencies = [m.latency_ms for m in recent_metrics if m.error is None]
-        
-        if not latencies:
+        if not self.latency.count:
             return {"status": "no_valid_data", "error_rate": 100.0}
         
+        latency = self.latency.summary()
         return {
             "status": "active",
             "timestamp": datetime.now().isoformat(),
             "performance": {
-                "avg_latency_ms": round(statistics.mean(latencies), 2),
-                "median_latency_ms": round(statistics.median(latencies), 2),
+                "avg_latency_ms": latency["avg_latency_ms"],
+                "median_latency_ms": latency["p50_latency_ms"],
+                "p95_latency_ms": latency["p95_latency_ms"],
+                "p99_latency_ms": latency["p99_latency_ms"],
+                "p999_latency_ms": latency["p999_latency_ms"],
+                "min_latency_ms": latency["min_latency_ms"],
+                "max_latency_ms": latency["max_latency_ms"],
                 "total_queries": self.total_queries
             },
+            "windows": {
+                label: self.window.window(seconds)
+                for label, seconds in SUMMARY_WINDOWS.items()
+            },
+            "by_fallback": {
+                fb_type: {
+                    **stats.latency.summary(),
+                    "queries": stats.count,
+                    "errors": stats.errors,
+                    "last_5m": stats.window.window(SUMMARY_WINDOWS["5m"])
+                }
+                for fb_type, stats in self.fallback_stats.items()
+            },
             "throughput": {
                 "total_queries": self.total_queries,
                 "error_rate": round((self.error_count / self.total_queries * 100) if self.total_queries > 0 else 0, 2)
@@ -153,7 +411,8 @@ class MCPObserver:
         }
 
 def create_metrics(query: str, start_time: float, search_results: List[Dict], 
-                  fallback_type: str, response_content: str, error: str = None) -> MCPMetrics:
+                  fallback_type: str, response_content: str, error: str = None,
+                  cache: Optional[str] = None) -> MCPMetrics:
     latency_ms = (time.time() - start_time) * 1000
     
     similarity_scores = []
@@ -168,7 +427,8 @@ def create_metrics(query: str, start_time: float, search_results: List[Dict],
         response_length=len(response_content),
         results_count=len(search_results) if search_results else 0,
         timestamp=datetime.now(),
-        error=error
+        error=error,
+        cache=cache
     )
 
 # Instancia global del observador
@@ -191,58 +451,737 @@ logger = logging.getLogger(__name__)
 logger.info("INFO: Servidor MCP de Conocimiento Standalone: Inicializando...")
 app = Server("knowledge-base")
 
-# Modelo se carga de forma diferida para evitar timeouts durante inicialización
-model = None
+# --- Registro de modelos de embeddings ---
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_EMBEDDING_DIMENSION = 384
 
-def get_model():
-    """Carga el modelo SentenceTransformer de forma diferida."""
-    global model
-    if model is None:
-        logger.info("Cargando modelo SentenceTransformer...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("✅ Modelo de embeddings cargado y listo.")
-    return model
+class EmbeddingConfig:
+    """
+    Modelo, columna y dimensión de embeddings a usar, validados contra el
+    registro `embedding_models` y la columna vector real de knowledge_base.
+    Si algo no cuadra se desactiva la búsqueda vectorial (y no se codifica la consulta).
+    """
 
-async def get_db_connection():
-    """Obtiene una conexión a la base de datos PostgreSQL."""
-    try:
-        return await asyncpg.connect(
-            host='127.0.0.1',  # Siempre usar localhost para el proxy
-            port=5433,  # Puerto del proxy
-            user=os.getenv('DB_USER', 'app_user'),  # Usuario correcto
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME', 'customer_service'),  # BD correcta
-            timeout=30  # Timeout más largo
-        )
-    except Exception as e:
-        logger.error(f"Error conectando a la base de datos: {e}")
-        raise
+    def __init__(self):
+        # EMBEDDING_MODEL fuerza un modelo concreto; si no, se usa el activo del registro
+        self.requested_model = os.getenv('EMBEDDING_MODEL')
+        self.model_name = self.requested_model or DEFAULT_EMBEDDING_MODEL
+        self.column = 'embedding'
+        self.dimension = DEFAULT_EMBEDDING_DIMENSION
+        self.error: Optional[str] = None
+        self.loaded = False
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None
+
+    async def load(self, conn):
+        """Lee el registro y comprueba la dimensión declarada de la columna."""
+        try:
+            if self.requested_model:
+                row = await conn.fetchrow(
+                    "SELECT model_name, dimension, column_name FROM embedding_models WHERE model_name = $1",
+                    self.requested_model)
+            else:
+                row = await conn.fetchrow(
+                    "SELECT model_name, dimension, column_name FROM embedding_models WHERE active")
+        except asyncpg.UndefinedTableError:
+            row = None
+            logger.warning("Tabla embedding_models no encontrada; ejecute scripts/init_database.py")
+
+        if row:
+            self.model_name = row['model_name']
+            self.dimension = row['dimension']
+            self.column = row['column_name']
+        elif self.requested_model:
+            self._fail(f"Modelo {self.requested_model} no registrado en embedding_models")
 
-async def semantic_search(query_embedding: list[float], top_k: int = 3):
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", self.column):
+            self._fail(f"Nombre de columna no válido en el registro: {self.column}")
+        else:
+            declared = await conn.fetchval("""
+                SELECT atttypmod FROM pg_attribute
+                WHERE attrelid = 'knowledge_base'::regclass AND attname = $1 AND NOT attisdropped
+            """, self.column)
+            if declared != self.dimension:
+                self._fail(f"knowledge_base.{self.column} es vector({declared}) pero "
+                           f"{self.model_name} genera {self.dimension} dimensiones")
+
+        self.loaded = True
+        if self.is_valid:
+            logger.info(f"Embeddings: {self.model_name} ({self.dimension} dims) -> knowledge_base.{self.column}")
+
+    def check_model(self, loaded_model):
+        """Valida la dimensión real del modelo cargado contra el registro."""
+        dimension = loaded_model.get_sentence_embedding_dimension()
+        if dimension != self.dimension:
+            self._fail(f"{self.model_name} genera {dimension} dimensiones, registro declara {self.dimension}")
+
+    def _fail(self, message: str):
+        self.error = message
+        logger.error(f"❌ Búsqueda vectorial desactivada: {message}")
+
+embedding_config = EmbeddingConfig()
+
+# --- Caché de embeddings de consultas ---
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '2048'))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv('EMBEDDING_CACHE_TTL_SECONDS', '86400'))
+EMBEDDING_CACHE_FILE = os.getenv('EMBEDDING_CACHE_FILE')  # Opcional: arranque en caliente
+EMBEDDING_CACHE_SAVE_SECONDS = float(os.getenv('EMBEDDING_CACHE_SAVE_SECONDS', '60'))
+
+class QueryEmbeddingCache:
+    """
+    Caché LRU con TTL de embeddings de consultas, indexada por (modelo, consulta normalizada).
+    Las consultas de soporte se repiten mucho ("cargo duplicado", "mi servicio no funciona"),
+    así que un acierto evita por completo el encode, el paso más costoso en CPU.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 86400,
+                 persist_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._dirty = False
+        self._save_task = None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Minúsculas, sin signos de puntuación en los extremos y espacios colapsados."""
+        return " ".join(query.lower().strip(" \t\n¿?¡!.,;:").split())
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        key = (model_name, self.normalize(query))
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, embedding = entry
+            if time.time() - created_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, model_name: str, query: str, embedding: List[float], created_at: float = None):
+        key = (model_name, self.normalize(query))
+        self._entries[key] = (created_at or time.time(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            "persist_file": str(self.persist_path) if self.persist_path else None
+        }
+
+    def load(self):
+        """Carga las entradas no caducadas del fichero de persistencia (si existe)."""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for item in data.get("entries", []):
+                if now - item["created_at"] <= self.ttl_seconds:
+                    self.put(item["model"], item["query"], item["embedding"], created_at=item["created_at"])
+            self._dirty = False
+            logger.info(f"Caché de embeddings cargada: {len(self._entries)} entradas")
+        except Exception as e:
+            logger.warning(f"No se pudo cargar la caché de embeddings: {e}")
+
+    def save(self):
+        """Escribe la caché de forma atómica (fichero temporal + rename)."""
+        entries = self._snapshot()
+        if entries is not None:
+            self._write(entries)
+
+    def _snapshot(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.persist_path or not self._dirty:
+            return None
+        self._dirty = False
+        return [
+            {"model": model_name, "query": query, "created_at": created_at, "embedding": embedding}
+            for (model_name, query), (created_at, embedding) in self._entries.items()
+        ]
+
+    def _write(self, entries: List[Dict[str, Any]]):
+        try:
+            tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            self._dirty = True
+            logger.warning(f"No se pudo guardar la caché de embeddings: {e}")
+
+    def start(self):
+        self.load()
+        if self.persist_path:
+            self._save_task = asyncio.create_task(self._periodic_save())
+
+    async def stop(self):
+        if self._save_task:
+            self._save_task.cancel()
+            self._save_task = None
+        self.save()
+
+    async def _periodic_save(self):
+        while True:
+            await asyncio.sleep(EMBEDDING_CACHE_SAVE_SECONDS)
+            # La copia se toma en el event loop; la escritura va a un hilo para no bloquear búsquedas
+            entries = self._snapshot()
+            if entries is not None:
+                await asyncio.to_thread(self._write, entries)
+
+embedding_cache = QueryEmbeddingCache(
+    max_size=EMBEDDING_CACHE_SIZE,
+    ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+    persist_path=EMBEDDING_CACHE_FILE
+)
+
+# --- Caché de resultados de búsqueda ---
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+
+class SearchResultCache:
+    """
+    Caché de respuestas formateadas de `search_knowledge`.
+    La clave incluye la consulta normalizada, top_k y los parámetros ANN; todas las
+    entradas pertenecen a una versión de la knowledge_base y se descartan cuando cambia.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, top_k: int, ef_search=None, probes=None) -> tuple:
+        return (QueryEmbeddingCache.normalize(query), top_k, ef_search, probes)
+
+    def set_version(self, version):
+        """
+        Fija la versión vigente de la KB; si avanzó, las entradas existentes quedan obsoletas.
+        Una versión anterior (lectura que terminó tras una notificación más nueva) se ignora.
+        """
+        if version is None or (self.version is not None and version <= self.version):
+            return
+        if self._entries:
+            self.invalidations += 1
+            self._entries.clear()
+        self.version = version
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if time.monotonic() - created_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, value, version):
+        # Si la KB cambió mientras se resolvía la búsqueda, el resultado ya no es válido
+        if version is None or version != self.version:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "kb_version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+        }
+
+result_cache = SearchResultCache(max_size=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+# --- Carga del modelo en segundo plano ---
+MODEL_READY_TIMEOUT_SECONDS = float(os.getenv('MODEL_READY_TIMEOUT_SECONDS', '25'))
+# torch (por defecto) | onnx | onnx-int8: ver embedding_backends.py
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+
+class ModelWarmup:
+    """
+    Carga el backend de embeddings (EMBEDDING_BACKEND) en un hilo al arrancar el proceso.
+    El handshake MCP (initialize / list_tools) no espera por él; las búsquedas
+    esperan a `wait()` y, si se agota el tiempo, recurren a la búsqueda por texto.
+    Se empieza con el modelo de EMBEDDING_MODEL o el por defecto, sin esperar a la BD;
+    al leer el registro se cambia de modelo si nombra otro (`apply_registry`).
+    """
+
+    def __init__(self):
+        self.model_name: Optional[str] = None
+        self.model = None
+        self.backend: Optional[str] = None
+        self.error: Optional[str] = None
+        self._future: Optional[asyncio.Future] = None
+        self._started_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        return self._future is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def start(self, model_name: str):
+        """Lanza la carga (idempotente) en el executor por defecto del event loop."""
+        if self._future is not None:
+            return
+        self.model_name = model_name
+        self.error = None
+        self._started_at = time.time()
+        self._future = asyncio.get_running_loop().run_in_executor(None, self._load, model_name)
+        self._future.add_done_callback(self._on_loaded)
+
+    def _load(self, model_name: str):
+        # Importar aquí evita que torch / onnxruntime retrasen el arranque del proceso
+        from embedding_backends import create_embedding_backend
+
+        logger.info(f"Cargando modelo de embeddings {model_name} (backend {EMBEDDING_BACKEND})...")
+        return create_embedding_backend(EMBEDDING_BACKEND, model_name)
+
+    def _on_loaded(self, future: asyncio.Future):
+        # En el event loop: una carga sustituida por otro modelo se descarta
+        if future is not self._future or future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.error = str(error)
+            logger.error(f"❌ Error cargando el modelo de embeddings: {error}")
+            return
+        self.model = future.result()
+        self.backend = self.model.name
+        self.load_seconds = round(time.time() - self._started_at, 2)
+        if self.backend != EMBEDDING_BACKEND.lower():
+            logger.warning(f"⚠️ Backend de embeddings {self.backend} en lugar del configurado "
+                           f"(EMBEDDING_BACKEND={EMBEDDING_BACKEND}); ver el aviso anterior")
+        logger.info(f"✅ Modelo de embeddings {self.model_name} cargado y listo ({self.load_seconds}s).")
+        if embedding_config.loaded:
+            embedding_config.check_model(self.model)
+
+    def apply_registry(self):
+        """
+        Con el registro ya leído: si no es válido se descarta la carga; si nombra otro
+        modelo se cambia a ese; si es el mismo se valida la dimensión del ya cargado.
+        """
+        if not embedding_config.is_valid:
+            self.cancel()
+        elif self.model_name != embedding_config.model_name:
+            if self.started:
+                logger.info(f"El registro indica {embedding_config.model_name}; se descarta {self.model_name}")
+            self.cancel()
+            self.start(embedding_config.model_name)
+        elif self.ready:
+            embedding_config.check_model(self.model)
+
+    def cancel(self):
+        """Descarta la carga en curso o el modelo cargado (el hilo termina, su resultado se ignora)."""
+        future, self._future = self._future, None
+        if future is not None and not future.done():
+            future.cancel()
+        self.model_name = None
+        self.model = None
+        self.backend = None
+        self.load_seconds = None
+        self._started_at = None
+
+    async def wait(self, timeout: float = MODEL_READY_TIMEOUT_SECONDS):
+        """Espera a que el modelo esté listo (lo arranca si nadie lo hizo)."""
+        if self._future is None:
+            self.start(embedding_config.model_name)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            future = self._future
+            try:
+                # shield: un timeout de esta petición no cancela la carga compartida
+                return await asyncio.wait_for(asyncio.shield(future), timeout=max(0, deadline - loop.time()))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # se canceló esta petición, no la carga
+                if self._future is None:
+                    raise RuntimeError("Carga del modelo descartada: registro de embeddings no válido")
+                # Carga sustituida por la del modelo del registro: se espera a la nueva
+
+    def status(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.error:
+            state = "error"
+        elif self.started:
+            state = "loading"
+        else:
+            state = "not_started"
+        return {
+            "state": state,
+            "model": self.model_name,
+            "backend": self.backend or EMBEDDING_BACKEND,
+            "requested_backend": EMBEDDING_BACKEND,
+            "load_seconds": self.load_seconds,
+            "loading_for_seconds": round(time.time() - self._started_at, 2) if self.started and not self.ready else None,
+            "error": self.error
+        }
+
+model_warmup = ModelWarmup()
+
+async def get_model():
+    """Devuelve el modelo de embeddings, esperando a que termine su carga en segundo plano."""
+    return await model_warmup.wait()
+
+# --- Codificación por micro-lotes fuera del event loop ---
+ENCODE_BATCH_WINDOW_MS = float(os.getenv('ENCODE_BATCH_WINDOW_MS', '5'))
+ENCODE_MAX_BATCH_SIZE = int(os.getenv('ENCODE_MAX_BATCH_SIZE', '32'))
+
+class EncodeBatcher:
+    """
+    Agrupa las consultas que llegan dentro de una ventana corta en una sola llamada
+    a `encode`, ejecutada en un hilo dedicado para no bloquear el event loop.
+    Mientras un lote se codifica, las nuevas consultas se acumulan para el siguiente,
+    así que el tamaño de lote crece solo con la concurrencia.
+    """
+
+    def __init__(self, window_ms: float = 5.0, max_batch_size: int = 32):
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = False
+        self._model = None
+        # Un solo hilo: torch / onnxruntime ya paralelizan internamente cada lote
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self.batches = 0
+        self.items = 0
+        self.max_batch = 0
+
+    async def encode(self, model, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._model = model
+        self._pending.append((text, future))
+
+        if not self._in_flight:
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Las peticiones canceladas (timeout del cliente) no se codifican
+        batch = [(text, future) for text, future in self._pending[:self.max_batch_size] if not future.done()]
+        del self._pending[:self.max_batch_size]
+        if not batch:
+            if self._pending:
+                self._flush()
+            return
+
+        texts = list(dict.fromkeys(text for text, _ in batch))  # consultas repetidas se codifican una vez
+        self._in_flight = True
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self._executor, self._encode, self._model, texts)
+        task.add_done_callback(lambda done: self._resolve(done, texts, batch))
+
+    @staticmethod
+    def _encode(model, texts: List[str]):
+        start = time.perf_counter()
+        vectors = model.encode(texts, batch_size=len(texts)).tolist()
+        PROM_ENCODE_TIME.observe(time.perf_counter() - start)
+        PROM_ENCODE_BATCH.observe(len(texts))
+        return vectors
+
+    def _resolve(self, done: asyncio.Future, texts: List[str], batch: List[tuple]):
+        self._in_flight = False
+        error = done.exception()
+        vectors = None if error else dict(zip(texts, done.result()))
+        for text, future in batch:
+            if future.done():
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(vectors[text])
+
+        # Lo acumulado mientras se codificaba sale ya, sin esperar otra ventana
+        if self._pending:
+            self._flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "queries": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "pending": len(self._pending),
+            "window_ms": self.window * 1000
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+encode_batcher = EncodeBatcher(window_ms=ENCODE_BATCH_WINDOW_MS, max_batch_size=ENCODE_MAX_BATCH_SIZE)
+
+# Pool de conexiones del servidor: se crea una sola vez al arrancar el proceso
+db_pool = None
+_db_pool_lock = None
+
+async def _init_db_connection(conn):
+    """Registra los codecs de pgvector una única vez por conexión del pool."""
+    await register_vector(conn)
+
+async def get_db_pool():
+    """Obtiene el pool de conexiones PostgreSQL, creándolo si aún no existe."""
+    global db_pool, _db_pool_lock
+    if db_pool is not None:
+        return db_pool
+
+    if _db_pool_lock is None:
+        _db_pool_lock = asyncio.Lock()
+
+    async with _db_pool_lock:
+        if db_pool is None:
+            try:
+                db_pool = await asyncpg.create_pool(
+                    host='127.0.0.1',  # Siempre usar localhost para el proxy
+                    port=int(os.getenv('PROXY_PORT', '5433')),  # Puerto del proxy
+                    user=os.getenv('DB_USER', 'app_user'),  # Usuario correcto
+                    password=os.getenv('DB_PASSWORD'),
+                    database=os.getenv('DB_NAME', 'customer_service'),  # BD correcta
+                    min_size=int(os.getenv('MCP_DB_POOL_MIN_SIZE', '1')),
+                    max_size=int(os.getenv('MCP_DB_POOL_MAX_SIZE', '5')),
+                    timeout=30,  # Timeout de conexión (solo al abrir conexiones nuevas)
+                    command_timeout=float(os.getenv('MCP_DB_COMMAND_TIMEOUT', '15')),
+                    init=_init_db_connection,
+                    # Parámetros por defecto de los índices ANN (HNSW / IVFFlat)
+                    server_settings={
+                        'hnsw.ef_search': os.getenv('KB_HNSW_EF_SEARCH', '40'),
+                        'ivfflat.probes': os.getenv('KB_IVFFLAT_PROBES', '1')
+                    }
+                )
+                logger.info("✅ Pool de conexiones a la base de conocimiento listo")
+            except Exception as e:
+                logger.error(f"Error conectando a la base de datos: {e}")
+                raise
+    return db_pool
+
+async def close_db_pool():
+    """Cierra el pool al apagar el servidor."""
+    global db_pool
+    if db_pool is not None:
+        pool, db_pool = db_pool, None
+        await pool.close()
+        logger.info("Pool de conexiones cerrado")
+
+# Estado de la knowledge_base cacheado en memoria para no consultarlo en cada búsqueda
+KB_CHANGES_CHANNEL = 'knowledge_base_changed'
+KB_STATE_REFRESH_SECONDS = float(os.getenv('KB_STATE_REFRESH_SECONDS', '60'))
+
+class KnowledgeBaseState:
+    """
+    Mantiene en memoria si la knowledge_base tiene embeddings y su versión.
+    Se calcula al arrancar y se refresca con LISTEN/NOTIFY (trigger creado en
+    scripts/init_database.py) y, como respaldo, de forma periódica.
+    """
+
+    def __init__(self):
+        self.embeddings_available = False
+        self.version = None
+        self.last_refresh: Optional[datetime] = None
+        self._pool = None
+        self._listener_conn = None
+        self._refresh_task = None
+        self._pending_refresh = None
+        # Notificación recibida con un refresco en curso: hay que volver a leer al terminar
+        self._refresh_again = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.last_refresh is not None
+
+    @property
+    def vector_search_ready(self) -> bool:
+        """Solo merece la pena codificar la consulta si hay vectores compatibles."""
+        return self.embeddings_available and embedding_config.is_valid
+
+    async def refresh(self, conn=None):
+        """Recalcula el estado. EXISTS se detiene en la primera fila con embedding."""
+        if conn is None:
+            pool = self._pool or await get_db_pool()
+            async with pool.acquire() as pooled_conn:
+                return await self.refresh(pooled_conn)
+
+        if not embedding_config.loaded:
+            await embedding_config.load(conn)
+            model_warmup.apply_registry()
+
+        if embedding_config.is_valid:
+            self.embeddings_available = await conn.fetchval(
+                f"SELECT EXISTS (SELECT 1 FROM knowledge_base WHERE {embedding_config.column} IS NOT NULL)"
+            )
+        else:
+            self.embeddings_available = False
+
+        # Contador de versión incrementado por el trigger de knowledge_base
+        try:
+            version = await conn.fetchval("SELECT version FROM knowledge_base_version")
+        except asyncpg.UndefinedTableError:
+            # Esquema anterior sin contador: se usa la última modificación como versión
+            version = await conn.fetchval("SELECT max(updated_at) FROM knowledge_base")
+        self._advance_version(version)
+        self.last_refresh = datetime.now()
+        logger.info(f"Estado de la knowledge_base actualizado (embeddings: {self.embeddings_available})")
+
+    async def start(self, pool):
+        """Carga el estado inicial y se suscribe a los cambios de la tabla."""
+        self._pool = pool
+        await self.refresh()
+        await self._listen()
+        self._refresh_task = asyncio.create_task(self._periodic_refresh())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self._unlisten()
+
+    async def _listen(self):
+        try:
+            self._listener_conn = await self._pool.acquire()
+            await self._listener_conn.add_listener(KB_CHANGES_CHANNEL, self._on_change)
+        except Exception as e:
+            logger.warning(f"LISTEN no disponible, solo se usará el refresco periódico: {e}")
+            await self._unlisten()
+
+    async def _unlisten(self):
+        conn, self._listener_conn = self._listener_conn, None
+        if conn is None:
+            return
+        try:
+            if not conn.is_closed():
+                await conn.remove_listener(KB_CHANGES_CHANNEL, self._on_change)
+            await self._pool.release(conn)
+        except Exception as e:
+            logger.warning(f"Error liberando la conexión LISTEN: {e}")
+
+    def _advance_version(self, version):
+        """
+        La versión solo avanza: un refresco que leyó la tabla antes de una notificación
+        más reciente no puede devolver la caché de resultados a la versión anterior.
+        """
+        if version is not None and (self.version is None or version > self.version):
+            self.version = version
+        result_cache.set_version(self.version)
+
+    def _on_change(self, conn, pid, channel, payload):
+        # El payload trae la nueva versión: los resultados cacheados se invalidan al instante
+        if payload and payload.isdigit():
+            self._advance_version(int(payload))
+        # Agrupar ráfagas de notificaciones (p.ej. ingestas por lotes) en un único refresco
+        if self._pending_refresh is None or self._pending_refresh.done():
+            self._pending_refresh = asyncio.create_task(self._safe_refresh())
+        else:
+            self._refresh_again = True
+
+    async def _safe_refresh(self):
+        # Se repite mientras lleguen notificaciones durante el refresco (embeddings_available)
+        while True:
+            self._refresh_again = False
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refrescando el estado de la knowledge_base: {e}")
+            if not self._refresh_again:
+                return
+
+    async def _periodic_refresh(self):
+        while True:
+            await asyncio.sleep(KB_STATE_REFRESH_SECONDS)
+            await self._safe_refresh()
+            # Re-suscribirse si la conexión LISTEN se perdió
+            if self._listener_conn is None or self._listener_conn.is_closed():
+                await self._unlisten()
+                await self._listen()
+
+kb_state = KnowledgeBaseState()
+
+async def semantic_search(query_embedding: Optional[list[float]], top_k: int = 3,
+                          ef_search: Optional[int] = None, probes: Optional[int] = None):
     """
     Realiza una búsqueda semántica en la base de conocimiento.
-    Si no hay embeddings, usa búsqueda por texto como fallback.
+    Si no hay embeddings (o `query_embedding` es None), usa búsqueda por texto como fallback.
+    `ef_search` / `probes` ajustan el índice ANN solo para esta consulta.
     """
     try:
-        conn = await get_db_connection()
-        try:
-            # Primero verificar si hay embeddings disponibles
-            embedding_count = await conn.fetchval("SELECT count(*) FROM knowledge_base WHERE embedding IS NOT NULL")
+        pool = await get_db_pool()
+        wait_start = time.perf_counter()
+        async with pool.acquire() as conn:
+            query_start = time.perf_counter()
+            PROM_POOL_WAIT.observe(query_start - wait_start)
+            # El estado se calcula al arrancar; solo se consulta aquí si el arranque no pudo hacerlo
+            if not kb_state.is_loaded:
+                await kb_state.refresh(conn)
             
-            if embedding_count > 0:
-                # Búsqueda semántica con embeddings
-                embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-                
-                query = """
+            if query_embedding is not None and kb_state.vector_search_ready:
+                # Búsqueda semántica con embeddings (codec vector registrado en el pool)
+                column = embedding_config.column
+                query = f"""
                 SELECT title, content, 
-                       1 - (embedding <=> $1::vector) as similarity
+                       1 - ({column} <=> $1::vector) as similarity
                 FROM knowledge_base 
-                WHERE embedding IS NOT NULL
-                ORDER BY embedding <=> $1::vector
+                WHERE {column} IS NOT NULL
+                ORDER BY {column} <=> $1::vector
                 LIMIT $2
                 """
                 
-                rows = await conn.fetch(query, embedding_str, top_k)
+                if ef_search is None and probes is None:
+                    rows = await conn.fetch(query, query_embedding, top_k)
+                else:
+                    # set_config(..., true) equivale a SET LOCAL dentro de la transacción
+                    async with conn.transaction():
+                        if ef_search is not None:
+                            await conn.execute("SELECT set_config('hnsw.ef_search', $1, true)", str(int(ef_search)))
+                        if probes is not None:
+                            await conn.execute("SELECT set_config('ivfflat.probes', $1, true)", str(int(probes)))
+                        rows = await conn.fetch(query, query_embedding, top_k)
                 
             else:
                 # Fallback: búsqueda por texto usando ILIKE
@@ -291,11 +1230,9 @@ async def semantic_search(query_embedding: list[float], top_k: int = 3):
                         'similarity': 0.5
                     })
             
+            PROM_DB_QUERY.observe(time.perf_counter() - query_start)
             return results
             
-        finally:
-            await conn.close()
-            
     except Exception as e:
         logger.error(f"Error en búsqueda semántica: {e}")
         # Devolver resultados de fallback si falla la BD
@@ -303,7 +1240,8 @@ async def semantic_search(query_embedding: list[float], top_k: int = 3):
             {
                 'title': 'Sistema en Mantenimiento',
                 'content': f'No se pudo acceder a la base de conocimiento. Error: {str(e)}. Por favor, contacte al administrador del sistema.',
-                'similarity': 0.5
+                'similarity': 0.5,
+                'error': str(e)  # Nunca se guarda en la caché de resultados
             }
         ]
 
@@ -329,6 +1267,18 @@ async def list_tools() -> list[Tool]:
                         "default": 3,
                         "minimum": 1,
                         "maximum": 10
+                    },
+                    "ef_search": {
+                        "type": "integer",
+                        "description": "Opcional: tamaño de la lista de candidatos HNSW (más alto = más recall, más latencia)",
+                        "minimum": 1,
+                        "maximum": 1000
+                    },
+                    "probes": {
+                        "type": "integer",
+                        "description": "Opcional: número de listas IVFFlat a explorar",
+                        "minimum": 1,
+                        "maximum": 1000
                     }
                 },
                 "required": ["query"]
@@ -336,6 +1286,19 @@ async def list_tools() -> list[Tool]:
         )
     ]
     
+    # Sonda de disponibilidad: responde aunque el modelo siga cargando
+    tools.append(
+        Tool(
+            name="get_readiness",
+            description="Indica si el servidor está listo: carga del modelo de embeddings, base de datos y búsqueda vectorial",
+            inputSchema={
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        )
+    )
+    
     # Agregar herramientas de métricas si están disponibles
     if METRICS_ENABLED:
         tools.extend([
@@ -366,12 +1329,37 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
     """
     Ejecuta la herramienta especificada con los argumentos dados.
     """
+    if name == "get_readiness":
+        readiness = {
+            "ready": model_warmup.ready and kb_state.is_loaded,
+            "model": model_warmup.status(),
+            "encoder": encode_batcher.stats(),
+            "database": {
+                "pool": db_pool is not None,
+                "kb_state_loaded": kb_state.is_loaded,
+                "embeddings_available": kb_state.embeddings_available,
+                "kb_version": kb_state.version
+            },
+            "vector_search": {
+                "enabled": embedding_config.is_valid,
+                "error": embedding_config.error
+            }
+        }
+        return [TextContent(
+            type="text",
+            text=json.dumps(readiness, indent=2, default=str)
+        )]
+    
     # Manejar herramientas de métricas
     if METRICS_ENABLED and name in ["get_metrics_summary", "get_search_analytics"]:
         try:
             observer = get_observer()
             if name == "get_metrics_summary":
                 summary = observer.get_performance_summary()
+                summary["embedding_cache"] = embedding_cache.stats()
+                summary["result_cache"] = result_cache.stats()
+                summary["encoder"] = encode_batcher.stats()
+                summary["metrics_sink"] = metrics_sink.stats()
                 return [TextContent(
                     type="text",
                     text=f"📊 **Resumen de Métricas MCP**\n\n```json\n{json.dumps(summary, indent=2)}\n```"
@@ -401,117 +1389,57 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
     try:
         logger.info(f"INFO: Servidor MCP recibió la consulta: '{query}'")
         
-        # Generar embedding de la consulta
-        current_model = get_model()
-        query_embedding = current_model.encode(query).tolist()
-        
-        # Realizar búsqueda semántica
-        search_results = await semantic_search(query_embedding, top_k=top_k)
-        
-        # Determinar el tipo de fallback usado
-        if search_results:
-            if any(r.get('similarity', 0) > 0.7 for r in search_results):
-                fallback_type = "semantic"
-            elif any(r.get('similarity', 0) > 0.5 for r in search_results):
-                fallback_type = "text"
-            else:
-                fallback_type = "general"
-        else:
-            fallback_type = "none"
-        
-        if not search_results:
-            response_text = "No se encontraron soluciones relevantes en la base de conocimiento."
-        else:
-            # Formatear resultados
-            formatted_context = "\n---\n".join([
-                f"Título: {result['title']}\nContenido: {result['content']}\nRelevancia: {result['similarity']:.2f}"
-                for result in search_results
-            ])
-            response_text = f"Información encontrada en la base de conocimiento:\n\n{formatted_context}"
-        
-        # Registrar métricas de éxito
-        if METRICS_ENABLED:
-            metrics = create_metrics(
-                query=query,
-                start_time=start_time,
-                search_results=search_results,
-                fallback_type=fallback_type,
-                response_content=response_text,
-                error=None
-            )
-            get_observer().record_search_metrics(metrics)
+        if not kb_state.is_loaded:
+            try:
+                await kb_state.refresh()
+            except Exception as e:
+                logger.error(f"No se pudo cargar el estado de la knowledge_base: {e}")
         
-        return [TextContent(
-            type="text",
-            text=response_text
-        )]
-        
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"ERROR: Servidor MCP de Conocimiento: {e}")
-        
-        # Registrar métricas de error
-        if METRICS_ENABLED:
-            metrics = create_metrics(
-                query=query,
-                start_time=start_time,
-                search_results=search_results,
-                fallback_type="error",
-                response_content=f"Error al buscar en la base de conocimiento: {error_msg}",
-                error=error_msg
-            )
-            get_observer().record_search_metrics(metrics)
+        # Consultas repetidas con la misma versión de la KB se responden sin tocar la BD
+        cache_key = SearchResultCache.make_key(query, top_k, arguments.get("ef_search"), arguments.get("probes"))
+        kb_version = kb_state.version
+        cached = result_cache.get(cache_key) if kb_state.is_loaded else None
+        if kb_state.is_loaded:
+            record_cache("result", hit=cached is not None)
+        if cached is not None:
+            response_text, search_results, fallback_type = cached
+            if METRICS_ENABLED:
+                get_observer().record_search_metrics(create_metrics(
+                    query=query,
+                    start_time=start_time,
+                    search_results=search_results,
+                    fallback_type=fallback_type,
+                    response_content=response_text,
+                    error=None,
+                    cache="result"
+                ))
+            return [TextContent(type="text", text=response_text)]
         
-        return [TextContent(
-            type="text", 
-            text=f"Error al buscar en la base de conocimiento: {error_msg}"
-        )]
-async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextContent]:
-    """
-    Ejecuta la herramienta especificada con los argumentos dados.
-    """
-    # Manejar herramientas de métricas
-    if METRICS_ENABLED and name in ["get_metrics_summary", "get_search_analytics"]:
-        try:
-            observer = get_observer()
-            if name == "get_metrics_summary":
-                summary = observer.get_performance_summary()
-                return [TextContent(
-                    type="text",
-                    text=f"📊 **Resumen de Métricas MCP**\n\n```json\n{summary}\n```"
-                )]
-            elif name == "get_search_analytics":
-                analytics = observer.get_search_analytics()
-                return [TextContent(
-                    type="text",
-                    text=f"📈 **Análisis de Búsquedas MCP**\n\n```json\n{analytics}\n```"
-                )]
-        except Exception as e:
-            return [TextContent(
-                type="text",
-                text=f"Error al obtener métricas: {str(e)}"
-            )]
-    
-    if name != "search_knowledge":
-        raise ValueError(f"Herramienta desconocida: {name}")
-    
-    # Inicializar métricas
-    start_time = time.time()
-    query = arguments["query"]
-    top_k = arguments.get("top_k", 3)
-    search_results = []
-    fallback_type = "unknown"
-    error_msg = None
-    
-    try:
-        logger.info(f"INFO: Servidor MCP recibió la consulta: '{query}'")
-        
-        # Generar embedding de la consulta
-        current_model = get_model()
-        query_embedding = current_model.encode(query).tolist()
+        # Generar embedding de la consulta solo si la búsqueda vectorial es posible
+
+        query_embedding = None
+        cache_used = None
+        if kb_state.vector_search_ready:
+            query_embedding = embedding_cache.get(embedding_config.model_name, query)
+            record_cache("embedding", hit=query_embedding is not None)
+            if query_embedding is not None:
+                cache_used = "embedding"
+            if query_embedding is None:
+                try:
+                    current_model = await get_model()
+                except Exception as e:
+                    # Modelo aún cargando (timeout) o con error: mejor responder por texto que agotar el timeout del cliente
+                    logger.warning(f"Modelo de embeddings no disponible ({type(e).__name__}); usando búsqueda por texto")
+                    current_model = None
+                if current_model is not None and embedding_config.is_valid:
+                    query_embedding = await encode_batcher.encode(current_model, query)
+                    embedding_cache.put(embedding_config.model_name, query, query_embedding)
         
         # Realizar búsqueda semántica
-        search_results = await semantic_search(query_embedding, top_k=top_k)
+        search_results = await semantic_search(
+            query_embedding, top_k=top_k,
+            ef_search=arguments.get("ef_search"), probes=arguments.get("probes")
+        )
         
         # Determinar el tipo de fallback usado
         if search_results:
@@ -534,6 +1462,12 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
             ])
             response_text = f"Información encontrada en la base de conocimiento:\n\n{formatted_context}"
         
+        # Un resultado por texto mientras el modelo carga es degradado: no se cachea,
+        # para que la misma consulta use la búsqueda vectorial en cuanto esté disponible
+        degraded = kb_state.vector_search_ready and query_embedding is None
+        if not degraded and not any(r.get('error') for r in search_results):
+            result_cache.put(cache_key, (response_text, search_results, fallback_type), kb_version)
+        
         # Registrar métricas de éxito
         if METRICS_ENABLED:
             metrics = create_metrics(
@@ -542,7 +1476,8 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
                 search_results=search_results,
                 fallback_type=fallback_type,
                 response_content=response_text,
-                error=None
+                error=None,
+                cache=cache_used
             )
             get_observer().record_search_metrics(metrics)
         
@@ -572,20 +1507,48 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
             text=f"Error al buscar en la base de conocimiento: {error_msg}"
         )]
 
+async def startup():
+    """Inicialización en segundo plano: pool y estado de la KB (lee el registro de modelos)."""
+    # Crear el pool una sola vez; si la BD no está disponible se reintenta en la primera búsqueda
+    try:
+        pool = await get_db_pool()
+        await kb_state.start(pool)
+    except Exception as e:
+        logger.warning(f"Pool no inicializado al arrancar, se reintentará bajo demanda: {e}")
+
 async def main():
     """
     Función principal para ejecutar el servidor MCP.
     """
     from mcp.server.stdio import stdio_server
     
+    embedding_cache.start()
+    metrics_sink.start()
+    start_prometheus_endpoint()
+    
+    # El modelo (EMBEDDING_MODEL o el por defecto) se empieza a cargar ya, sin esperar a la BD;
+    # al leer el registro se cambia si indica otro o se descarta si no es válido
+    model_warmup.start(embedding_config.model_name)
+    
+    # BD y carga del modelo en segundo plano: el handshake MCP responde de inmediato
+    startup_task = asyncio.create_task(startup())
+    
     logger.info("✅ Servidor MCP de Conocimiento listo para recibir peticiones")
     
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        startup_task.cancel()
+        await embedding_cache.stop()
+        await metrics_sink.stop()
+        await kb_state.stop()
+        await close_db_pool()
+        encode_batcher.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,203 @@
+# scripts/backfill_sentiment.py
+"""
+Recalcula el sentimiento de customer_interactions.message (p.ej. tras cambiar
+las palabras clave de sentiment_classifier.py).
+
+- Lee los mensajes con un cursor del servidor (no carga la tabla en memoria)
+- Clasifica por bloques en un pool de procesos, mientras se lee el siguiente bloque
+- Escribe cada bloque con COPY a tablas temporales y una sentencia por tabla:
+  customer_interactions.sentiment y sentiment_cache (análisis completo, versión
+  de palabras clave y caducidad, igual que analyze_sentiment)
+
+Ejemplos:
+    python scripts/backfill_sentiment.py
+    python scripts/backfill_sentiment.py --only-missing --workers 4
+    python scripts/backfill_sentiment.py --since 2025-01-01 --chunk-size 20000 --no-cache
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import asyncpg
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+# Solo la clasificación pura: importar el paquete de agentes cargaría el grafo ADK en cada worker
+from sentiment_classifier import SentimentClassifier, analysis_to_record, hash_message
+
+# --- Pool de procesos: cada worker construye el clasificador (y su autómata) una vez ---
+_classifier = None
+
+
+def _init_worker():
+    global _classifier
+    _classifier = SentimentClassifier()
+
+
+def classify_chunk(messages: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(hash del mensaje, análisis) para cada mensaje del bloque."""
+    return [(hash_message(message), _classifier.classify(message)) for message in messages]
+
+
+# --- Escritura masiva ---
+TEMP_TABLES_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS backfill_interaction_sentiment (
+        id INTEGER,
+        sentiment VARCHAR(20)
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS backfill_sentiment_cache (
+        message_hash VARCHAR(64),
+        primary_sentiment VARCHAR(20),
+        urgency_level VARCHAR(20),
+        escalation_risk VARCHAR(20),
+        emotional_intensity FLOAT,
+        confidence_score FLOAT,
+        detected_keywords JSONB,
+        recommended_tone VARCHAR(50),
+        keyword_set_hash VARCHAR(64)
+    ) ON COMMIT DELETE ROWS;
+"""
+
+# Mensajes repetidos dentro del bloque: ON CONFLICT no admite tocar dos veces la misma fila
+CACHE_UPSERT_SQL = """
+    INSERT INTO sentiment_cache
+    (message_hash, primary_sentiment, urgency_level, escalation_risk, emotional_intensity,
+     confidence_score, detected_keywords, recommended_tone, keyword_set_hash, expires_at)
+    SELECT DISTINCT ON (message_hash)
+           message_hash, primary_sentiment, urgency_level, escalation_risk, emotional_intensity,
+           confidence_score, detected_keywords, recommended_tone, keyword_set_hash,
+           NOW() + make_interval(days => $1)
+    FROM backfill_sentiment_cache
+    ON CONFLICT (message_hash) DO UPDATE SET
+        primary_sentiment = EXCLUDED.primary_sentiment,
+        urgency_level = EXCLUDED.urgency_level,
+        escalation_risk = EXCLUDED.escalation_risk,
+        emotional_intensity = EXCLUDED.emotional_intensity,
+        confidence_score = EXCLUDED.confidence_score,
+        detected_keywords = EXCLUDED.detected_keywords,
+        recommended_tone = EXCLUDED.recommended_tone,
+        keyword_set_hash = EXCLUDED.keyword_set_hash,
+        expires_at = EXCLUDED.expires_at,
+        created_at = NOW()
+"""
+
+
+async def write_chunk(conn: asyncpg.Connection, rows, results, keyword_set_hash: str, write_cache: bool) -> int:
+    """Escribe un bloque en una transacción; devuelve las interacciones cuyo sentimiento cambió."""
+    async with conn.transaction():
+        await conn.copy_records_to_table(
+            "backfill_interaction_sentiment",
+            records=[(row["id"], analysis["primary_sentiment"]) for row, (_, analysis) in zip(rows, results)],
+        )
+        updated = await conn.execute("""
+            UPDATE customer_interactions i
+            SET sentiment = b.sentiment
+            FROM backfill_interaction_sentiment b
+            WHERE i.id = b.id AND i.sentiment IS DISTINCT FROM b.sentiment
+        """)
+
+        if write_cache:
+            await conn.copy_records_to_table(
+                "backfill_sentiment_cache",
+                records=[analysis_to_record(message_hash, keyword_set_hash, analysis)
+                         for message_hash, analysis in results],
+            )
+            await conn.execute(CACHE_UPSERT_SQL, settings.SENTIMENT_DB_TTL_DAYS)
+
+    return int(updated.split()[-1])
+
+
+def build_query(args) -> Tuple[str, list]:
+    conditions = ["message IS NOT NULL", "message <> ''"]
+    params = []
+    if args.only_missing:
+        conditions.append("sentiment IS NULL")
+    if args.since:
+        params.append(datetime.fromisoformat(args.since))
+        conditions.append(f"created_at >= ${len(params)}")
+    query = f"SELECT id, message FROM customer_interactions WHERE {' AND '.join(conditions)}"
+    if args.limit:
+        query += f" LIMIT {int(args.limit)}"
+    return query, params
+
+
+async def _connect() -> asyncpg.Connection:
+    return await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+
+
+async def backfill(args):
+    keyword_set_hash = SentimentClassifier().keyword_set_hash
+    query, params = build_query(args)
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+
+    # Lector (cursor en una transacción) y escritor (una transacción por bloque)
+    reader, writer = await _connect(), await _connect()
+    await writer.execute(TEMP_TABLES_SQL)
+
+    loop = asyncio.get_running_loop()
+    processed = updated = 0
+    started = time.perf_counter()
+    print(f"🔄 Backfill de sentimiento (palabras clave {keyword_set_hash[:12]}, {workers} procesos, "
+          f"bloques de {args.chunk_size})")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            async with reader.transaction():
+                cursor = await reader.cursor(query, *params, prefetch=args.chunk_size)
+                pending = deque()
+                exhausted = False
+                while not exhausted or pending:
+                    if not exhausted:
+                        rows = await cursor.fetch(args.chunk_size)
+                        if rows:
+                            messages = [row["message"] for row in rows]
+                            pending.append((rows, loop.run_in_executor(pool, classify_chunk, messages)))
+                        else:
+                            exhausted = True
+
+                    if pending and (exhausted or len(pending) >= max_in_flight):
+                        rows, future = pending.popleft()
+                        results = await future
+                        updated += await write_chunk(writer, rows, results, keyword_set_hash, not args.no_cache)
+                        processed += len(rows)
+                        elapsed = time.perf_counter() - started
+                        print(f"   {processed} mensajes | {updated} con sentimiento nuevo | "
+                              f"{processed / elapsed:.0f} msg/s")
+    finally:
+        await reader.close()
+        await writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {processed} mensajes recalculados en {elapsed:.1f}s; {updated} interacciones actualizadas")
+    if updated:
+        print("   Las estadísticas de clientes se actualizan en el próximo refresco "
+              "(scripts/refresh_customer_statistics.py)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recalcula el sentimiento de las interacciones históricas")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Mensajes por bloque (lectura, proceso y escritura)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de clasificación (por defecto, CPUs)")
+    parser.add_argument("--since", default=None, help="Solo interacciones desde esta fecha (ISO, p.ej. 2025-01-01)")
+    parser.add_argument("--only-missing", action="store_true", help="Solo interacciones sin sentimiento")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de mensajes a procesar")
+    parser.add_argument("--no-cache", action="store_true", help="No escribir los análisis en sentiment_cache")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill(parse_args()))
@@ -0,0 +1,150 @@
+# scripts/benchmark_embedding_backends.py
+"""
+Compara los backends de embeddings (torch, onnx, onnx-int8) en CPU.
+
+Cada backend se mide en un subproceso propio para que la memoria (RSS máxima) no
+se contamine con los demás. Se reporta:
+    - tiempo de carga del modelo
+    - latencia de consultas individuales (p50 / p95), como en search_knowledge
+    - rendimiento por lotes (textos/s)
+    - RSS máxima del proceso
+    - similitud coseno mínima / media frente a torch (compatibilidad de vectores)
+
+Ejemplos:
+    python scripts/benchmark_embedding_backends.py
+    python scripts/benchmark_embedding_backends.py --backends torch onnx-int8 --iterations 500
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from embedding_backends import BACKENDS, VALIDATION_SENTENCES, create_embedding_backend
+
+QUERIES = VALIDATION_SENTENCES + [
+    "no puedo iniciar sesión en la aplicación móvil",
+    "¿cómo cambio mi plan de facturación?",
+    "la velocidad de internet es muy lenta desde ayer",
+    "necesito hablar con un supervisor inmediatamente",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_worker(backend: str, model_name: str, iterations: int, batch_size: int, output: str):
+    """Mide un backend y guarda métricas + embeddings de referencia en `output`."""
+    started = time.perf_counter()
+    model = create_embedding_backend(backend, model_name)
+    load_seconds = time.perf_counter() - started
+    if model.name != backend:
+        raise SystemExit(f"El backend {backend} no está disponible (se cargó {model.name})")
+
+    model.encode(QUERIES[0])  # calentamiento
+
+    latencies = []
+    for i in range(iterations):
+        query = QUERIES[i % len(QUERIES)]
+        t0 = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    batch = (QUERIES * (batch_size // len(QUERIES) + 1))[:batch_size]
+    t0 = time.perf_counter()
+    model.encode(batch, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - t0
+
+    embeddings = np.asarray(model.encode(QUERIES), dtype=np.float32)
+    # ru_maxrss está en KB en Linux
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    np.save(output + ".npy", embeddings)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "backend": backend,
+            "load_seconds": round(load_seconds, 2),
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "batch_texts_per_second": round(batch_size / batch_seconds, 1),
+            "max_rss_mb": round(max_rss_mb, 1),
+        }, f)
+
+
+def compare(reference: np.ndarray, candidate: np.ndarray):
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return float(cosines.min()), float(cosines.mean())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--iterations", type=int, default=200, help="Consultas individuales por backend")
+    parser.add_argument("--batch-size", type=int, default=256, help="Textos en la prueba por lotes")
+    parser.add_argument("--tolerance", type=float,
+                        default=float(os.getenv("EMBEDDING_BACKEND_TOLERANCE", "0.01")),
+                        help="1 - similitud coseno mínima admitida frente a torch")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args.worker, args.model, args.iterations, args.batch_size, args.output)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            output = os.path.join(tmp, f"{backend}.json")
+            print(f"Midiendo backend {backend}...")
+            proc = subprocess.run([
+                sys.executable, __file__, "--worker", backend, "--model", args.model,
+                "--iterations", str(args.iterations), "--batch-size", str(args.batch_size),
+                "--output", output,
+            ])
+            if proc.returncode != 0:
+                print(f"   ❌ {backend} falló (código {proc.returncode})")
+                continue
+            with open(output, "r", encoding="utf-8") as f:
+                results[backend] = json.load(f)
+            results[backend]["embeddings"] = np.load(output + ".npy")
+
+    if not results:
+        sys.exit(1)
+
+    reference = results.get("torch", {}).get("embeddings")
+    print(f"\nModelo: {args.model} | {args.iterations} consultas | lote de {args.batch_size}")
+    print(f"{'backend':<10} {'carga(s)':>9} {'p50(ms)':>8} {'p95(ms)':>8} {'textos/s':>9} "
+          f"{'RSS(MB)':>8} {'cos min':>8} {'cos medio':>9}  estado")
+    failed = False
+    for backend, r in results.items():
+        if reference is not None and backend != "torch":
+            min_cos, mean_cos = compare(reference, r["embeddings"])
+            ok = min_cos >= 1 - args.tolerance
+            failed |= not ok
+            cos_cols = f"{min_cos:>8.4f} {mean_cos:>9.4f}  {'OK' if ok else 'FUERA DE TOLERANCIA'}"
+        else:
+            cos_cols = f"{'-':>8} {'-':>9}  {'referencia' if backend == 'torch' else 'sin referencia'}"
+        print(f"{backend:<10} {r['load_seconds']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['batch_texts_per_second']:>9} {r['max_rss_mb']:>8} {cos_cols}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# scripts/embedding_registry.py
+"""
+Registro de modelos de embeddings de la knowledge_base.
+
+Cada modelo registrado apunta a una columna vector(N) de knowledge_base con su
+misma dimensión. Para migrar de modelo sin cortar el servicio:
+
+    1. python scripts/embedding_registry.py add --model <nuevo> --dimension 768 --column embedding_v2
+    2. python scripts/ingest_embeddings.py --model <nuevo>
+    3. python scripts/manage_vector_index.py create --column embedding_v2
+    4. python scripts/embedding_registry.py activate --model <nuevo>
+    5. Reiniciar el servidor MCP (valida modelo y dimensión al arrancar)
+
+Comandos:
+    list        Modelos registrados, dimensión declarada vs. real y vectores por columna
+    add         Registra un modelo y crea su columna vector en paralelo
+    activate    Marca el modelo que debe usar el servidor MCP
+"""
+import argparse
+import asyncio
+import asyncpg
+import re
+import sys
+import os
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+
+
+def _validate_column(name: str) -> str:
+    # Los nombres de columna no se pueden parametrizar en DDL
+    if not re.fullmatch(r"[a-z_][a-z0-9_]{0,62}", name):
+        raise ValueError(f"Nombre de columna no válido: {name}")
+    return name
+
+
+async def get_connection():
+    return await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+
+
+async def column_dimension(conn, column: str):
+    """Dimensión declarada de una columna vector (atttypmod), o None si no existe."""
+    return await conn.fetchval("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'knowledge_base'::regclass AND attname = $1 AND NOT attisdropped
+    """, column)
+
+
+async def list_models(conn):
+    models = await conn.fetch("""
+        SELECT model_name, dimension, column_name, active, created_at
+        FROM embedding_models ORDER BY created_at
+    """)
+    if not models:
+        print("No hay modelos registrados (ejecute scripts/init_database.py)")
+        return
+
+    print("Modelos de embeddings registrados:")
+    for model in models:
+        column = _validate_column(model['column_name'])
+        declared = await column_dimension(conn, column)
+        vectors = await conn.fetchval(f"SELECT count(*) FROM knowledge_base WHERE {column} IS NOT NULL")
+        status = "OK" if declared == model['dimension'] else f"DESAJUSTE (columna vector({declared}))"
+        marker = "*" if model['active'] else " "
+        print(f" {marker} {model['model_name']} | dim={model['dimension']} | "
+              f"columna={column} | vectores={vectors} | {status}")
+
+
+async def add_model(conn, model_name: str, dimension: int, column: str, activate: bool):
+    column = _validate_column(column)
+    existing = await column_dimension(conn, column)
+    if existing is not None and existing != dimension:
+        raise ValueError(f"La columna {column} ya existe como vector({existing})")
+
+    async with conn.transaction():
+        await conn.execute(f"ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS {column} vector({int(dimension)})")
+        # Marca temporal por columna para la ingesta incremental (scripts/ingest_embeddings.py)
+        await conn.execute(f"ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS {column}_updated_at TIMESTAMP WITH TIME ZONE")
+        await conn.execute("""
+            INSERT INTO embedding_models (model_name, dimension, column_name)
+            VALUES ($1, $2, $3)
+        """, model_name, dimension, column)
+        if activate:
+            await _activate(conn, model_name)
+
+    print(f"Modelo {model_name} registrado en knowledge_base.{column} (vector({dimension}))")
+
+
+async def _activate(conn, model_name: str):
+    await conn.execute("UPDATE embedding_models SET active = FALSE WHERE active")
+    result = await conn.execute("UPDATE embedding_models SET active = TRUE WHERE model_name = $1", model_name)
+    if result != "UPDATE 1":
+        raise ValueError(f"Modelo no registrado: {model_name}")
+
+
+async def activate_model(conn, model_name: str):
+    async with conn.transaction():
+        await _activate(conn, model_name)
+    print(f"Modelo activo: {model_name} (reinicie el servidor MCP para aplicarlo)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Registro de modelos de embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list")
+
+    add = subparsers.add_parser("add")
+    add.add_argument("--model", required=True, help="Nombre del modelo SentenceTransformer")
+    add.add_argument("--dimension", type=int, required=True)
+    add.add_argument("--column", required=True, help="Columna vector de knowledge_base")
+    add.add_argument("--activate", action="store_true")
+
+    activate = subparsers.add_parser("activate")
+    activate.add_argument("--model", required=True)
+
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    conn = await get_connection()
+    try:
+        if args.command == "list":
+            await list_models(conn)
+        elif args.command == "add":
+            await add_model(conn, args.model, args.dimension, args.column, args.activate)
+        elif args.command == "activate":
+            await activate_model(conn, args.model)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,272 @@
+# scripts/ingest_embeddings.py
+"""
+Ingesta de embeddings para la knowledge_base.
+
+Genera los vectores con el mismo modelo SentenceTransformer que usa el servidor
+MCP (modelo activo de `embedding_models`) y los escribe por lotes con COPY.
+
+Es incremental y reanudable: solo se codifican las filas sin vector o cuyo
+`updated_at` es posterior al de su embedding (`<columna>_updated_at`). Cada lote
+se confirma por separado, así que si el proceso se interrumpe basta con volver
+a lanzarlo.
+
+Ejemplos:
+    python scripts/ingest_embeddings.py                      # filas nuevas o modificadas
+    python scripts/ingest_embeddings.py --full               # recodificar todo
+    python scripts/ingest_embeddings.py --input docs.jsonl   # cargar documentos nuevos
+    python scripts/ingest_embeddings.py --input docs.csv --batch-size 512
+"""
+import argparse
+import asyncio
+import asyncpg
+import csv
+import json
+import re
+import sys
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterator, List
+
+from pgvector.asyncpg import register_vector
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+
+DOCUMENT_FIELDS = [
+    "title", "content", "category", "subcategory", "solution_steps",
+    "estimated_time", "escalation_needed", "follow_up_required"
+]
+
+
+def _validate_column(name: str) -> str:
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+        raise ValueError(f"Nombre de columna no válido: {name}")
+    return name
+
+
+def document_text(title: str, content: str) -> str:
+    """Texto que se codifica para cada artículo (título + contenido)."""
+    return f"{title}\n{content}"
+
+
+async def get_connection():
+    conn = await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+    await register_vector(conn)
+    return conn
+
+
+async def resolve_model(conn, model_name: str = None) -> Dict[str, Any]:
+    """Modelo, dimensión y columna desde el registro (activo si no se indica)."""
+    if model_name:
+        row = await conn.fetchrow(
+            "SELECT model_name, dimension, column_name FROM embedding_models WHERE model_name = $1", model_name)
+    else:
+        row = await conn.fetchrow("SELECT model_name, dimension, column_name FROM embedding_models WHERE active")
+    if not row:
+        raise ValueError(f"Modelo no registrado: {model_name or '(sin modelo activo)'}")
+    return {"model_name": row["model_name"], "dimension": row["dimension"],
+            "column": _validate_column(row["column_name"])}
+
+
+def load_encoder(model_name: str, dimension: int):
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Cargando modelo {model_name}...")
+    encoder = SentenceTransformer(model_name)
+    actual = encoder.get_sentence_embedding_dimension()
+    if actual != dimension:
+        raise ValueError(f"{model_name} genera {actual} dimensiones, el registro declara {dimension}")
+    return encoder
+
+
+async def encode_batch(encoder, texts: List[str], batch_size: int):
+    # encode es CPU-bound: se ejecuta en un hilo para solapar con la escritura del lote anterior
+    return await asyncio.to_thread(
+        encoder.encode, texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+    )
+
+
+# ---------------------------------------------------------------------------
+# Recodificación incremental de filas existentes
+# ---------------------------------------------------------------------------
+
+async def write_embeddings(conn, column: str, model_name: str, records):
+    """COPY a una tabla temporal + un único UPDATE por lote."""
+    set_model = ", embedding_model = $1" if column == "embedding" else ""
+    async with conn.transaction():
+        await conn.copy_records_to_table("tmp_kb_embeddings", records=records,
+                                         columns=["id", "embedding", "source_updated_at"])
+        await conn.execute(f"""
+            UPDATE knowledge_base kb
+            SET {column} = t.embedding,
+                {column}_updated_at = t.source_updated_at{set_model}
+            FROM tmp_kb_embeddings t
+            WHERE kb.id = t.id
+        """, *([model_name] if set_model else []))
+
+
+async def reencode_existing(conn, write_conn, encoder, target: Dict[str, Any], batch_size: int,
+                            fetch_size: int, full: bool) -> int:
+    column = target["column"]
+    stale_filter = "TRUE" if full else f"({column} IS NULL OR {column}_updated_at IS NULL OR {column}_updated_at < updated_at)"
+
+    await write_conn.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS tmp_kb_embeddings (
+            id INTEGER PRIMARY KEY,
+            embedding vector({int(target['dimension'])}),
+            source_updated_at TIMESTAMP WITH TIME ZONE
+        ) ON COMMIT DELETE ROWS
+    """)
+
+    pending = await conn.fetchval(f"SELECT count(*) FROM knowledge_base WHERE {stale_filter}")
+    print(f"Filas a codificar: {pending}")
+
+    processed = 0
+    last_id = 0
+    write_task = None
+    started = time.time()
+    while True:
+        # Paginación por clave (id > último): no mantiene transacciones abiertas entre lotes
+        rows = await conn.fetch(f"""
+            SELECT id, title, content, updated_at FROM knowledge_base
+            WHERE id > $1 AND {stale_filter}
+            ORDER BY id LIMIT $2
+        """, last_id, fetch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        vectors = await encode_batch(encoder, [document_text(r["title"], r["content"]) for r in rows], batch_size)
+        records = [(r["id"], vector, r["updated_at"]) for r, vector in zip(rows, vectors)]
+
+        if write_task:
+            await write_task
+        write_task = asyncio.create_task(write_embeddings(write_conn, column, target["model_name"], records))
+
+        processed += len(rows)
+        rate = processed / max(time.time() - started, 1e-6)
+        print(f"   {processed}/{pending} filas ({rate:.0f} filas/s)")
+
+    if write_task:
+        await write_task
+    return processed
+
+
+# ---------------------------------------------------------------------------
+# Carga de documentos nuevos desde JSONL / CSV
+# ---------------------------------------------------------------------------
+
+def read_documents(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.suffix == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        raise ValueError(f"Formato no soportado: {path.suffix} (use .jsonl o .csv)")
+
+
+def _to_record(doc: Dict[str, Any]) -> tuple:
+    steps = doc.get("solution_steps")
+    if steps is not None and not isinstance(steps, str):
+        steps = json.dumps(steps, ensure_ascii=False)
+    estimated_time = doc.get("estimated_time")
+    return (
+        doc["title"],
+        doc["content"],
+        doc.get("category"),
+        doc.get("subcategory"),
+        steps,
+        int(estimated_time) if estimated_time not in (None, "") else None,
+        str(doc.get("escalation_needed", False)).lower() in ("true", "1"),
+        str(doc.get("follow_up_required", False)).lower() in ("true", "1"),
+    )
+
+
+async def ingest_documents(conn, encoder, target: Dict[str, Any], path: Path, batch_size: int,
+                           fetch_size: int) -> int:
+    column = target["column"]
+    columns = DOCUMENT_FIELDS + [column, f"{column}_updated_at", "updated_at"]
+    if column == "embedding":
+        columns.append("embedding_model")
+
+    # Reanudable: los títulos ya cargados en una ejecución anterior se omiten
+    existing_titles = {r["title"] for r in await conn.fetch("SELECT title FROM knowledge_base")}
+
+    inserted = 0
+    batch: List[tuple] = []
+
+    async def flush():
+        nonlocal inserted
+        vectors = await encode_batch(encoder, [document_text(r[0], r[1]) for r in batch], batch_size)
+        # updated_at y <columna>_updated_at iguales: la fila queda al día para la ingesta incremental
+        now = datetime.now(timezone.utc)
+        extra = (target["model_name"],) if column == "embedding" else ()
+        records = [record + (vector, now, now) + extra for record, vector in zip(batch, vectors)]
+        await conn.copy_records_to_table("knowledge_base", records=records, columns=columns)
+        inserted += len(records)
+        print(f"   {inserted} documentos insertados")
+        batch.clear()
+
+    for doc in read_documents(path):
+        if doc["title"] in existing_titles:
+            continue
+        existing_titles.add(doc["title"])
+        batch.append(_to_record(doc))
+        if len(batch) >= fetch_size:
+            await flush()
+    if batch:
+        await flush()
+    return inserted
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingesta de embeddings de la knowledge_base")
+    parser.add_argument("--model", default=None, help="Modelo registrado (por defecto el activo)")
+    parser.add_argument("--input", type=Path, default=None, help="Documentos nuevos (.jsonl o .csv)")
+    parser.add_argument("--full", action="store_true", help="Recodificar todas las filas")
+    parser.add_argument("--batch-size", type=int, default=64, help="Tamaño de lote del modelo")
+    parser.add_argument("--fetch-size", type=int, default=1000, help="Filas por lote de lectura/escritura")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    conn = await get_connection()
+    write_conn = await get_connection()
+    try:
+        target = await resolve_model(conn, args.model)
+        column = target["column"]
+        await conn.execute(
+            f"ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS {column}_updated_at TIMESTAMP WITH TIME ZONE")
+
+        encoder = load_encoder(target["model_name"], target["dimension"])
+        started = time.time()
+
+        if args.input:
+            inserted = await ingest_documents(conn, encoder, target, args.input, args.batch_size, args.fetch_size)
+            print(f"Documentos nuevos: {inserted}")
+
+        updated = await reencode_existing(conn, write_conn, encoder, target, args.batch_size,
+                                          args.fetch_size, args.full)
+        print(f"Embeddings actualizados: {updated}")
+        print(f"Ingesta completada en {time.time() - started:.1f}s")
+    finally:
+        await write_conn.close()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
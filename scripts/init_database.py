@@ -59,8 +59,12 @@ async def init_database():
             agent_id VARCHAR(50),
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
-        CREATE INDEX IF NOT EXISTS idx_interactions_customer_id ON customer_interactions(customer_id);
         CREATE INDEX IF NOT EXISTS idx_interactions_created_at ON customer_interactions(created_at);
+        -- Últimas interacciones de un cliente: recorrido de rango solo sobre el índice, sin ordenar
+        CREATE INDEX IF NOT EXISTS idx_interactions_customer_created
+            ON customer_interactions(customer_id, created_at DESC) INCLUDE (issue_type);
+        -- El índice compuesto ya cubre las búsquedas por customer_id
+        DROP INDEX IF EXISTS idx_interactions_customer_id;
     ''')
     
     # 3. Base de conocimientos con vectores
@@ -75,13 +79,168 @@ async def init_database():
             estimated_time INTEGER,
             escalation_needed BOOLEAN DEFAULT FALSE,
             follow_up_required BOOLEAN DEFAULT FALSE,
-            embedding vector(768),
+            embedding vector(384),
+            embedding_model VARCHAR(200),
+            embedding_updated_at TIMESTAMP WITH TIME ZONE,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
             updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
+        ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(200);
+        ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_updated_at TIMESTAMP WITH TIME ZONE;
         CREATE INDEX IF NOT EXISTS idx_knowledge_base_category ON knowledge_base(category);
     ''')
     
+    # Registro de modelos de embeddings: qué modelo/dimensión corresponde a cada columna vector
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS embedding_models (
+            id SERIAL PRIMARY KEY,
+            model_name VARCHAR(200) UNIQUE NOT NULL,
+            dimension INTEGER NOT NULL,
+            column_name VARCHAR(63) UNIQUE NOT NULL,
+            active BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_models_active ON embedding_models(active) WHERE active;
+    ''')
+    
+    # Bases creadas con vector(768) no coinciden con all-MiniLM-L6-v2 (384 dimensiones).
+    # Si la columna aún no tiene vectores se corrige directamente; si los tiene, hay que
+    # migrar en paralelo con scripts/embedding_registry.py
+    embedding_dim = await conn.fetchval('''
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'knowledge_base'::regclass AND attname = 'embedding' AND NOT attisdropped
+    ''')
+    if embedding_dim != 384:
+        has_vectors = await conn.fetchval("SELECT EXISTS (SELECT 1 FROM knowledge_base WHERE embedding IS NOT NULL)")
+        if not has_vectors:
+            await conn.execute("ALTER TABLE knowledge_base ALTER COLUMN embedding TYPE vector(384)")
+            print(f"Columna embedding corregida: vector({embedding_dim}) -> vector(384)")
+        else:
+            print(f"AVISO: knowledge_base.embedding es vector({embedding_dim}) y contiene datos; "
+                  "use scripts/embedding_registry.py para migrar a all-MiniLM-L6-v2")
+    
+    await conn.execute('''
+        INSERT INTO embedding_models (model_name, dimension, column_name, active)
+        SELECT 'all-MiniLM-L6-v2', 384, 'embedding', NOT EXISTS (SELECT 1 FROM embedding_models WHERE active)
+        ON CONFLICT DO NOTHING
+    ''')
+    
+    # Índice ANN por coseno para la búsqueda vectorial (ajustable con scripts/manage_vector_index.py)
+    await conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_knowledge_base_embedding_hnsw
+        ON knowledge_base USING hnsw (embedding vector_cosine_ops)
+        WITH (m = {settings.KB_HNSW_M}, ef_construction = {settings.KB_HNSW_EF_CONSTRUCTION});
+    ''')
+    
+    # updated_at refleja cambios de contenido: la ingesta incremental de embeddings se basa en él
+    await conn.execute('''
+        CREATE OR REPLACE FUNCTION touch_knowledge_base_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = NOW();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        
+        DROP TRIGGER IF EXISTS trg_knowledge_base_touch ON knowledge_base;
+        CREATE TRIGGER trg_knowledge_base_touch
+            BEFORE UPDATE OF title, content ON knowledge_base
+            FOR EACH ROW
+            WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.content IS DISTINCT FROM NEW.content)
+            EXECUTE FUNCTION touch_knowledge_base_updated_at();
+    ''')
+    
+    # Notificar cambios en la base de conocimientos (el servidor MCP cachea su estado
+    # y sus resultados por versión de la KB)
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_base_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        );
+        INSERT INTO knowledge_base_version (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+        
+        CREATE OR REPLACE FUNCTION notify_knowledge_base_change() RETURNS trigger AS $$
+        DECLARE
+            new_version BIGINT;
+        BEGIN
+            UPDATE knowledge_base_version
+            SET version = version + 1, updated_at = NOW()
+            RETURNING version INTO new_version;
+            PERFORM pg_notify('knowledge_base_changed', new_version::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        
+        DROP TRIGGER IF EXISTS trg_knowledge_base_notify ON knowledge_base;
+        CREATE TRIGGER trg_knowledge_base_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON knowledge_base
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_knowledge_base_change();
+    ''')
+    
+    # Estadísticas de clientes precalculadas: una fila que se lee por índice en O(1).
+    # Se refresca con REFRESH ... CONCURRENTLY (scripts/refresh_customer_statistics.py
+    # o pg_cron), sin bloquear a los lectores
+    await conn.execute(f'''
+        CREATE MATERIALIZED VIEW IF NOT EXISTS customer_statistics_mv AS
+        SELECT
+            TRUE AS id,
+            (SELECT COUNT(*) FROM customer_profiles) AS total_customers,
+            (SELECT AVG(satisfaction_score) FROM customer_profiles) AS average_satisfaction,
+            (SELECT COUNT(*) FROM customer_profiles WHERE satisfaction_score < 3.5) AS high_risk_customers,
+            (
+                SELECT COALESCE(jsonb_object_agg(tier, jsonb_build_object(
+                    'count', customers,
+                    'average_satisfaction', average_satisfaction,
+                    'high_risk', high_risk
+                )), '{{}}'::jsonb)
+                FROM (
+                    SELECT COALESCE(tier, 'Unknown') AS tier, COUNT(*) AS customers,
+                           ROUND(AVG(satisfaction_score)::numeric, 2) AS average_satisfaction,
+                           COUNT(*) FILTER (WHERE satisfaction_score < 3.5) AS high_risk
+                    FROM customer_profiles
+                    GROUP BY 1
+                ) tiers
+            ) AS tiers,
+            (
+                SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                    'day', day,
+                    'interactions', interactions,
+                    'customers', customers,
+                    'negative', negative
+                ) ORDER BY day), '[]'::jsonb)
+                FROM (
+                    SELECT date_trunc('day', created_at)::date AS day,
+                           COUNT(*) AS interactions,
+                           COUNT(DISTINCT customer_id) AS customers,
+                           COUNT(*) FILTER (WHERE sentiment = 'negative') AS negative
+                    FROM customer_interactions
+                    WHERE created_at >= NOW() - INTERVAL '{settings.CUSTOMER_STATS_TREND_DAYS} days'
+                    GROUP BY 1
+                ) days
+            ) AS daily_trends,
+            NOW() AS refreshed_at;
+        -- REFRESH CONCURRENTLY necesita un índice único
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_customer_statistics_mv_id ON customer_statistics_mv(id);
+    ''')
+    
+    # Con pg_cron disponible el refresco se programa en la propia base de datos
+    has_pg_cron = await conn.fetchval("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron')")
+    if has_pg_cron:
+        # El campo de minutos de cron solo admite 0-59: a partir de una hora se programa por horas
+        refresh_minutes = max(1, settings.CUSTOMER_STATS_REFRESH_SECONDS // 60)
+        if refresh_minutes < 60:
+            cron_expression, every = f"*/{refresh_minutes} * * * *", f"{refresh_minutes} min"
+        else:
+            refresh_hours = min(23, refresh_minutes // 60)
+            cron_expression, every = f"0 */{refresh_hours} * * *", f"{refresh_hours} h"
+        await conn.execute(f'''
+            SELECT cron.schedule('refresh_customer_statistics', '{cron_expression}',
+                                 'REFRESH MATERIALIZED VIEW CONCURRENTLY customer_statistics_mv')
+        ''')
+        print(f"Refresco de customer_statistics_mv programado con pg_cron (cada {every})")
+    else:
+        print("pg_cron no disponible: refrescar con scripts/refresh_customer_statistics.py --interval")
+    
     # 4. Cache de análisis de sentimiento
     await conn.execute('''
         CREATE TABLE IF NOT EXISTS sentiment_cache (
@@ -94,11 +253,26 @@ async def init_database():
             confidence_score FLOAT,
             detected_keywords JSONB,
             recommended_tone VARCHAR(50),
+            keyword_set_hash VARCHAR(64),
+            expires_at TIMESTAMP WITH TIME ZONE,
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
         CREATE INDEX IF NOT EXISTS idx_sentiment_cache_hash ON sentiment_cache(message_hash);
+        -- Versión de las palabras clave con que se calculó y caducidad (ver prune_sentiment_cache.py)
+        ALTER TABLE sentiment_cache ADD COLUMN IF NOT EXISTS keyword_set_hash VARCHAR(64);
+        ALTER TABLE sentiment_cache ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE;
+        CREATE INDEX IF NOT EXISTS idx_sentiment_cache_expires_at ON sentiment_cache(expires_at);
     ''')
     
+    if has_pg_cron:
+        await conn.execute('''
+            SELECT cron.schedule('prune_sentiment_cache', '17 * * * *',
+                                 'DELETE FROM sentiment_cache WHERE expires_at IS NULL OR expires_at < NOW()')
+        ''')
+        print("Limpieza de sentiment_cache programada con pg_cron (cada hora)")
+    else:
+        print("pg_cron no disponible: limpiar con scripts/prune_sentiment_cache.py --interval")
+    
     # 5. Reglas de priorización
     await conn.execute('''
         CREATE TABLE IF NOT EXISTS priority_rules (
@@ -136,7 +310,10 @@ async def init_database():
                 preferred_channel = EXCLUDED.preferred_channel,
                 updated_at = NOW()
         ''', customer_id, name, tier, satisfaction, interactions, channel)
-    
+
+    # La vista se creó antes de los clientes de ejemplo: sin pg_cron devolvería ceros hasta el primer refresco
+    await conn.execute("REFRESH MATERIALIZED VIEW customer_statistics_mv")
+
     # Base de conocimientos (migrar de tools existentes)
     kb_data = [
         (
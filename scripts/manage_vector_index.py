@@ -0,0 +1,177 @@
+# scripts/manage_vector_index.py
+"""
+Gestión de índices ANN (pgvector) sobre knowledge_base.embedding.
+
+Sin índice, `ORDER BY embedding <=> $1` recorre toda la tabla. Este script
+crea, reconstruye, elimina o inspecciona índices HNSW / IVFFlat de coseno.
+
+Ejemplos:
+    python scripts/manage_vector_index.py status
+    python scripts/manage_vector_index.py create --method hnsw --m 16 --ef-construction 64
+    python scripts/manage_vector_index.py create --method ivfflat --lists 300
+    python scripts/manage_vector_index.py rebuild --method hnsw --m 24 --ef-construction 128
+    python scripts/manage_vector_index.py drop --method ivfflat
+"""
+import argparse
+import asyncio
+import asyncpg
+import math
+import re
+import sys
+import os
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+
+TABLE = "knowledge_base"
+METHODS = ("hnsw", "ivfflat")
+
+
+def index_name(method: str, column: str = "embedding") -> str:
+    return f"idx_{TABLE}_{column}_{method}"
+
+
+def _validate_identifier(name: str) -> str:
+    # Los nombres de columna/índice no se pueden parametrizar en DDL
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+        raise ValueError(f"Identificador no válido: {name}")
+    return name
+
+
+def build_create_index_sql(method: str, column: str, name: str, m: int, ef_construction: int,
+                           lists: int, concurrently: bool) -> str:
+    """Construye el CREATE INDEX para el método indicado (distancia coseno)."""
+    _validate_identifier(column)
+    _validate_identifier(name)
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Método no soportado: {method}")
+
+    return f"""
+        CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name}
+        ON {TABLE} USING {method} ({column} vector_cosine_ops)
+        WITH ({options})
+    """
+
+
+async def suggested_lists(conn, column: str) -> int:
+    """Heurística de pgvector: filas/1000 hasta 1M filas, sqrt(filas) a partir de ahí."""
+    rows = await conn.fetchval(f"SELECT count(*) FROM {TABLE} WHERE {column} IS NOT NULL")
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return max(1, int(math.sqrt(rows)))
+
+
+async def get_connection():
+    return await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+
+
+async def show_status(conn):
+    rows = await conn.fetch("""
+        SELECT i.indexname, i.indexdef,
+               pg_size_pretty(pg_relation_size(c.oid)) AS size
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        WHERE i.tablename = $1
+          AND (i.indexdef ILIKE '%USING hnsw%' OR i.indexdef ILIKE '%USING ivfflat%')
+        ORDER BY i.indexname
+    """, TABLE)
+    total = await conn.fetchval(f"SELECT count(*) FROM {TABLE}")
+    with_embedding = await conn.fetchval(f"SELECT count(*) FROM {TABLE} WHERE embedding IS NOT NULL")
+
+    print(f"Artículos KB: {total} ({with_embedding} con embedding)")
+    if not rows:
+        print("No hay índices ANN: las búsquedas vectoriales hacen un recorrido secuencial")
+    for row in rows:
+        print(f"   {row['indexname']} ({row['size']})")
+        print(f"      {row['indexdef']}")
+    print(f"Parámetros de búsqueda por defecto: hnsw.ef_search={settings.KB_HNSW_EF_SEARCH}, "
+          f"ivfflat.probes={settings.KB_IVFFLAT_PROBES}")
+
+
+async def create_index(conn, args, name: str = None):
+    name = name or index_name(args.method, args.column)
+    lists = args.lists
+    if args.method == "ivfflat" and lists is None:
+        lists = await suggested_lists(conn, args.column)
+        print(f"lists calculado automáticamente: {lists}")
+
+    if args.maintenance_work_mem:
+        if not re.fullmatch(r"\d+\s*(kB|MB|GB)", args.maintenance_work_mem):
+            raise ValueError(f"maintenance_work_mem no válido: {args.maintenance_work_mem}")
+        await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+    sql = build_create_index_sql(args.method, args.column, name, args.m, args.ef_construction,
+                                 lists or settings.KB_IVFFLAT_LISTS, args.concurrently)
+    print(f"Creando índice {name}...")
+    await conn.execute(sql)
+    print(f"Índice {name} creado")
+
+
+async def rebuild_index(conn, args):
+    """
+    Reconstruye el índice con los parámetros indicados sin dejar la tabla sin índice:
+    crea uno nuevo en paralelo, elimina el anterior y renombra.
+    """
+    name = index_name(args.method, args.column)
+    tmp_name = f"{name}_new"
+    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}")
+    args.concurrently = True
+    await create_index(conn, args, name=tmp_name)
+    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    await conn.execute(f"ALTER INDEX {tmp_name} RENAME TO {name}")
+    print(f"Índice {name} reconstruido")
+
+
+async def drop_index(conn, args):
+    name = index_name(args.method, args.column)
+    await conn.execute(f"DROP INDEX {'CONCURRENTLY ' if args.concurrently else ''}IF EXISTS {name}")
+    print(f"Índice {name} eliminado")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gestión de índices ANN de la knowledge_base")
+    parser.add_argument("command", choices=["status", "create", "rebuild", "drop"])
+    parser.add_argument("--method", choices=METHODS, default=settings.KB_INDEX_METHOD)
+    parser.add_argument("--column", default="embedding", help="Columna vector a indexar")
+    parser.add_argument("--m", type=int, default=settings.KB_HNSW_M,
+                        help="HNSW: conexiones por nodo")
+    parser.add_argument("--ef-construction", type=int, default=settings.KB_HNSW_EF_CONSTRUCTION,
+                        help="HNSW: candidatos durante la construcción")
+    parser.add_argument("--lists", type=int, default=None,
+                        help="IVFFlat: número de listas (por defecto filas/1000)")
+    parser.add_argument("--concurrently", action="store_true",
+                        help="Crear/eliminar sin bloquear escrituras")
+    parser.add_argument("--maintenance-work-mem", default=None,
+                        help="p.ej. '1GB' para acelerar la construcción")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    conn = await get_connection()
+    try:
+        if args.command == "status":
+            await show_status(conn)
+        elif args.command == "create":
+            await create_index(conn, args)
+        elif args.command == "rebuild":
+            await rebuild_index(conn, args)
+        elif args.command == "drop":
+            await drop_index(conn, args)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
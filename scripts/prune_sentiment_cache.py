@@ -0,0 +1,84 @@
+# scripts/prune_sentiment_cache.py
+"""
+Borra de sentiment_cache las filas caducadas (expires_at, SENTIMENT_DB_TTL_DAYS)
+y las anteriores a la persistencia con caducidad. Borra en lotes para no
+mantener bloqueos largos. Si la base de datos tiene pg_cron, init_database.py
+ya programa la limpieza y este script no hace falta.
+
+Ejemplos:
+    python scripts/prune_sentiment_cache.py               # una limpieza
+    python scripts/prune_sentiment_cache.py --interval    # cada SENTIMENT_PRUNE_INTERVAL_SECONDS
+    python scripts/prune_sentiment_cache.py --batch-size 50000
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+import asyncpg
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+
+
+async def prune(conn: asyncpg.Connection, batch_size: int) -> int:
+    start = time.perf_counter()
+    deleted = 0
+    while True:
+        result = await conn.execute("""
+            DELETE FROM sentiment_cache
+            WHERE id IN (
+                SELECT id FROM sentiment_cache
+                WHERE expires_at IS NULL OR expires_at < NOW()
+                LIMIT $1
+            )
+        """, batch_size)
+        count = int(result.split()[-1])
+        deleted += count
+        if count < batch_size:
+            break
+    remaining = await conn.fetchval("SELECT COUNT(*) FROM sentiment_cache")
+    print(f"🧹 sentiment_cache: {deleted} filas caducadas borradas en {time.perf_counter() - start:.2f}s "
+          f"({remaining} vigentes)")
+    return deleted
+
+
+async def main(interval: float, batch_size: int):
+    conn = await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+    try:
+        while True:
+            try:
+                await prune(conn, batch_size)
+            except Exception as e:
+                if not interval:
+                    raise
+                print(f"❌ Error limpiando sentiment_cache: {e}")
+            if not interval:
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Limpia las entradas caducadas de sentiment_cache")
+    parser.add_argument("--interval", type=float, nargs="?", const=settings.SENTIMENT_PRUNE_INTERVAL_SECONDS,
+                        default=0, help="Limpiar periódicamente cada N segundos")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Filas borradas por sentencia")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(main(args.interval, args.batch_size))
+    except KeyboardInterrupt:
+        pass
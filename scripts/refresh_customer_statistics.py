@@ -0,0 +1,75 @@
+# scripts/refresh_customer_statistics.py
+"""
+Refresca la vista materializada customer_statistics_mv (estadísticas de clientes).
+
+REFRESH ... CONCURRENTLY recalcula la vista sin bloquear a los lectores: los
+dashboards siguen leyendo la versión anterior hasta que termina. Si la base de
+datos tiene pg_cron, init_database.py ya programa el refresco y este script no
+hace falta.
+
+Ejemplos:
+    python scripts/refresh_customer_statistics.py               # un refresco
+    python scripts/refresh_customer_statistics.py --interval    # cada CUSTOMER_STATS_REFRESH_SECONDS
+    python scripts/refresh_customer_statistics.py --interval 60
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+import asyncpg
+
+# Añade la ruta raíz del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.settings import settings
+
+
+async def refresh(conn: asyncpg.Connection):
+    start = time.perf_counter()
+    await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY customer_statistics_mv")
+    elapsed = time.perf_counter() - start
+    row = await conn.fetchrow("SELECT total_customers, high_risk_customers FROM customer_statistics_mv")
+    print(f"✅ customer_statistics_mv refrescada en {elapsed:.2f}s "
+          f"({row['total_customers']} clientes, {row['high_risk_customers']} en riesgo)")
+
+
+async def main(interval: float):
+    conn = await asyncpg.connect(
+        host="127.0.0.1",
+        port=settings.PROXY_PORT,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD
+    )
+    try:
+        while True:
+            try:
+                await refresh(conn)
+            except asyncpg.UndefinedTableError:
+                print("❌ customer_statistics_mv no existe; ejecute scripts/init_database.py")
+                return
+            except Exception as e:
+                if not interval:
+                    raise
+                print(f"❌ Error refrescando estadísticas: {e}")
+            if not interval:
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Refresca las estadísticas de clientes precalculadas")
+    parser.add_argument("--interval", type=float, nargs="?", const=settings.CUSTOMER_STATS_REFRESH_SECONDS,
+                        default=0, help="Refrescar periódicamente cada N segundos")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(main(args.interval))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,126 @@
+# scripts/trace_report.py
+"""
+Desglose del camino crítico de las trazas del agente (TRACING_EXPORTER=file).
+
+Para cada traza (un mensaje de usuario) muestra el árbol de spans y el camino
+crítico: la cadena de spans que determinó la duración total de root_agent, con
+el tiempo propio de cada uno (descontando los hijos que están en el camino).
+Al final agrega el tiempo en el camino crítico por nombre de span.
+
+Ejemplos:
+    python scripts/trace_report.py
+    python scripts/trace_report.py --file traces.jsonl --last 10
+    python scripts/trace_report.py --trace 4bf92f3577b34da6a3ce929d0e0e4736 --tree
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def load_traces(path: str) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def _children_index(spans: List[dict]) -> Dict[str, List[dict]]:
+    children: Dict[str, List[dict]] = defaultdict(list)
+    for span in spans:
+        if span["parent_span_id"]:
+            children[span["parent_span_id"]].append(span)
+    return children
+
+
+def critical_path(span: dict, children: Dict[str, List[dict]]) -> List[Tuple[dict, float]]:
+    """
+    Recorre los hijos desde el final: el que termina más tarde está en el camino;
+    a partir de su inicio se busca el siguiente, y así hasta el inicio del padre.
+    Devuelve (span, tiempo propio en ms) en orden cronológico.
+    """
+    start, end = span["start_time_unix_nano"], span["end_time_unix_nano"]
+    cursor = end
+    picked = []
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["end_time_unix_nano"], reverse=True):
+        if child["start_time_unix_nano"] < cursor:
+            covered = min(child["end_time_unix_nano"], cursor) - max(child["start_time_unix_nano"], start)
+            picked.append((child, max(covered, 0)))
+            cursor = child["start_time_unix_nano"]
+        if cursor <= start:
+            break
+
+    self_ms = (end - start - sum(covered for _, covered in picked)) / 1e6
+    path = [(span, max(self_ms, 0.0))]
+    for child, _ in reversed(picked):
+        path.extend(critical_path(child, children))
+    return path
+
+
+def find_root(spans: List[dict]) -> dict:
+    roots = [s for s in spans if not s["parent_span_id"]]
+    return max(roots or spans, key=lambda s: s["duration_ms"])
+
+
+def print_tree(span: dict, children: Dict[str, List[dict]], origin: int, depth: int = 0):
+    offset = (span["start_time_unix_nano"] - origin) / 1e6
+    status = "" if span["status"] == "ok" else f"  [{span['status']}]"
+    print(f"   {'  ' * depth}{span['name']:<{48 - 2 * depth}} +{offset:>9.1f}ms {span['duration_ms']:>10.1f}ms{status}")
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start_time_unix_nano"]):
+        print_tree(child, children, origin, depth + 1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Camino crítico de las trazas del agente")
+    parser.add_argument("--file", default="traces.jsonl", help="Spans exportados (TRACING_FILE)")
+    parser.add_argument("--last", type=int, default=5, help="Trazas más recientes a detallar")
+    parser.add_argument("--trace", default=None, help="Detallar solo esta traza")
+    parser.add_argument("--tree", action="store_true", help="Mostrar también el árbol completo de spans")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    traces = load_traces(args.file)
+    if not traces:
+        print(f"No hay spans en {args.file} (¿TRACING_EXPORTER=file?)")
+        return
+
+    complete = {trace_id: spans for trace_id, spans in traces.items()
+                if any(not s["parent_span_id"] for s in spans)}
+    ordered = sorted(complete, key=lambda t: find_root(complete[t])["start_time_unix_nano"])
+    selected = [args.trace] if args.trace else ordered[-args.last:]
+
+    for trace_id in selected:
+        spans = traces[trace_id]
+        root, children = find_root(spans), _children_index(spans)
+        print(f"\nTraza {trace_id} | {root['name']} | {root['duration_ms']:.1f}ms | {len(spans)} spans")
+        if args.tree:
+            print_tree(root, children, root["start_time_unix_nano"])
+            print()
+        print("   Camino crítico (tiempo propio):")
+        for span, self_ms in critical_path(root, children):
+            if self_ms >= 0.05:
+                share = self_ms / root["duration_ms"] * 100 if root["duration_ms"] else 0
+                print(f"      {span['name']:<45} {self_ms:>10.1f}ms {share:>6.1f}%")
+
+    # Agregado de todas las trazas completas
+    totals: Dict[str, float] = defaultdict(float)
+    total_ms = 0.0
+    for trace_id in ordered:
+        spans = complete[trace_id]
+        root = find_root(spans)
+        total_ms += root["duration_ms"]
+        for span, self_ms in critical_path(root, _children_index(spans)):
+            totals[span["name"]] += self_ms
+
+    print(f"\nCamino crítico agregado ({len(ordered)} trazas, media {total_ms / max(len(ordered), 1):.1f}ms):")
+    for name, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        print(f"   {name:<45} {ms / len(ordered):>10.1f}ms/traza {ms / total_ms * 100 if total_ms else 0:>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# sentiment_classifier.py
+"""
+Clasificación de sentimiento por palabras clave, sin E/S ni dependencias del
+paquete de agentes (que al importarse construye todo el grafo ADK).
+
+La usan SentimentAnalysisTool (con caché en memoria y PostgreSQL) y
+scripts/backfill_sentiment.py (pool de procesos).
+"""
+import hashlib
+import json
+from typing import Any, Dict, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+
+def hash_message(text: str) -> str:
+    """Clave de sentiment_cache para un mensaje."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def analysis_to_record(message_hash: str, keyword_set_hash: str, analysis: Dict[str, Any]) -> Tuple:
+    """Columnas de sentiment_cache (sin la caducidad) para un análisis."""
+    return (
+        message_hash,
+        analysis["primary_sentiment"],
+        analysis["urgency_level"],
+        analysis["escalation_risk"],
+        analysis["emotional_intensity"],
+        analysis["confidence_score"],
+        json.dumps(analysis["detected_keywords"]),
+        analysis["recommended_tone"],
+        keyword_set_hash,
+    )
+
+
+class SentimentClassifier:
+    """Listas de palabras clave, su versión (keyword_set_hash) y la clasificación."""
+
+    # Incrementar si cambia la lógica de clasificación (invalida el caché igual que las palabras clave)
+    ANALYZER_VERSION = 2  # 2: coincidencias por palabra completa (KeywordMatcher)
+
+    def __init__(self):
+        # Diccionarios de palabras clave para análisis de sentimiento.
+        # KeywordMatcher compara palabras completas: se incluyen las formas en
+        # plural y femenino para no perder coincidencias ("problemas", "molesta")
+        self.positive_keywords = [
+            "gracias", "excelente", "excelentes", "perfecto", "perfecta",
+            "genial", "geniales", "satisfecho", "satisfecha", "satisfechos", "satisfechas",
+            "contento", "contenta", "contentos", "contentas", "bien",
+            "bueno", "buena", "buenos", "buenas", "correcto", "correcta",
+            "rápido", "rápida", "eficiente", "eficientes", "amable", "amables",
+            "servicio excelente", "muy bien", "fantástico", "fantástica"
+        ]
+        
+        self.negative_keywords = [
+            "molesto", "molesta", "molestos", "molestas",
+            "enojado", "enojada", "enojados", "enojadas",
+            "frustrado", "frustrada", "frustrados", "frustradas",
+            "terrible", "terribles", "horrible", "horribles",
+            "malo", "mala", "malos", "malas", "lento", "lenta", "lentos", "lentas",
+            "problema", "problemas", "error", "errores", "falla", "fallas",
+            "deficiente", "deficientes", "pésimo", "pésima", "pésimos", "pésimas",
+            "inaceptable", "inaceptables", "indignado", "indignada", "indignados", "indignadas",
+            "furioso", "furiosa", "furiosos", "furiosas",
+            "decepcionado", "decepcionada", "decepcionados", "decepcionadas"
+        ]
+        
+        self.urgency_keywords = [
+            "urgente", "urgentes", "inmediato", "inmediata", "rápido", "rápida",
+            "ya", "ahora", "crisis", "crítico", "crítica", "emergencia", "emergencias",
+            "prioritario", "prioritaria", "cuanto antes",
+            "no puede esperar", "necesito ya"
+        ]
+        
+        self.escalation_keywords = [
+            "supervisor", "supervisora", "supervisores", "gerente", "gerentes",
+            "queja", "quejas", "demanda", "demandas", "legal",
+            "cancelar", "cerrar cuenta", "competencia", "abogado", "abogada", "abogados",
+            "formal complaint", "escalate", "manager", "managers"
+        ]
+        
+        # Un único autómata para las cuatro listas: una pasada por mensaje
+        self.keyword_matcher = KeywordMatcher({
+            "positive": self.positive_keywords,
+            "negative": self.negative_keywords,
+            "urgency": self.urgency_keywords,
+            "escalation": self.escalation_keywords,
+        })
+        
+        # El caché guarda la versión de las palabras clave: al cambiarlas se recalcula
+        self.keyword_set_hash = self._hash_keyword_set()
+    
+    def _hash_keyword_set(self) -> str:
+        keyword_set = {
+            "analyzer_version": self.ANALYZER_VERSION,
+            "positive": sorted(self.positive_keywords),
+            "negative": sorted(self.negative_keywords),
+            "urgency": sorted(self.urgency_keywords),
+            "escalation": sorted(self.escalation_keywords),
+        }
+        return hashlib.sha256(json.dumps(keyword_set, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Clasificación por palabras clave (sin caché ni E/S)."""
+        counts = self.keyword_matcher.counts(text)
+        positive_count = counts["positive"]
+        negative_count = counts["negative"]
+        urgency_count = counts["urgency"]
+        escalation_count = counts["escalation"]
+        
+        # Determinar sentimiento principal
+        if negative_count > positive_count:
+            primary_sentiment = "negative"
+        elif positive_count > negative_count:
+            primary_sentiment = "positive"
+        else:
+            primary_sentiment = "neutral"
+
+        # Determinar indicadores adicionales
+        urgency_level = "high" if urgency_count > 0 else "normal"
+        escalation_risk = "high" if escalation_count > 0 else "low"
+        
+        # Intensidad emocional
+        emotional_intensity = min((positive_count + negative_count) / 5, 1.0)
+        
+        # Calcular score de confianza
+        total_emotional_words = positive_count + negative_count + urgency_count + escalation_count
+        confidence = min(total_emotional_words / 8, 1.0)  # Normalizar a 0-1
+        
+        analysis = {
+            "primary_sentiment": primary_sentiment,
+            "urgency_level": urgency_level,
+            "escalation_risk": escalation_risk,
+            "emotional_intensity": emotional_intensity,
+            "confidence_score": confidence,
+            "detected_keywords": {
+                "positive": positive_count,
+                "negative": negative_count,
+                "urgency": urgency_count,
+                "escalation": escalation_count
+            },
+            "recommended_tone": self._get_recommended_tone(primary_sentiment, urgency_level, escalation_risk)
+        
+        }
+        return analysis
+
+    def _get_recommended_tone(self, sentiment: str, urgency: str, escalation_risk: str) -> str:
+        """Recommend appropriate response tone"""
+        if escalation_risk == "high":
+            return "empathetic_professional"
+        elif sentiment == "negative" and urgency == "high":
+            return "urgent_supportive"
+        elif sentiment == "negative":
+            return "apologetic_helpful"
+        elif urgency == "high":
+            return "efficient_direct"
+        else:
+            return "friendly_professional"
\ No newline at end of file
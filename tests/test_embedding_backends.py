@@ -0,0 +1,55 @@
+# tests/test_embedding_backends.py
+import logging
+
+import pytest
+
+import embedding_backends
+from embedding_backends import EmbeddingBackend, OnnxInt8Backend, TorchBackend, create_embedding_backend
+
+
+class FakeTorchBackend(EmbeddingBackend):
+    name = TorchBackend.name
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        return []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 384
+
+
+@pytest.fixture
+def no_torch(monkeypatch):
+    """PyTorch sustituido: los tests no cargan modelos reales."""
+    monkeypatch.setattr(embedding_backends, "TorchBackend", FakeTorchBackend)
+    monkeypatch.setitem(embedding_backends.BACKENDS, TorchBackend.name, FakeTorchBackend)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        EmbeddingBackend("all-MiniLM-L6-v2")
+
+    class Incomplete(EmbeddingBackend):
+        def encode(self, sentences, batch_size: int = 32, **kwargs):
+            return []
+
+    with pytest.raises(TypeError):
+        Incomplete("all-MiniLM-L6-v2")
+
+
+def test_unknown_backend_is_rejected(no_torch):
+    with pytest.raises(ValueError):
+        create_embedding_backend("tensorrt", "all-MiniLM-L6-v2")
+
+
+def test_fallback_to_torch_is_logged_as_warning(no_torch, monkeypatch, caplog):
+    def broken(model_name, tolerance):
+        raise ImportError("No module named 'onnxruntime'")
+
+    monkeypatch.setitem(embedding_backends.BACKENDS, OnnxInt8Backend.name, broken)
+    with caplog.at_level(logging.WARNING, logger="embedding_backends"):
+        backend = create_embedding_backend("onnx-int8", "all-MiniLM-L6-v2")
+
+    assert backend.name == TorchBackend.name
+    warning, = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert "EMBEDDING_BACKEND=onnx-int8" in warning.getMessage()
+    assert "onnxruntime" in warning.getMessage()
@@ -0,0 +1,86 @@
+# tests/test_encode_batcher.py
+import asyncio
+
+import pytest
+
+from knowledge_mcp_server_standalone import EncodeBatcher
+
+
+class _Vectors(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    """Modelo de prueba: el vector de un texto es [len(texto)] y se registra cada lote."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+
+    def encode(self, texts, batch_size=None):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encode falló")
+        return _Vectors([float(len(text))] for text in texts)
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(window_ms: float, max_batch_size: int) -> EncodeBatcher:
+        batchers.append(EncodeBatcher(window_ms=window_ms, max_batch_size=max_batch_size))
+        return batchers[-1]
+
+    yield make
+    for batcher in batchers:
+        batcher.shutdown()
+
+
+def encode_all(batcher, model, texts, **gather_kwargs):
+    async def scenario():
+        return await asyncio.gather(*(batcher.encode(model, text) for text in texts), **gather_kwargs)
+    return asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+
+def test_concurrent_queries_share_one_batch(make_batcher):
+    batcher, model = make_batcher(window_ms=50, max_batch_size=32), FakeModel()
+    assert encode_all(batcher, model, ["a", "bb", "a", "ccc"]) == [[1.0], [2.0], [1.0], [3.0]]
+    # Un solo lote y las consultas repetidas se codifican una vez
+    assert model.batches == [["a", "bb", "ccc"]]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["queries"] == 4
+
+
+def test_full_batch_flushes_without_waiting_for_window(make_batcher):
+    # Con una ventana de 60 s, solo el tamaño de lote puede resolverlo antes del timeout
+    batcher, model = make_batcher(window_ms=60_000, max_batch_size=3), FakeModel()
+    encode_all(batcher, model, ["a", "b", "c"])
+    assert model.batches == [["a", "b", "c"]]
+
+
+def test_single_query_flushes_after_window(make_batcher):
+    batcher, model = make_batcher(window_ms=20, max_batch_size=32), FakeModel()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        vector = await batcher.encode(model, "hola")
+        return vector, loop.time() - started
+
+    vector, elapsed = asyncio.run(scenario())
+    assert vector == [4.0]
+    assert elapsed >= 0.019  # margen por la resolución del reloj del loop
+
+
+def test_queries_during_encode_go_to_next_batch(make_batcher):
+    # El primer lote sale por tamaño; "c" llega mientras se codifica y sale al terminar
+    batcher, model = make_batcher(window_ms=60_000, max_batch_size=2), FakeModel()
+    assert encode_all(batcher, model, ["a", "b", "c"]) == [[1.0], [1.0], [1.0]]
+    assert model.batches == [["a", "b"], ["c"]]
+
+
+def test_encode_error_reaches_every_query(make_batcher):
+    batcher, model = make_batcher(window_ms=10, max_batch_size=32), FakeModel(fail=True)
+    results = encode_all(batcher, model, ["a", "b"], return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,43 @@
+# tests/test_keyword_matcher.py
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from sentiment_classifier import SentimentClassifier
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher({
+        "urgency": ["urgente", "ya", "necesito ya", "¡urgente!", "rápido"],
+        "positive": ["bien", "muy bien", "rápido"],
+        "escalation": ["cerrar cuenta", "supervisor"],
+    })
+
+
+def test_word_boundaries(matcher):
+    # "ya" dentro de "playa" y "bien" dentro de "también" no cuentan
+    assert matcher.counts("Me voy a la playa, también mañana") == {"urgency": 0, "positive": 0, "escalation": 0}
+    assert matcher.match("ya")["urgency"] == ["ya"]
+
+
+def test_overlapping_and_shared_keywords(matcher):
+    result = matcher.match("¡URGENTE! Necesito ya cerrar cuenta, va muy bien y rápido")
+    assert result["urgency"] == ["urgente", "¡urgente!", "necesito ya", "ya", "rápido"]
+    assert result["positive"] == ["muy bien", "bien", "rápido"]
+    assert result["escalation"] == ["cerrar cuenta"]
+
+
+def test_repeated_keywords_count_once(matcher):
+    assert matcher.counts("supervisor, supervisor, SUPERVISOR")["escalation"] == 1
+
+
+@pytest.mark.parametrize("message, category, expected", [
+    ("Tengo problemas y errores, la app está lenta", "negative", 3),
+    ("Estoy molesta, hay fallas por todas partes", "negative", 2),
+    ("Son incidencias urgentes, la situación es crítica", "urgency", 2),
+    ("Quiero presentar mis quejas a los supervisores", "escalation", 2),
+    ("Estamos contentas, son muy amables", "positive", 2),
+])
+def test_inflected_forms_in_sentiment_lists(message, category, expected):
+    # Palabra completa: los plurales y femeninos tienen que estar en las listas
+    assert SentimentClassifier().keyword_matcher.counts(message)[category] == expected
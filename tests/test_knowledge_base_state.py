@@ -0,0 +1,100 @@
+# tests/test_knowledge_base_state.py
+import asyncio
+import types
+from contextlib import asynccontextmanager
+
+import pytest
+
+import knowledge_mcp_server_standalone as server
+from knowledge_mcp_server_standalone import KB_CHANGES_CHANNEL, KnowledgeBaseState, SearchResultCache
+
+
+class FakeConnection:
+    """Devuelve las versiones indicadas en orden; la primera lectura puede quedar bloqueada."""
+
+    def __init__(self, versions, embeddings=(True,)):
+        self.versions = list(versions)
+        self.embeddings = list(embeddings)
+        self.version_reads = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def fetchval(self, query, *args):
+        if "knowledge_base_version" in query:
+            self.version_reads += 1
+            await self.gate.wait()
+            return self.versions.pop(0)
+        return self.embeddings.pop(0) if len(self.embeddings) > 1 else self.embeddings[0]
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.fixture(autouse=True)
+def isolated_server_state(monkeypatch):
+    monkeypatch.setattr(server, "result_cache", SearchResultCache())
+    monkeypatch.setattr(server, "embedding_config",
+                        types.SimpleNamespace(loaded=True, is_valid=True, column="embedding"))
+
+
+def make_state(conn):
+    state = KnowledgeBaseState()
+    state._pool = FakePool(conn)
+    return state
+
+
+def test_refresh_sets_version_and_cache_version():
+    state = make_state(FakeConnection(versions=[3]))
+    asyncio.run(state.refresh())
+    assert state.version == 3 and server.result_cache.version == 3
+    assert state.embeddings_available and state.is_loaded
+
+
+def test_refresh_never_moves_version_back():
+    state = make_state(FakeConnection(versions=[7, 5]))
+    asyncio.run(state.refresh())
+    asyncio.run(state.refresh())
+    assert state.version == 7 and server.result_cache.version == 7
+
+
+def test_notification_during_refresh_keeps_newer_version_and_refreshes_again():
+    # El refresco en curso leyó la versión 5; llega NOTIFY con la 6 y una carga de embeddings
+    conn = FakeConnection(versions=[5, 6], embeddings=[False, True])
+    state = make_state(conn)
+
+    async def scenario():
+        conn.gate.clear()
+        state._on_change(None, 0, KB_CHANGES_CHANNEL, "4")  # lanza el refresco
+        await asyncio.sleep(0)
+        state._on_change(None, 0, KB_CHANGES_CHANNEL, "6")  # con el refresco bloqueado
+        assert state.version == 6 and server.result_cache.version == 6
+        conn.gate.set()
+        await state._pending_refresh
+
+    asyncio.run(scenario())
+    assert state.version == 6 and server.result_cache.version == 6
+    assert conn.version_reads == 2
+    assert state.embeddings_available  # el segundo refresco ve los embeddings nuevos
+
+
+def test_burst_of_notifications_refreshes_once_more_at_most():
+    conn = FakeConnection(versions=[1, 3])
+    state = make_state(conn)
+
+    async def scenario():
+        conn.gate.clear()
+        for version in ("1", "2", "3"):
+            state._on_change(None, 0, KB_CHANGES_CHANNEL, version)
+            await asyncio.sleep(0)
+        conn.gate.set()
+        await state._pending_refresh
+
+    asyncio.run(scenario())
+    assert conn.version_reads == 2
+    assert state.version == 3
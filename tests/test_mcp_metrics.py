@@ -0,0 +1,73 @@
+# tests/test_mcp_metrics.py
+import math
+
+import pytest
+
+from customer_service_agent_app.observability.mcp_metrics import LatencyHistogram, RollingWindow
+
+VALUES = [float(v) for v in range(1, 1001)]
+
+
+@pytest.fixture
+def histogram():
+    histogram = LatencyHistogram(relative_error=0.01)
+    for value in VALUES:
+        histogram.record(value)
+    return histogram
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99, 0.999])
+def test_quantiles_within_relative_error(histogram, q):
+    # Mismo rango que LatencyHistogram.quantile: el valor en la posición floor(q * (n - 1))
+    exact = VALUES[math.floor(q * (len(VALUES) - 1))]
+    assert abs(histogram.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_quantiles_stay_within_observed_range(histogram):
+    assert histogram.quantile(0.0) >= 1.0
+    assert histogram.quantile(1.0) <= 1000.0
+
+
+def test_empty_histogram_and_summary():
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.99) == 0.0
+    assert histogram.summary()["min_latency_ms"] == 0.0
+
+    histogram.record(5.0)
+    summary = histogram.summary()
+    assert summary["count"] == 1
+    assert summary["p50_latency_ms"] == summary["p999_latency_ms"] == 5.0
+
+
+def test_merge_matches_single_histogram(histogram):
+    left, right = LatencyHistogram(), LatencyHistogram()
+    for value in VALUES:
+        (left if value <= 500 else right).record(value)
+    left.merge(right)
+    assert left.summary() == histogram.summary()
+
+
+def test_rolling_window_only_counts_recent_slots():
+    window = RollingWindow(slot_seconds=10, slots=90)
+    window.record(100.0, error=False, now=1000.0)
+    window.record(200.0, error=False, now=1055.0)
+    window.record(0.0, error=True, now=1101.0)
+    window.record(300.0, error=False, now=1102.0)
+
+    last_minute = window.window(60, now=1105.0)
+    assert last_minute["queries"] == 3
+    assert last_minute["count"] == 2  # los errores no entran en la latencia
+    assert last_minute["min_latency_ms"] == 200.0
+    assert last_minute["error_rate"] == round(1 / 3 * 100, 2)
+    assert last_minute["qps"] == round(3 / 60, 3)
+
+    assert window.window(300, now=1105.0)["queries"] == 4
+    assert window.window(60, now=2000.0)["queries"] == 0
+
+
+def test_rolling_window_drops_old_slots():
+    window = RollingWindow(slot_seconds=10, slots=3)
+    for second in range(0, 50, 10):
+        window.record(1.0, error=False, now=float(second))
+    assert len(window.slots) == 3
+    assert window.window(900, now=45.0)["queries"] == 3
@@ -0,0 +1,94 @@
+# tests/test_mcp_server_metrics.py
+# Observador inyectado en knowledge_mcp_server_standalone.py: el que responde get_metrics_summary
+import types
+from datetime import datetime
+
+import pytest
+
+import knowledge_mcp_server_standalone as server
+from knowledge_mcp_server_standalone import LatencyHistogram, MCPMetrics, MCPObserver, MetricsSink
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(server, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def observer(monkeypatch, clock):
+    monkeypatch.setattr(server, "metrics_sink", MetricsSink(buffer_size=100))
+    return MCPObserver()
+
+
+def record(observer, latency_ms: float, fallback: str = "semantic", error: str = None):
+    observer.record_search_metrics(MCPMetrics(
+        query="¿cómo cambio mi plan?", latency_ms=latency_ms, similarity_scores=[0.8],
+        fallback_used=fallback, response_length=120, results_count=1,
+        timestamp=datetime.now(), error=error
+    ))
+
+
+def test_summary_statuses(observer):
+    assert observer.get_performance_summary()["status"] == "no_data"
+    record(observer, 50.0, error="timeout")
+    assert observer.get_performance_summary()["status"] == "no_valid_data"
+    record(observer, 50.0)
+    assert observer.get_performance_summary()["status"] == "active"
+
+
+def test_windows_report_recent_queries_qps_and_errors(observer, clock):
+    record(observer, 100.0)
+    record(observer, 300.0, fallback="text")
+    record(observer, 0.0, error="timeout")
+    clock.now = 1200.0
+    record(observer, 20.0)
+    record(observer, 40.0)
+    clock.now = 1250.0
+
+    summary = observer.get_performance_summary()
+    assert set(summary["windows"]) == {"1m", "5m", "15m"}
+
+    last_minute = summary["windows"]["1m"]
+    assert last_minute["queries"] == 2
+    assert last_minute["qps"] == round(2 / 60, 3)
+    assert last_minute["error_rate"] == 0.0
+    assert last_minute["max_latency_ms"] == 40.0
+
+    last_5m = summary["windows"]["5m"]
+    assert last_5m["queries"] == 5
+    assert last_5m["count"] == 4  # los errores no entran en la latencia
+    assert last_5m["error_rate"] == 20.0
+
+    # El acumulado cubre todo el uptime
+    assert summary["performance"]["total_queries"] == 5
+    assert summary["performance"]["max_latency_ms"] == 300.0
+    assert summary["throughput"]["error_rate"] == 20.0
+
+
+def test_by_fallback_counts_and_recent_window(observer, clock):
+    record(observer, 100.0)
+    record(observer, 200.0, fallback="text")
+    record(observer, 0.0, fallback="text", error="db")
+    clock.now = 1400.0
+    record(observer, 50.0, fallback="text")
+
+    by_fallback = observer.get_performance_summary()["by_fallback"]
+    assert by_fallback["semantic"]["queries"] == 1
+    assert by_fallback["text"]["queries"] == 3
+    assert by_fallback["text"]["errors"] == 1
+    assert by_fallback["text"]["count"] == 2
+    assert by_fallback["text"]["last_5m"]["queries"] == 1
+    assert by_fallback["semantic"]["last_5m"]["queries"] == 0
+
+
+def test_histogram_merge_matches_single_histogram():
+    single, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 501):
+        single.record(float(value))
+        (left if value % 2 else right).record(float(value))
+    left.merge(right)
+    assert left.summary() == single.summary()
+    assert abs(single.quantile(0.99) - 495.0) <= 0.01 * 495.0
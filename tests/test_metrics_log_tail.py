@@ -0,0 +1,76 @@
+# tests/test_metrics_log_tail.py
+import json
+
+import pytest
+
+from dashboard_file_based import MetricsLogTail
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / "metrics.jsonl"
+
+
+def append(path, text: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def record(n: int, tool: str = "búsqueda") -> str:
+    # Texto no ASCII: en UTF-8 ocupa más bytes que caracteres
+    return json.dumps({"n": n, "tool": tool}, ensure_ascii=False) + "\n"
+
+
+def test_incremental_and_partial_lines(log_path):
+    append(log_path, record(1))
+    tail = MetricsLogTail(log_path, from_start=True)
+    assert [r["n"] for r in tail.read_new()] == [1]
+    assert tail.read_new() == []
+
+    line = record(2).encode("utf-8")
+    # Corte dentro de la "ú": la línea y el carácter se completan en la siguiente lectura
+    cut = line.index("ú".encode("utf-8")) + 1
+    with open(log_path, "ab") as f:
+        f.write(line[:cut])
+    assert tail.read_new() == []
+    with open(log_path, "ab") as f:
+        f.write(line[cut:])
+    assert tail.read_new() == [{"n": 2, "tool": "búsqueda"}]
+
+
+def test_starts_at_end_unless_from_start(log_path):
+    append(log_path, record(1))
+    tail = MetricsLogTail(log_path)
+    assert tail.read_new() == []
+    append(log_path, record(2))
+    assert [r["n"] for r in tail.read_new()] == [2]
+
+
+def test_missing_file_is_picked_up_from_start(log_path):
+    tail = MetricsLogTail(log_path)
+    assert tail.read_new() == []
+    append(log_path, record(1))
+    assert [r["n"] for r in tail.read_new()] == [1]
+
+
+def test_truncation_restarts_from_beginning(log_path):
+    append(log_path, "".join(record(n, "ñandú" * 20) for n in range(5)))
+    tail = MetricsLogTail(log_path, from_start=True)
+    assert len(tail.read_new()) == 5
+
+    # El contenido nuevo ocupa menos bytes que el offset ya leído
+    log_path.write_text(record(10), encoding="utf-8")
+    tail.read_new()
+    append(log_path, record(11))
+    assert [r["n"] for r in tail.read_new()] == [10, 11]
+
+
+def test_rotation_finishes_old_file_first(log_path):
+    append(log_path, record(1))
+    tail = MetricsLogTail(log_path, from_start=True)
+    assert [r["n"] for r in tail.read_new()] == [1]
+
+    append(log_path, record(2))
+    log_path.rename(log_path.with_name("metrics.jsonl.1"))
+    append(log_path, record(3))
+    assert [r["n"] for r in tail.read_new()] == [2, 3]
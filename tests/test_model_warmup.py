@@ -0,0 +1,116 @@
+# tests/test_model_warmup.py
+import asyncio
+import threading
+import types
+
+import pytest
+
+import knowledge_mcp_server_standalone as server
+from knowledge_mcp_server_standalone import ModelWarmup
+
+
+class FakeModel:
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registro de modelos sin BD: aún no leído, con el modelo por defecto."""
+    config = types.SimpleNamespace(loaded=False, error=None, model_name=server.DEFAULT_EMBEDDING_MODEL,
+                                   checked=[])
+    config.is_valid = True
+    config.check_model = lambda model: config.checked.append(model.model_name)
+    monkeypatch.setattr(server, "embedding_config", config)
+    return config
+
+
+@pytest.fixture
+def warmup():
+    """ModelWarmup cuya carga (en el hilo) espera a `release` para cada modelo."""
+    warmup = ModelWarmup()
+    warmup.loads = []
+    warmup.release = {}
+
+    def load(model_name):
+        warmup.loads.append(model_name)
+        warmup.release.setdefault(model_name, threading.Event()).wait(timeout=5)
+        if model_name == "roto":
+            raise RuntimeError("modelo no encontrado")
+        return FakeModel(model_name)
+
+    warmup._load = load
+    yield warmup
+    for event in warmup.release.values():
+        event.set()
+
+
+def release(warmup, model_name):
+    warmup.release.setdefault(model_name, threading.Event()).set()
+
+
+def read_registry(registry, warmup, model_name=None, is_valid=True):
+    registry.loaded = True
+    registry.is_valid = is_valid
+    registry.model_name = model_name or registry.model_name
+    warmup.apply_registry()
+
+
+def test_default_model_loads_before_registry_and_is_validated_after(registry, warmup):
+    async def scenario():
+        warmup.start(registry.model_name)  # como main(), sin esperar a la BD
+        assert warmup.status()["state"] == "loading"
+        release(warmup, server.DEFAULT_EMBEDDING_MODEL)
+        await warmup.wait(timeout=5)
+        assert registry.checked == []  # dimensión aún sin registro contra el que validar
+        read_registry(registry, warmup)  # mismo modelo: no se recarga
+
+    asyncio.run(scenario())
+    assert warmup.loads == [server.DEFAULT_EMBEDDING_MODEL]
+    assert registry.checked == [server.DEFAULT_EMBEDDING_MODEL]
+    assert warmup.status()["state"] == "ready"
+
+
+def test_registry_naming_other_model_switches_and_waiters_get_it(registry, warmup):
+    async def scenario():
+        warmup.start(registry.model_name)
+        waiter = asyncio.create_task(warmup.wait(timeout=5))
+        await asyncio.sleep(0)
+        read_registry(registry, warmup, model_name="otro-modelo")
+        release(warmup, "otro-modelo")
+        model = await waiter
+        release(warmup, server.DEFAULT_EMBEDDING_MODEL)  # la carga descartada termina y se ignora
+        await asyncio.sleep(0.05)
+        return model
+
+    model = asyncio.run(scenario())
+    assert model.model_name == "otro-modelo"
+    assert warmup.model.model_name == "otro-modelo"
+    assert warmup.model_name == "otro-modelo"
+    assert registry.checked == ["otro-modelo"]
+
+
+def test_invalid_registry_discards_the_load(registry, warmup):
+    async def scenario():
+        warmup.start(registry.model_name)
+        read_registry(registry, warmup, is_valid=False)
+        release(warmup, server.DEFAULT_EMBEDDING_MODEL)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert warmup.model is None
+    assert warmup.status()["state"] == "not_started"
+
+
+def test_load_error_is_reported(registry, warmup):
+    async def scenario():
+        warmup.start("roto")
+        release(warmup, "roto")
+        with pytest.raises(RuntimeError):
+            await warmup.wait(timeout=5)
+
+    asyncio.run(scenario())
+    assert warmup.status()["state"] == "error"
+    assert warmup.status()["error"] == "modelo no encontrado"
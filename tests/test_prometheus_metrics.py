@@ -0,0 +1,33 @@
+# tests/test_prometheus_metrics.py
+import pytest
+
+from customer_service_agent_app.observability import prometheus_metrics
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    """start_http_server sustituido; registra los puertos que se intentan abrir."""
+    attempts = []
+
+    def start_http_server(port, registry=None):
+        attempts.append(port)
+        raise OSError(98, "Address already in use")
+
+    monkeypatch.setattr(prometheus_metrics, "PROMETHEUS_AVAILABLE", True)
+    monkeypatch.setattr(prometheus_metrics, "start_http_server", start_http_server, raising=False)
+    monkeypatch.setattr(prometheus_metrics, "_server_started", False)
+    monkeypatch.setattr(prometheus_metrics, "_server_attempted", False)
+    return attempts
+
+
+def test_port_in_use_is_not_retried_on_every_turn(endpoint):
+    for _ in range(3):
+        assert prometheus_metrics.start_metrics_server(9464) is False
+    assert endpoint == [9464]
+
+
+def test_disabled_port_does_not_count_as_attempt(endpoint):
+    assert prometheus_metrics.start_metrics_server(0) is False
+    assert endpoint == []
+    prometheus_metrics.start_metrics_server(9464)
+    assert endpoint == [9464]
@@ -0,0 +1,126 @@
+# tests/test_search_result_cache.py
+import asyncio
+import types
+from contextlib import asynccontextmanager
+
+import pytest
+
+import knowledge_mcp_server_standalone as server
+from knowledge_mcp_server_standalone import SearchResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado para el TTL de las entradas."""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(server, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def cache(clock):
+    cache = SearchResultCache(max_size=2, ttl_seconds=60)
+    cache.set_version(1)
+    return cache
+
+
+def test_key_normalizes_query():
+    assert SearchResultCache.make_key("¿Cómo  RESETEO mi contraseña?", 3) == \
+        SearchResultCache.make_key("cómo reseteo mi contraseña", 3)
+    assert SearchResultCache.make_key("contraseña", 3) != SearchResultCache.make_key("contraseña", 5)
+    assert SearchResultCache.make_key("contraseña", 3, ef_search=40) != SearchResultCache.make_key("contraseña", 3)
+
+
+def test_hit_and_ttl_expiry(cache, clock):
+    key = SearchResultCache.make_key("facturación", 3)
+    cache.put(key, "respuesta", 1)
+    clock.now += 60
+    assert cache.get(key) == "respuesta"
+    clock.now += 1
+    assert cache.get(key) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_version_change_invalidates_entries(cache):
+    key = SearchResultCache.make_key("facturación", 3)
+    cache.put(key, "respuesta", 1)
+    cache.set_version(1)  # misma versión: no invalida
+    assert cache.get(key) == "respuesta"
+
+    cache.set_version(2)
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_result_from_other_version_is_not_stored(clock):
+    cache = SearchResultCache(max_size=2, ttl_seconds=60)
+    key = SearchResultCache.make_key("facturación", 3)
+    cache.put(key, "respuesta", None)  # versión aún desconocida
+    cache.set_version(2)
+    cache.put(key, "respuesta", 1)     # la KB cambió durante la búsqueda
+    assert cache.get(key) is None
+
+
+def test_lru_eviction(cache):
+    keys = [SearchResultCache.make_key(query, 3) for query in ("a", "b", "c")]
+    cache.put(keys[0], "A", 1)
+    cache.put(keys[1], "B", 1)
+    cache.get(keys[0])  # "b" pasa a ser la menos usada
+    cache.put(keys[2], "C", 1)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "A" and cache.get(keys[2]) == "C"
+    assert cache.stats()["size"] == 2
+
+
+def test_older_version_is_ignored(cache):
+    key = SearchResultCache.make_key("facturación", 3)
+    cache.set_version(3)
+    cache.put(key, "respuesta", 3)
+    cache.set_version(2)  # lectura atrasada: ni vacía la caché ni cambia la versión
+    assert cache.version == 3
+    assert cache.get(key) == "respuesta"
+    cache.put(key, "otra", 2)
+    assert cache.get(key) == "respuesta"
+
+
+def test_notification_during_refresh_keeps_results_keyed_by_newest_version(monkeypatch):
+    # Un refresco lee la versión 1, llega NOTIFY con la 2 y el refresco termina después
+    cache = SearchResultCache(max_size=10, ttl_seconds=60)
+    monkeypatch.setattr(server, "result_cache", cache)
+    monkeypatch.setattr(server, "embedding_config",
+                        types.SimpleNamespace(loaded=True, is_valid=True, column="embedding"))
+    state = server.KnowledgeBaseState()
+    read_started, release = asyncio.Event(), asyncio.Event()
+
+    class Connection:
+        async def fetchval(self, query, *args):
+            if "knowledge_base_version" in query:
+                read_started.set()
+                await release.wait()
+                return 1
+            return True
+
+    class Pool:
+        # El refresco que lanza la notificación usa la misma conexión falsa
+        @asynccontextmanager
+        async def acquire(self):
+            yield Connection()
+
+    state._pool = Pool()
+
+    async def scenario():
+        refresh = asyncio.create_task(state.refresh(Connection()))
+        await read_started.wait()
+        state._on_change(None, 0, server.KB_CHANGES_CHANNEL, "2")
+        key = SearchResultCache.make_key("facturación", 3)
+        cache.put(key, "respuesta", 2)
+        release.set()
+        await refresh
+        await state._pending_refresh
+        return key
+
+    key = asyncio.run(scenario())
+    assert cache.version == 2
+    assert cache.get(key) == "respuesta"
+    assert cache.stats()["invalidations"] == 0
@@ -0,0 +1,58 @@
+# tests/test_tracing.py
+import pytest
+
+from customer_service_agent_app.observability import tracing
+from customer_service_agent_app.observability.tracing import Tracer
+
+
+class FakeExporter:
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def tracer():
+    return Tracer(FakeExporter())
+
+
+def test_closing_root_ends_spans_left_open_in_the_invocation(tracer):
+    tracer.start_span("agent.CustomerServiceAgent", key=("agent", "inv-1"), invocation_id="inv-1")
+    tracer.start_span("tool.get_customer_context", key=("tool", "inv-1"), invocation_id="inv-1")
+    tracer.start_span("agent.CustomerServiceAgent", key=("agent", "inv-2"), invocation_id="inv-2")
+
+    # La tool lanzó una excepción: su after_tool no llega y sólo se cierra la raíz
+    root = tracer.end_span(key=("agent", "inv-1"))
+
+    orphan = next(span for span in tracer.exporter.spans if span.name == "tool.get_customer_context")
+    assert orphan.status == "error"
+    assert orphan.end_time_unix_nano == root.end_time_unix_nano
+    assert orphan.parent_span_id == root.span_id
+    assert list(tracer._open) == [("agent", "inv-2")]
+    assert list(tracer._roots) == ["inv-2"]
+
+
+def test_open_spans_and_roots_are_capped(tracer, monkeypatch):
+    monkeypatch.setattr(tracing, "_MAX_OPEN_SPANS", 4)
+    for i in range(10):
+        tracer._current.set(None)
+        tracer.start_span("agent.CustomerServiceAgent", key=("agent", i), invocation_id=f"inv-{i}")
+    assert len(tracer._open) <= 4
+    assert len(tracer._roots) <= 4
+
+
+def test_exporter_flushes_last_batch_at_exit(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(tracing.atexit, "register", registered.append)
+    exporter = tracing.SpanExporter("file", str(tmp_path / "traces.jsonl"), "http://localhost:4318",
+                                    flush_seconds=3600)
+    tracer = Tracer(exporter)
+    tracer.end_span(tracer.start_span("agent.CustomerServiceAgent", invocation_id="inv-1"))
+
+    assert registered == [exporter.flush]
+    registered[0]()  # lo que hace atexit al salir, antes de que el hilo haga su primer flush
+    assert '"agent.CustomerServiceAgent"' in (tmp_path / "traces.jsonl").read_text(encoding="utf-8")
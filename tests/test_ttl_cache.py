@@ -0,0 +1,76 @@
+# tests/test_ttl_cache.py
+import types
+
+import pytest
+
+from customer_service_agent_app.repository import cache as cache_module
+from customer_service_agent_app.repository.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado para el TTL (solo el módulo de la caché lo ve)."""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def cache(clock):
+    return TTLCache("test", max_size=2, ttl_seconds=60)
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.put("CUST_001", {"tier": "Gold"})
+    clock.now += 59
+    assert cache.get("CUST_001") == {"tier": "Gold"}
+    clock.now += 2
+    assert cache.get("CUST_001") is None
+    assert cache.stats()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction(cache):
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" pasa a ser la menos usada
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_stale_read_not_stored_after_write(cache):
+    generation = cache.generation  # lectura de la BD en curso...
+    cache.invalidate("CUST_001")   # ...y entretanto una escritura
+    cache.put("CUST_001", {"satisfaction_score": 2.0}, generation)
+    assert cache.get("CUST_001") is None
+
+    cache.put("CUST_001", {"satisfaction_score": 4.5}, cache.generation)
+    assert cache.get("CUST_001") == {"satisfaction_score": 4.5}
+
+
+def test_update_applies_write_without_renewing_ttl(cache, clock):
+    cache.put("CUST_001", {"total_interactions": 3})
+    generation = cache.generation
+    clock.now += 30
+    cache.update("CUST_001", lambda customer: customer.update(total_interactions=4))
+    assert cache.generation == generation + 1
+    assert cache.get("CUST_001") == {"total_interactions": 4}
+    clock.now += 31
+    assert cache.get("CUST_001") is None
+
+
+def test_values_are_copied(cache):
+    value = {"recent_issues": ["billing"]}
+    cache.put("CUST_001", value)
+    value["recent_issues"].append("technical")
+    cache.get("CUST_001")["recent_issues"].append("account")
+    assert cache.get("CUST_001") == {"recent_issues": ["billing"]}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache("test", max_size=0, ttl_seconds=60)
+    cache.put("CUST_001", {"tier": "Gold"})
+    assert cache.get("CUST_001") is None